@@ -0,0 +1,198 @@
+"""Pluggable pattern mining backends for the analysis pipeline.
+
+Each backend turns an image's reading order into ``{pattern: start
+positions}``; the result is stored through the suffix array writer, so the
+pattern views work the same whichever engine produced it.
+"""
+
+import argparse
+from typing import Callable
+
+from src.ngram import find_ngram_repeats
+from src.sort import fetch_sort_version
+from src.suffixarray import (
+    OCCURRENCE_STORAGE,
+    PATTERN_SCORES,
+    REPEAT_MODES,
+    fetch_glyph_columns,
+    fetch_sorted_gardiner_ids,
+    mine_suffixarray,
+    restore_positions,
+    save_suffixarray_results,
+    separate_columns,
+)
+from src.suffixtree import find_suffixtree_occurrences
+from src.wildcard import mine_wildcard
+
+Occurrences = dict[tuple[int, ...], list[int]]
+
+
+def _mine_suffixtree(
+    image_id: int,
+    sort_version: int,
+    sequence_pairs: list[tuple[int, int]],
+    *,
+    min_length: int,
+    mode: str,
+) -> Occurrences:
+    return find_suffixtree_occurrences(
+        [gid for gid, _ in sequence_pairs], min_length=min_length, mode=mode
+    )
+
+
+def _mine_ngram(
+    image_id: int,
+    sort_version: int,
+    sequence_pairs: list[tuple[int, int]],
+    *,
+    min_length: int,
+    mode: str,
+) -> Occurrences:
+    return find_ngram_repeats(
+        [gid for gid, _ in sequence_pairs], min_length=min_length, mode=mode
+    )
+
+
+# name -> miner(image_id, sort_version, sequence_pairs, *, min_length, mode, ...)
+ANALYSIS_BACKENDS: dict[str, Callable[..., Occurrences]] = {
+    "suffixarray": mine_suffixarray,
+    "suffixtree": _mine_suffixtree,
+    "ngram": _mine_ngram,
+}
+
+# Only these backends take top_k / score / max_occurrences.
+BOUNDED_BACKENDS = ("suffixarray",)
+
+# These backends write an on-disk index unless told not to (write_index).
+INDEXED_BACKENDS = ("suffixarray",)
+
+
+def run_analysis(
+    image_id: int,
+    *,
+    backend: str = "suffixarray",
+    min_length: int = 2,
+    mode: str = "all",
+    storage: str = "rows",
+    incremental: bool = False,
+    top_k: int | None = None,
+    score: str = "count",
+    max_occurrences: int | None = None,
+    wildcard: bool = False,
+    column_breaks: bool = False,
+) -> Occurrences:
+    """
+    Mine an image's reading order with ``backend`` (one of ANALYSIS_BACKENDS)
+    and store the patterns; the other options are those of run_suffixarray.
+    With ``wildcard`` the repeats with one varying sign (src.wildcard) are
+    stored too, as pattern_type "wildcard"; an incremental run without it
+    removes previously stored ones. With ``column_breaks`` the engines mine
+    each column separately (separate_columns), so no repeat crosses a column
+    break; without it the columns are read as one run-on text.
+    """
+    if backend not in ANALYSIS_BACKENDS:
+        raise ValueError(
+            f"unknown backend '{backend}', expected one of {list(ANALYSIS_BACKENDS)}"
+        )
+
+    bounds = {}
+    if top_k is not None or max_occurrences is not None:
+        if backend not in BOUNDED_BACKENDS:
+            raise ValueError(f"top_k/max_occurrences are not supported by '{backend}'")
+        bounds = {"top_k": top_k, "score": score, "max_occurrences": max_occurrences}
+
+    sequence_pairs = fetch_sorted_gardiner_ids(image_id)
+    sort_version = fetch_sort_version(image_id)
+    mined_pairs = sequence_pairs
+    origin: list[int] | None = None
+    if column_breaks and sequence_pairs:
+        mined_pairs, origin = separate_columns(
+            sequence_pairs, fetch_glyph_columns(image_id)
+        )
+        if backend in INDEXED_BACKENDS:
+            bounds["write_index"] = False
+
+    occurrences: Occurrences = {}
+    if sequence_pairs:
+        occurrences = ANALYSIS_BACKENDS[backend](
+            image_id,
+            sort_version,
+            mined_pairs,
+            min_length=min_length,
+            mode=mode,
+            **bounds,
+        )
+        if origin is not None:
+            occurrences = restore_positions(occurrences, origin)
+
+    save_suffixarray_results(
+        image_id,
+        occurrences,
+        [glyph_id for _, glyph_id in sequence_pairs],
+        storage=storage,
+        sort_version=sort_version,
+        incremental=incremental,
+    )
+
+    if wildcard or incremental:
+        variants = {}
+        if wildcard:
+            variants = mine_wildcard(
+                image_id,
+                sort_version,
+                mined_pairs,
+                min_length=max(3, min_length),
+            )
+            if origin is not None:
+                variants = restore_positions(variants, origin)
+        save_suffixarray_results(
+            image_id,
+            variants,
+            [glyph_id for _, glyph_id in sequence_pairs],
+            storage=storage,
+            sort_version=sort_version,
+            incremental=incremental,
+            pattern_type="wildcard",
+        )
+    return occurrences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run pattern analysis on an image")
+    parser.add_argument("image_id", type=int, help="Image ID to analyze")
+    parser.add_argument(
+        "--backend", choices=list(ANALYSIS_BACKENDS), default="suffixarray"
+    )
+    parser.add_argument("--min-length", type=int, default=2)
+    parser.add_argument("--mode", choices=REPEAT_MODES, default="all")
+    parser.add_argument("--storage", choices=OCCURRENCE_STORAGE, default="rows")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--top-k", type=int)
+    parser.add_argument("--score", choices=PATTERN_SCORES, default="count")
+    parser.add_argument("--max-occurrences", type=int)
+    parser.add_argument(
+        "--column-breaks",
+        action="store_true",
+        help="Do not let repeats cross column breaks",
+    )
+    parser.add_argument(
+        "--wildcard",
+        action="store_true",
+        help="Also store repeats with one varying sign",
+    )
+    args = parser.parse_args()
+
+    found = run_analysis(
+        args.image_id,
+        backend=args.backend,
+        min_length=args.min_length,
+        mode=args.mode,
+        storage=args.storage,
+        incremental=args.incremental,
+        top_k=args.top_k,
+        score=args.score,
+        max_occurrences=args.max_occurrences,
+        wildcard=args.wildcard,
+        column_breaks=args.column_breaks,
+    )
+    print(f"{args.backend}: {len(found)} patterns")
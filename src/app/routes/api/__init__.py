@@ -15,3 +15,5 @@ from . import sentences  # noqa: E402,F401
 from . import pattern_details  # noqa: E402,F401
 from . import glyphes  # noqa: E402,F401
 from . import structure  # noqa: E402,F401
+from . import search  # noqa: E402,F401
+from . import corpus  # noqa: E402,F401
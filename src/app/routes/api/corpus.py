@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from flask import jsonify, request
+
+from src.corpus import find_cross_image_repeats, get_corpus_index
+from src.database.tools import select
+from src.suffixarray import REPEAT_MODES
+
+from . import bp
+from .patterns import (
+    _gardiner_map_for_ids,
+    _normalize_gardiner_code,
+    _normalize_unicode,
+    _unicode_to_symbol,
+)
+
+
+@bp.get("/corpus/repeats")
+def get_corpus_repeats():
+    try:
+        min_length = int(request.args.get("min_length", 2))
+        min_images = int(request.args.get("min_images", 2))
+        limit = int(request.args.get("limit", 200))
+    except ValueError:
+        return {"error": "min_length, min_images and limit must be integers"}, 400
+    if min_length < 1 or min_images < 1 or limit < 1:
+        return {"error": "min_length, min_images and limit must be positive"}, 400
+    mode = request.args.get("mode", "maximal")
+    if mode not in REPEAT_MODES:
+        return {"error": f"mode must be one of {list(REPEAT_MODES)}"}, 400
+
+    index = get_corpus_index()
+    repeats = (
+        find_cross_image_repeats(
+            index, min_length=min_length, min_images=min_images, mode=mode
+        )
+        if index is not None
+        else []
+    )
+    total = len(repeats)
+    repeats = repeats[:limit]
+
+    gardiner_ids = {gid for row in repeats for gid in row["seq"]}
+    gardiner_map = _gardiner_map_for_ids(gardiner_ids)
+    titles = _image_titles({image_id for row in repeats for image_id in row["images"]})
+
+    items: list[dict[str, object]] = []
+    for row in repeats:
+        ids = list(row["seq"])
+        codes = [
+            _normalize_gardiner_code(gardiner_map.get(gid, {}).get("code", ""))
+            for gid in ids
+        ]
+        symbols = [
+            _unicode_to_symbol(
+                [_normalize_unicode(gardiner_map.get(gid, {}).get("unicode", ""))]
+            )
+            for gid in ids
+        ]
+        items.append(
+            {
+                "gardiner_ids": ids,
+                "gardiner_codes": codes,
+                "gardiner_label": " ".join(code for code in codes if code),
+                "symbol": "".join(symbols),
+                "length": row["length"],
+                "count": row["count"],
+                "image_count": len(row["images"]),
+                "images": [
+                    {
+                        "image_id": image_id,
+                        "title": titles.get(image_id, ""),
+                        "count": count,
+                    }
+                    for image_id, count in row["images"].items()
+                ],
+            }
+        )
+
+    response = jsonify(
+        {
+            "images": len(index.image_ids) if index is not None else 0,
+            "total": total,
+            "items": items,
+        }
+    )
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def _image_titles(image_ids: set[int]) -> dict[int, str]:
+    if not image_ids:
+        return {}
+    rows = select(
+        "SELECT id, title FROM t_images WHERE id = ANY(%s)",
+        (list(image_ids),),
+    )
+    return {int(image_id): (title or "").strip() for image_id, title in rows}
@@ -6,6 +6,7 @@ from flask import jsonify
 
 from . import bp
 from src.database.tools import select
+from src.glyph_cache import get_glyph_geometry
 
 
 def _normalize_code(value: str | None) -> str:
@@ -195,28 +196,8 @@ def glyph_stats(image_id: int):
 
 
 def _glyph_metadata(image_id: int) -> dict[str, dict[str, float | str | int]]:
-    rows = select(
-        """
-        SELECT gr.id, gr.bbox_x, gr.bbox_y, gr.bbox_width, gr.bbox_height,
-               gr.id_gardiner, gc.code, gc.unicode
-        FROM t_glyphes_raw AS gr
-        LEFT JOIN t_gardiner_codes AS gc ON gc.id = gr.id_gardiner
-        WHERE id_image = %s
-        """,
-        (image_id,),
-    )
-    glyphs: dict[str, dict[str, float | str]] = {}
-    for glyph_id, x, y, width, height, gid_gardiner, code, unicode_val in rows:
-        glyphs[str(int(glyph_id))] = {
-            "x": float(x),
-            "y": float(y),
-            "width": float(width),
-            "height": float(height),
-            "gardiner_id": int(gid_gardiner) if gid_gardiner is not None else None,
-            "gardiner_code": code or "",
-            "unicode": unicode_val or "",
-        }
-    return glyphs
+    geometry = get_glyph_geometry(image_id)
+    return geometry.metadata(gardiner_id=True) if geometry else {}
 
 
 def _ordered_columns(image_id: int) -> List[List[int]]:
@@ -242,7 +223,7 @@ def _pattern_rows(image_id: int) -> List[tuple]:
         """
         SELECT id, gardiner_ids, sequence_length, sequence_count
         FROM t_suffixarray_patterns
-        WHERE id_image = %s
+        WHERE id_image = %s AND pattern_type = 'exact'
         """,
         (image_id,),
     )
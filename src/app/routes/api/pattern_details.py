@@ -7,6 +7,7 @@ from src.sentence_lookup_db import lookup_all
 
 from . import bp
 from .patterns import (
+    WILDCARD_CODE,
     _gardiner_map_for_ids,
     _normalize_gardiner_code,
     _normalize_unicode,
@@ -18,7 +19,8 @@ from .patterns import (
 def _fetch_pattern_row(pattern_id: int):
     rows = select(
         """
-        SELECT id, id_image, gardiner_ids, sequence_length, sequence_count
+        SELECT id, id_image, gardiner_ids, sequence_length, sequence_count,
+               pattern_type
         FROM t_suffixarray_patterns
         WHERE id = %s
         """,
@@ -26,11 +28,13 @@ def _fetch_pattern_row(pattern_id: int):
     )
     if not rows:
         return None
-    pat_id, image_id, gardiner_ids, length, count = rows[0]
-    ids = [int(gid) for gid in (gardiner_ids or []) if gid is not None]
+    pat_id, image_id, gardiner_ids, length, count, pattern_type = rows[0]
+    # None marks the wildcard slot of a wildcard pattern
+    ids = [None if gid is None else int(gid) for gid in (gardiner_ids or [])]
     return {
         "id": int(pat_id),
         "image_id": int(image_id) if image_id is not None else None,
+        "pattern_type": pattern_type,
         "gardiner_ids": ids,
         "length": int(length) if length is not None else len(ids),
         # number of occurrences of this pattern in the image
@@ -40,7 +44,7 @@ def _fetch_pattern_row(pattern_id: int):
 
 def _build_pattern_payload(pattern: dict) -> dict:
     gardiner_ids = pattern.get("gardiner_ids", [])
-    gardiner_map = _gardiner_map_for_ids(gardiner_ids)
+    gardiner_map = _gardiner_map_for_ids(gid for gid in gardiner_ids if gid is not None)
 
     unicode_values = [
         _normalize_unicode(gardiner_map.get(gid, {}).get("unicode", ""))
@@ -48,7 +52,9 @@ def _build_pattern_payload(pattern: dict) -> dict:
     ]
     symbol_values = [_unicode_to_symbol([u]) if u else "" for u in unicode_values]
     gardiner_codes = [
-        _normalize_gardiner_code(gardiner_map.get(gid, {}).get("code", ""))
+        WILDCARD_CODE
+        if gid is None
+        else _normalize_gardiner_code(gardiner_map.get(gid, {}).get("code", ""))
         for gid in gardiner_ids
     ]
     symbol = "".join(val for val in symbol_values if val)
@@ -75,8 +81,11 @@ def get_pattern_details(pattern_id: int):
         code for code in pattern_payload.get("gardiner_codes", []) if code
     ]
 
+    # The corpus lookup matches exact code sequences only.
     sentences_raw = (
-        lookup_all(gardiner_codes, include_partials=True) if gardiner_codes else []
+        lookup_all(gardiner_codes, include_partials=True)
+        if gardiner_codes and pattern_row["pattern_type"] == "exact"
+        else []
     )
     print(f"[pattern_details] sentences found (raw): {len(sentences_raw)}")
 
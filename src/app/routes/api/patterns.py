@@ -2,26 +2,34 @@ from __future__ import annotations
 
 from typing import Iterable, Sequence, cast
 
-from flask import jsonify
+from flask import jsonify, request
 
 from src.database.tools import select
+from src.suffixarray import PATTERN_TYPES, load_offset_occurrences
 
 from . import bp
 
+# Shown for the wildcard slot (a NULL gardiner id) of wildcard patterns.
+WILDCARD_CODE = "?"
+
 
 @bp.get("/images/<int:image_id>/patterns")
 def get_image_patterns(image_id: int):
     if not _image_exists(image_id):
         return {"error": "not found"}, 404
 
+    pattern_type = request.args.get("type")
+    if pattern_type is not None and pattern_type not in PATTERN_TYPES:
+        return {"error": f"type must be one of {list(PATTERN_TYPES)}"}, 400
+
     patterns = select(
         """
-        SELECT id, gardiner_ids, sequence_length, sequence_count
+        SELECT id, gardiner_ids, sequence_length, sequence_count, pattern_type
         FROM t_suffixarray_patterns
-        WHERE id_image = %s
+        WHERE id_image = %s AND (%s IS NULL OR pattern_type = %s)
         ORDER BY sequence_length DESC, sequence_count DESC, id ASC
         """,
-        (image_id,),
+        (image_id, pattern_type, pattern_type),
     )
 
     pattern_ids = [int(row[0]) for row in patterns]
@@ -33,14 +41,15 @@ def get_image_patterns(image_id: int):
     if patterns:
         all_gardiner_ids = {
             int(gardiner_id)
-            for _, gardiner_ids, _, _ in patterns
+            for _, gardiner_ids, _, _, _ in patterns
             for gardiner_id in (gardiner_ids or [])
             if gardiner_id is not None
         }
         gardiner_map = _gardiner_map_for_ids(all_gardiner_ids)
 
-        for pattern_id, gardiner_ids, length, count in patterns:
-            ids = [int(gid) for gid in gardiner_ids or [] if gid is not None]
+        for pattern_id, gardiner_ids, length, count, kind in patterns:
+            # None marks the wildcard slot of a wildcard pattern
+            ids = [None if gid is None else int(gid) for gid in gardiner_ids or []]
             unicode_values = [
                 _normalize_unicode(gardiner_map.get(gid, {}).get("unicode", ""))
                 for gid in ids
@@ -49,7 +58,9 @@ def get_image_patterns(image_id: int):
                 _unicode_to_symbol([u]) if u else "" for u in unicode_values
             ]
             gardiner_codes = [
-                _normalize_gardiner_code(gardiner_map.get(gid, {}).get("code", ""))
+                WILDCARD_CODE
+                if gid is None
+                else _normalize_gardiner_code(gardiner_map.get(gid, {}).get("code", ""))
                 for gid in ids
             ]
             gardiner_label = " ".join(code for code in gardiner_codes if code)
@@ -58,6 +69,7 @@ def get_image_patterns(image_id: int):
             items.append(
                 {
                     "id": int(pattern_id),
+                    "pattern_type": kind,
                     "length": int(length),
                     "count": int(count),
                     "gardiner_ids": ids,
@@ -180,7 +192,29 @@ def _occurrences_with_bboxes(
                 }
             )
 
-    return {
+    result = {
         pattern_id: list(occurrences.values())
         for pattern_id, occurrences in by_pattern.items()
     }
+
+    # Patterns stored as start offsets have no occurrence rows; the start
+    # offset doubles as the occurrence id.
+    for pattern_id, occurrences in load_offset_occurrences(pattern_ids).items():
+        result[pattern_id] = [
+            {
+                "id": start,
+                "glyph_ids": glyph_ids,
+                "bboxes": [
+                    {
+                        "bbox_x": bbox_x,
+                        "bbox_y": bbox_y,
+                        "bbox_height": bbox_h,
+                        "bbox_width": bbox_w,
+                    }
+                    for bbox_x, bbox_y, bbox_h, bbox_w in bboxes
+                ],
+            }
+            for start, glyph_ids, bboxes in occurrences
+        ]
+
+    return result
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import re
+
+from flask import jsonify, request
+
+from src.database.tools import select
+from src.sort import fetch_sort_version
+from src.suffixarray import fetch_sorted_gardiner_ids, get_suffixarray_index
+from src.suffixtree import SuffixTree
+
+from . import bp
+from .patterns import _image_exists, _normalize_gardiner_code
+
+MAX_SEARCH_PATTERNS = 200
+SEARCH_ENGINES = ("suffixarray", "suffixtree")
+
+
+@bp.post("/images/<int:image_id>/search")
+def search_image_patterns(image_id: int):
+    """Count and locate many Gardiner sequences in one reading order at once.
+
+    Expected body: {"patterns": [[12, 40], ["G17", "D21"], "G17 D21 N35"]}.
+    Each pattern is a list of Gardiner ids, a list of Gardiner codes or a
+    string of codes separated by spaces, commas or dashes. An optional
+    "engine" picks the persisted suffix array (default) or a suffix tree
+    built for the request.
+    """
+    if not _image_exists(image_id):
+        return {"error": "not found"}, 404
+
+    data = request.get_json(silent=True) or {}
+    raw_patterns = data.get("patterns")
+    if not isinstance(raw_patterns, list) or not raw_patterns:
+        return {"error": "patterns must be a non-empty list"}, 400
+    if len(raw_patterns) > MAX_SEARCH_PATTERNS:
+        return {"error": f"at most {MAX_SEARCH_PATTERNS} patterns allowed"}, 400
+    engine = data.get("engine", "suffixarray")
+    if engine not in SEARCH_ENGINES:
+        return {"error": f"engine must be one of {list(SEARCH_ENGINES)}"}, 400
+
+    tokenized: list[list[int | str]] = []
+    for raw in raw_patterns:
+        tokens = _tokenize_pattern(raw)
+        if tokens is None:
+            return {"error": f"invalid pattern: {raw!r}"}, 400
+        tokenized.append(tokens)
+
+    code_map = _gardiner_ids_for_codes(
+        {tok for tokens in tokenized for tok in tokens if isinstance(tok, str)}
+    )
+
+    patterns: list[list[int]] = []
+    unknown: list[list[str]] = []
+    for tokens in tokenized:
+        missing = [t for t in tokens if isinstance(t, str) and t not in code_map]
+        unknown.append(missing)
+        patterns.append(
+            []
+            if missing
+            else [code_map[t] if isinstance(t, str) else t for t in tokens]
+        )
+
+    if engine == "suffixtree":
+        sequence_pairs = fetch_sorted_gardiner_ids(image_id)
+        if not sequence_pairs:
+            return {"error": "image has no sorted glyphs"}, 400
+        sort_version = fetch_sort_version(image_id)
+        glyph_ids = [glyph_id for _, glyph_id in sequence_pairs]
+        tree = SuffixTree([gid for gid, _ in sequence_pairs])
+        results = tree.search_many(patterns)
+    else:
+        index = get_suffixarray_index(image_id)
+        if index is None:
+            return {"error": "image has no sorted glyphs"}, 400
+        sort_version = index.sort_version
+        glyph_ids = index.glyph_ids
+        results = index.search_many(patterns)
+
+    items: list[dict[str, object]] = []
+    for raw, pattern, missing, (count, positions) in zip(
+        raw_patterns, patterns, unknown, results
+    ):
+        length = len(pattern)
+        items.append(
+            {
+                "query": raw,
+                "gardiner_ids": pattern,
+                "count": count,
+                "positions": positions,
+                "glyph_ids": [
+                    list(glyph_ids[start : start + length]) for start in positions
+                ],
+                "unknown_codes": missing,
+            }
+        )
+
+    response = jsonify(
+        {
+            "image_id": image_id,
+            "engine": engine,
+            "sort_version": sort_version,
+            "items": items,
+        }
+    )
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def _tokenize_pattern(raw: object) -> list[int | str] | None:
+    if isinstance(raw, str):
+        raw = [part for part in re.split(r"[\s,\-]+", raw) if part]
+    if not isinstance(raw, list) or not raw:
+        return None
+
+    tokens: list[int | str] = []
+    for value in raw:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, int):
+            tokens.append(value)
+        elif isinstance(value, str) and value.strip():
+            tokens.append(_normalize_gardiner_code(value))
+        else:
+            return None
+    return tokens
+
+
+def _gardiner_ids_for_codes(codes: set[str]) -> dict[str, int]:
+    if not codes:
+        return {}
+    rows = select(
+        "SELECT id, code FROM t_gardiner_codes WHERE UPPER(code) = ANY(%s)",
+        (list(codes),),
+    )
+    return {_normalize_gardiner_code(code): int(gid) for gid, code in rows if code}
@@ -5,15 +5,26 @@ from typing import Dict, List, Tuple, TypedDict
 from flask import jsonify, request, current_app
 
 from . import bp
-from src.database.tools import insert, select, update
-from src.sort import sort as run_sort_algorithm
+from src.database.tools import select, update
+from src.sort import (
+    estimate_tolerances,
+    fetch_break_schedule,
+    fetch_sort_version,
+    save_sorted_order,
+)
+from src.glyph_cache import get_glyph_geometry
+from src.suffixautomaton import SuffixAutomaton
 from src.app.services.pipeline_service import (
+    STATUS_DONE,
     STATUS_SORT_DONE,
     emit_pipeline_status,
     start_analysis_async,
+    start_refresh_async,
 )
 from src.app.services.status_service import change_image_status, ensure_status_code
-from src.cleanup import delete_existing_entries
+
+
+MAX_STATS_NGRAM = 12
 
 
 class ColumnEntry(TypedDict):
@@ -52,7 +63,7 @@ def get_sorting_columns(image_id: int):
     return jsonify(
         {
             "image_id": image_id,
-            "sort_version": 1,
+            "sort_version": fetch_sort_version(image_id),
             "columns": columns_payload,
             "glyphs": glyph_meta,
         }
@@ -79,32 +90,9 @@ def apply_sorting_snapshot(image_id: int):
         if tolerance_value <= 0:
             return {"error": "tolerance must be positive"}, 400
 
-    normalized_columns: list[tuple[int, list[int]]] = []
-    for entry in columns:
-        if not isinstance(entry, dict):
-            return {"error": "Invalid column entry"}, 400
-        col_idx = entry.get("col")
-        glyph_ids = entry.get("glyph_ids")
-        if not isinstance(col_idx, int) or col_idx < 0:
-            return {"error": "col must be a non-negative integer"}, 400
-        if not isinstance(glyph_ids, list):
-            return {"error": "glyph_ids must be a list"}, 400
-        glyph_list: list[int] = []
-        for glyph_id in glyph_ids:
-            if not isinstance(glyph_id, int):
-                return {"error": "glyph_ids must contain integers"}, 400
-            glyph_list.append(int(glyph_id))
-        if glyph_list:
-            normalized_columns.append((int(col_idx), glyph_list))
-
-    valid_glyph_ids = _glyph_ids_for_image(image_id)
-    if not valid_glyph_ids:
-        return {"error": "image has no glyphs"}, 400
-
-    all_glyph_ids = [gid for _, glyphs in normalized_columns for gid in glyphs]
-    invalid = [gid for gid in all_glyph_ids if gid not in valid_glyph_ids]
-    if invalid:
-        return {"error": f"glyph ids do not belong to image: {invalid}"}, 400
+    normalized_columns, error = _parse_columns(image_id, columns)
+    if error:
+        return {"error": error}, 400
 
     ordered_entries: list[tuple[int, int, int]] = []
     if normalized_columns:
@@ -115,18 +103,11 @@ def apply_sorting_snapshot(image_id: int):
             for row_idx, glyph_id in enumerate(glyphs):
                 ordered_entries.append((glyph_id, mapped_col, row_idx))
 
-    delete_existing_entries(image_id, "ANALYSIS")
-    delete_existing_entries(image_id, "SORTING")
-
-    if ordered_entries:
-        insert(
-            """
-            INSERT INTO t_glyphes_sorted (id_glyph, v_column, v_row)
-            VALUES (%s, %s, %s)
-            """,
-            ordered_entries,
-            many=True,
-        )
+    # Only the difference to the stored order is written. The analysis is
+    # kept and updated incrementally in the background, and only if the
+    # order changed.
+    delta = save_sorted_order(image_id, ordered_entries)
+    has_analysis = _has_analysis(image_id)
 
     if tolerance_value is not None:
         update(
@@ -134,8 +115,29 @@ def apply_sorting_snapshot(image_id: int):
             (tolerance_value, image_id),
         )
 
+    analysis_pending = False
+    if not advance_status and delta.changed and has_analysis:
+        start_refresh_async(
+            image_id,
+            current_app._get_current_object(),  # type: ignore[attr-defined]
+        )
+        analysis_pending = True
+
     status_updated = False
-    if advance_status:
+    if advance_status and not delta.changed and has_analysis:
+        # Validated unchanged: the stored analysis is still current.
+        change_image_status(image_id, STATUS_DONE)
+        status_updated = True
+        try:
+            emit_pipeline_status(
+                image_id,
+                STATUS_DONE,
+                current_app._get_current_object(),  # type: ignore[attr-defined]
+                status="success",
+            )
+        except Exception:
+            pass
+    elif advance_status:
         ensure_status_code(STATUS_SORT_DONE, "Sorting done")
         change_image_status(image_id, STATUS_SORT_DONE)
         status_updated = True
@@ -163,12 +165,94 @@ def apply_sorting_snapshot(image_id: int):
         {
             "status": "ok",
             "updated": len(ordered_entries),
+            "changed": {
+                "inserted": delta.inserted,
+                "updated": delta.updated,
+                "deleted": delta.deleted,
+            },
             "tolerance": tolerance_value,
             "status_updated": status_updated,
+            "analysis_pending": analysis_pending,
         }
     )
 
 
+@bp.post("/sorting/<int:image_id>/stats")
+def sorting_stats(image_id: int):
+    """Repeat statistics of a (possibly unsaved) reading order, column by column.
+
+    Expected body: {"columns": [{"col": 0, "glyph_ids": [...]}, ...],
+    "ngram_lengths": [2, 3]}; without "columns" the stored sort is used.
+    Glyphs are streamed into a suffix automaton, so each column entry reports
+    the statistics of the reading order up to and including that column.
+    """
+    if not _image_exists(image_id):
+        return {"error": "image not found"}, 404
+
+    data = request.get_json(silent=True) or {}
+    ngram_lengths = data.get("ngram_lengths", [2, 3])
+    if not isinstance(ngram_lengths, list) or not all(
+        isinstance(n, int) and 0 < n <= MAX_STATS_NGRAM for n in ngram_lengths
+    ):
+        return {
+            "error": f"ngram_lengths must be integers between 1 and {MAX_STATS_NGRAM}"
+        }, 400
+
+    columns = data.get("columns")
+    if columns is None:
+        normalized_columns = [
+            (entry["col"], entry["glyph_ids"])
+            for entry in _build_columns_payload(_sorted_entries(image_id))
+        ]
+    else:
+        if not isinstance(columns, list):
+            return {"error": "columns must be a list"}, 400
+        normalized_columns, error = _parse_columns(image_id, columns)
+        if error:
+            return {"error": error}, 400
+        normalized_columns.sort(key=lambda item: item[0])
+
+    gardiner_by_glyph = {
+        int(glyph_id): int(gardiner_id)
+        for glyph_id, _, gardiner_id, *_ in _glyph_rows(image_id)
+        if gardiner_id is not None
+    }
+
+    sam = SuffixAutomaton(ngram_lengths)
+    columns_stats: list[dict[str, object]] = []
+    for col_idx, glyph_ids in normalized_columns:
+        sam.extend_many(
+            gardiner_by_glyph[gid] for gid in glyph_ids if gid in gardiner_by_glyph
+        )
+        columns_stats.append(
+            {
+                "col": col_idx,
+                "length": len(sam.text),
+                "distinct_substrings": sam.distinct_substrings,
+                "distinct_ngrams": {str(n): c for n, c in sam.distinct_ngrams.items()},
+                "longest_repeat_length": sam.longest_repeat_length,
+            }
+        )
+
+    repeat = sam.longest_repeat()
+    response = jsonify(
+        {
+            "image_id": image_id,
+            "length": len(sam.text),
+            "distinct_substrings": sam.distinct_substrings,
+            "distinct_ngrams": {str(n): c for n, c in sam.distinct_ngrams.items()},
+            "longest_repeat": {
+                "gardiner_ids": list(repeat),
+                "length": len(repeat),
+                "count": sam.count(repeat),
+            },
+            "columns": columns_stats,
+        }
+    )
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
 @bp.post("/sorting/<int:image_id>/preview")
 def preview_sorting(image_id: int):
     if not _image_exists(image_id):
@@ -185,15 +269,45 @@ def preview_sorting(image_id: int):
     if tolerance_value <= 0:
         return {"error": "tolerance must be positive"}, 400
 
-    glyph_rows = _glyph_rows(image_id)
-    if not glyph_rows:
+    previous_raw = payload.get("previous_tolerance")
+    previous_value: float | None = None
+    if previous_raw is not None:
+        try:
+            previous_value = float(previous_raw)
+        except (TypeError, ValueError):
+            return {"error": "previous_tolerance must be a number"}, 400
+        if previous_value <= 0:
+            return {"error": "previous_tolerance must be positive"}, 400
+
+    schedule = fetch_break_schedule(image_id)
+    if schedule is None:
         return {"error": "image has no glyphs"}, 400
 
     reading_direction = _reading_direction(image_id)
-    ordered_entries, _ = run_sort_algorithm(
-        glyph_rows, tolerance_value, reading_direction
-    )
-    columns_payload = _build_columns_payload(ordered_entries)
+    columns = schedule.columns(tolerance_value, reading_direction)
+
+    if previous_value is not None:
+        # Only the columns that differ from the layout at previous_tolerance;
+        # the client already holds the rest and the glyph metadata.
+        changed, column_count = schedule.changed_columns(
+            tolerance_value, previous_value, reading_direction
+        )
+        return jsonify(
+            {
+                "image_id": image_id,
+                "sort_version": "preview",
+                "tolerance": tolerance_value,
+                "previous_tolerance": previous_value,
+                "reading_direction": reading_direction,
+                "diff": True,
+                "column_count": column_count,
+                "columns": [
+                    ColumnEntry(col=c_idx, glyph_ids=columns[c_idx])
+                    for c_idx in changed
+                ],
+                "count": len(schedule.glyph_ids),
+            }
+        )
 
     return jsonify(
         {
@@ -201,56 +315,127 @@ def preview_sorting(image_id: int):
             "sort_version": "preview",
             "tolerance": tolerance_value,
             "reading_direction": reading_direction,
-            "columns": columns_payload,
+            "columns": [
+                ColumnEntry(col=c_idx, glyph_ids=glyph_ids)
+                for c_idx, glyph_ids in enumerate(columns)
+            ],
             "glyphs": _glyph_metadata(image_id),
-            "count": len(ordered_entries),
+            "count": len(schedule.glyph_ids),
         }
     )
 
 
+@bp.get("/sorting/<int:image_id>/tolerance")
+def tolerance_candidates(image_id: int):
+    """Estimated tolerances with their column counts, best first."""
+    if not _image_exists(image_id):
+        return {"error": "image not found"}, 404
+
+    top_raw = request.args.get("top", "3")
+    try:
+        top = int(top_raw)
+    except ValueError:
+        return {"error": "top must be an integer"}, 400
+    if not 1 <= top <= 10:
+        return {"error": "top must be between 1 and 10"}, 400
+
+    schedule = fetch_break_schedule(image_id)
+    if schedule is None:
+        return {"error": "image has no glyphs"}, 400
+
+    response = jsonify(
+        {
+            "image_id": image_id,
+            "count": len(schedule.glyph_ids),
+            "candidates": [
+                {
+                    "tolerance": candidate.tolerance,
+                    "column_count": candidate.column_count,
+                    "range": [round(candidate.low, 1), round(candidate.high, 1)],
+                    "score": round(candidate.score, 3),
+                }
+                for candidate in estimate_tolerances(schedule, top=top)
+            ],
+        }
+    )
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
 def _image_exists(image_id: int) -> bool:
     rows = select("SELECT 1 FROM t_images WHERE id = %s", (image_id,))
     return bool(rows)
 
 
-def _glyph_ids_for_image(image_id: int) -> set[int]:
-    rows = select("SELECT id FROM t_glyphes_raw WHERE id_image = %s", (image_id,))
-    return {int(row[0]) for row in rows}
+def _parse_columns(
+    image_id: int, columns: list
+) -> tuple[list[tuple[int, list[int]]], str | None]:
+    """Validate a columns payload; returns (columns, error message)."""
+    normalized_columns: list[tuple[int, list[int]]] = []
+    for entry in columns:
+        if not isinstance(entry, dict):
+            return [], "Invalid column entry"
+        col_idx = entry.get("col")
+        glyph_ids = entry.get("glyph_ids")
+        if not isinstance(col_idx, int) or col_idx < 0:
+            return [], "col must be a non-negative integer"
+        if not isinstance(glyph_ids, list):
+            return [], "glyph_ids must be a list"
+        glyph_list: list[int] = []
+        for glyph_id in glyph_ids:
+            if not isinstance(glyph_id, int):
+                return [], "glyph_ids must contain integers"
+            glyph_list.append(int(glyph_id))
+        if glyph_list:
+            normalized_columns.append((int(col_idx), glyph_list))
 
+    valid_glyph_ids = _glyph_ids_for_image(image_id)
+    if not valid_glyph_ids:
+        return [], "image has no glyphs"
 
-def _glyph_metadata(image_id: int) -> dict[str, dict[str, float | str]]:
+    all_glyph_ids = [gid for _, glyphs in normalized_columns for gid in glyphs]
+    invalid = [gid for gid in all_glyph_ids if gid not in valid_glyph_ids]
+    if invalid:
+        return [], f"glyph ids do not belong to image: {invalid}"
+    if len(set(all_glyph_ids)) != len(all_glyph_ids):
+        return [], "glyph ids must not appear more than once"
+    return normalized_columns, None
+
+
+def _sorted_entries(image_id: int) -> list[tuple[int, int, int]]:
     rows = select(
         """
-        SELECT gr.id, gr.bbox_x, gr.bbox_y, gr.bbox_width, gr.bbox_height,
-               gc.code, gc.unicode
-        FROM t_glyphes_raw AS gr
-        LEFT JOIN t_gardiner_codes AS gc ON gc.id = gr.id_gardiner
-        WHERE id_image = %s
+        SELECT gs.id_glyph, gs.v_column, gs.v_row
+        FROM t_glyphes_sorted AS gs
+        JOIN t_glyphes_raw AS gr ON gr.id = gs.id_glyph
+        WHERE gr.id_image = %s
         """,
         (image_id,),
     )
-    glyphs: dict[str, dict[str, float | str]] = {}
-    for glyph_id, x, y, width, height, code, unicode_val in rows:
-        glyphs[str(int(glyph_id))] = {
-            "x": float(x),
-            "y": float(y),
-            "width": float(width),
-            "height": float(height),
-            "gardiner_code": code or "",
-            "unicode": unicode_val or "",
-        }
-    return glyphs
+    return [(int(gid), int(col), int(row)) for gid, col, row in rows]
 
 
-def _glyph_rows(image_id: int) -> list[tuple]:
-    return select(
-        """
-        SELECT id, id_image, id_gardiner, bbox_x, bbox_y, bbox_width, bbox_height
-        FROM t_glyphes_raw
-        WHERE id_image = %s
-        """,
+def _has_analysis(image_id: int) -> bool:
+    rows = select(
+        "SELECT 1 FROM t_suffixarray_patterns WHERE id_image = %s LIMIT 1",
         (image_id,),
     )
+    return bool(rows)
+
+
+def _glyph_ids_for_image(image_id: int) -> set[int]:
+    geometry = get_glyph_geometry(image_id)
+    return set(geometry.ids) if geometry else set()
+
+
+def _glyph_metadata(image_id: int) -> dict[str, dict[str, float | str]]:
+    geometry = get_glyph_geometry(image_id)
+    return geometry.metadata() if geometry else {}
+
+
+def _glyph_rows(image_id: int) -> list[tuple]:
+    geometry = get_glyph_geometry(image_id)
+    return geometry.rows() if geometry else []
 
 
 def _reading_direction(image_id: int) -> str:
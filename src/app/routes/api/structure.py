@@ -8,6 +8,7 @@ from statistics import median
 from flask import jsonify
 
 from src.database.tools import select
+from src.ngram import find_ngram_occurrences
 from . import bp
 from .patterns import (
     _gardiner_map_for_ids,
@@ -151,7 +152,7 @@ def load_suffixarray_patterns(select, image_id: int) -> list[PatternRow]:
         """
         SELECT id, gardiner_ids, sequence_length, sequence_count
         FROM t_suffixarray_patterns
-        WHERE id_image = %s
+        WHERE id_image = %s AND pattern_type = 'exact'
         """,
         (image_id,),
     )
@@ -170,7 +171,7 @@ def load_top_patterns(select, image_id: int, limit: int = 10) -> list[PatternRow
         """
         SELECT id, gardiner_ids, sequence_length, sequence_count
         FROM t_suffixarray_patterns
-        WHERE id_image = %s
+        WHERE id_image = %s AND pattern_type = 'exact'
         ORDER BY sequence_count DESC, sequence_length DESC, id ASC
         LIMIT %s
         """,
@@ -194,7 +195,7 @@ def load_suffixarray_occurrences(select, image_id: int) -> list[tuple[int, tuple
         SELECT o.id_pattern, o.glyph_ids
         FROM t_suffixarray_occurences o
         JOIN t_suffixarray_patterns p ON p.id = o.id_pattern
-        WHERE p.id_image = %s
+        WHERE p.id_image = %s AND p.pattern_type = 'exact'
         """,
         (image_id,),
     )
@@ -203,6 +204,24 @@ def load_suffixarray_occurrences(select, image_id: int) -> list[tuple[int, tuple
         if not glyph_arr:
             continue
         out.append((int(pid), tuple(int(x) for x in glyph_arr)))
+
+    # patterns stored as start offsets into their reading order
+    offset_rows = select(
+        """
+        SELECT p.id, p.sequence_length, p.start_offsets, r.glyph_ids
+        FROM t_suffixarray_patterns p
+        JOIN t_reading_orders r
+          ON r.id_image = p.id_image AND r.sort_version = p.sort_version
+        WHERE p.id_image = %s AND p.storage = 'offsets'
+          AND p.pattern_type = 'exact'
+        """,
+        (image_id,),
+    )
+    for pid, length, starts, order in offset_rows:
+        for start in starts or []:
+            glyph_arr = order[start : start + length]
+            if len(glyph_arr) == length:
+                out.append((int(pid), tuple(int(x) for x in glyph_arr)))
     return out
 
 def build_glyph_index(linear: list[tuple[int, int]]) -> dict[int, int]:
@@ -304,22 +323,26 @@ def compute_stable_stems_from_linear(
     tokens = [gard for (_glyph, gard) in linear]
     n = len(tokens)
 
-    freq: Counter[tuple[int, ...]] = Counter()
-    left_dist: dict[tuple[int, ...], Counter[int]] = defaultdict(Counter)
-    right_dist: dict[tuple[int, ...], Counter[int]] = defaultdict(Counter)
-
-    for i in range(n):
-        left = BOS if i == 0 else tokens[i - 1]
-        for L in range(1, max_len + 1):
-            j = i + L
-            if j > n:
-                break
-            seq = tuple(tokens[i:j])
-            right = EOS if j == n else tokens[j]
-
-            freq[seq] += 1
-            left_dist[seq][left] += 1
-            right_dist[seq][right] += 1
+    # Count with the vectorized n-gram miner; only the frequent sequences
+    # need their left/right context distributions. Sorting by first
+    # occurrence keeps the order (and ties) of the window-by-window scan.
+    occurrences = find_ngram_occurrences(
+        tokens,
+        min_length=1,
+        max_length=max_len,
+        min_count=max(1, min_count),
+        engine="numpy",
+    )
+    freq: dict[tuple[int, ...], int] = {}
+    left_dist: dict[tuple[int, ...], Counter[int]] = {}
+    right_dist: dict[tuple[int, ...], Counter[int]] = {}
+    for seq, starts in sorted(
+        occurrences.items(), key=lambda item: (item[1][0], len(item[0]))
+    ):
+        L = len(seq)
+        freq[seq] = len(starts)
+        left_dist[seq] = Counter(BOS if i == 0 else tokens[i - 1] for i in starts)
+        right_dist[seq] = Counter(EOS if i + L == n else tokens[i + L] for i in starts)
 
     out = []
     for seq, c in freq.items():
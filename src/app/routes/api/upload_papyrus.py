@@ -8,6 +8,7 @@ import psycopg2
 from flask import current_app, jsonify, request
 from psycopg2.extras import Json
 from src.database.tools import insert
+from src.sort import DEFAULT_TOLERANCE
 from src.app.services.pipeline_service import (
     STATUS_UPLOAD_DONE,
     start_pipeline_async,
@@ -36,11 +37,17 @@ def upload_papyrus():
         papyrus_name = request.form.get("papyrus_name", "papyrus")
         reading_direction_raw = request.form.get("reading_direction", "ltr")
         reading_direction = 1 if reading_direction_raw == "rtl" else 0
+        # "auto" (opt-in) leaves it to the pipeline to estimate from the
+        # glyph layout; otherwise missing or invalid values use the default.
         sort_tolerance_raw = request.form.get("sort_tolerance")
-        try:
-            sort_tolerance = int(sort_tolerance_raw) if sort_tolerance_raw else 100
-        except ValueError:
-            sort_tolerance = 100
+        sort_tolerance: int | None = None
+        if sort_tolerance_raw != "auto":
+            try:
+                sort_tolerance = (
+                    int(sort_tolerance_raw) if sort_tolerance_raw else DEFAULT_TOLERANCE
+                )
+            except ValueError:
+                sort_tolerance = DEFAULT_TOLERANCE
         id_status = ensure_status_code(STATUS_UPLOAD_DONE, "Upload done")
 
         image_file = request.files.get("papyrus_image_file")
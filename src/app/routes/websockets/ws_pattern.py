@@ -3,9 +3,7 @@ from __future__ import annotations
 from flask import request, current_app
 
 from ... import socketio
-from src.database.tools import select, update
-from src.ngram import run_ngram
-from src.app.services.pipeline_service import emit_pipeline_status
+from src.app.services.pattern_job_service import PatternJobsBusy, submit_pattern_job
 
 
 def _emit_to_request(event: str, payload: dict) -> None:
@@ -42,58 +40,31 @@ def start_patterns(payload=None):
         )
         return
 
+    # The analysis runs on the pattern job executor; progress and completion
+    # arrive as s2c:start_patterns:progress / :done in this client's room.
     try:
-        emit_pipeline_status(
+        job, coalesced = submit_pattern_job(
             image_id_int,
-            "ANALYZE_START",
+            getattr(request, "sid", None),
             current_app._get_current_object(),  # type: ignore[attr-defined]
-            status="running",
         )
-        current_app.logger.info("[ws_pattern] ANALYZE_START image_id=%s", image_id_int)
-
-        print(f"[ws_pattern] start_patterns image_id={image_id_int} starting")
-        counts = run_ngram(image_id_int)
-        patterns = len(counts)
-        occurrences = sum(counts.values())
-        print(
-            f"[ws_pattern] start_patterns completed patterns={patterns} occurrences={occurrences}"
-        )
-        current_app.logger.info(
-            "[ws_pattern] ANALYZE_DONE image_id=%s patterns=%s occurrences=%s",
-            image_id_int,
-            patterns,
-            occurrences,
-        )
-
-        status_rows = select(
-            "SELECT id FROM T_IMAGES_STATUS WHERE status_code = %s", ("NGRAMS",)
+    except PatternJobsBusy as exc:
+        print(f"[ws_pattern] start_patterns rejected image_id={image_id_int}: {exc}")
+        _emit_to_request(
+            "s2c:start_patterns:response",
+            {"image_id": image_id_int, "status": "error", "message": str(exc)},
         )
-        if status_rows:
-            status_id = status_rows[0][0]
-            update(
-                "UPDATE T_IMAGES SET id_status = %s WHERE id = %s",
-                (status_id, image_id_int),
-            )
-            print(f"[ws_pattern] start_patterns updated status_id={status_id}")
-        else:
-            print("[ws_pattern] start_patterns missing NGRAMS status code")
+        return
 
-        emit_pipeline_status(
-            image_id_int,
-            "ANALYZE_DONE",
-            current_app._get_current_object(),  # type: ignore[attr-defined]
-            status="success",
-            extra={"patterns": patterns, "occurrences": occurrences},
-        )
-    except Exception as exc:
-        print(f"[ws_pattern] start_patterns error={exc}")
-        current_app.logger.exception(
-            "[ws_pattern] ANALYZE_ERROR image_id=%s", image_id_int
-        )
-        emit_pipeline_status(
-            image_id_int,
-            "ANALYZE_ERROR",
-            current_app._get_current_object(),  # type: ignore[attr-defined]
-            status="error",
-            extra={"message": str(exc)},
-        )
+    print(
+        f"[ws_pattern] start_patterns image_id={image_id_int} job={job.id} coalesced={coalesced}"
+    )
+    response = {
+        "image_id": image_id_int,
+        "status": "queued",
+        "job_id": job.id,
+        "stage": job.stage,
+        "coalesced": coalesced,
+    }
+    _emit_to_request("s2c:start_patterns:response", response)
+    return response
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from src.app.services.pipeline_service import emit_pipeline_status
+from src.database.tools import select, update
+from src.ngram import run_ngram
+
+# Overridable via app.config["PATTERN_JOB_WORKERS"] / ["PATTERN_JOB_MAX_PENDING"].
+DEFAULT_PATTERN_JOB_WORKERS = 2
+DEFAULT_PATTERN_JOB_MAX_PENDING = 16
+
+EVENT_PROGRESS = "s2c:start_patterns:progress"
+EVENT_DONE = "s2c:start_patterns:done"
+
+
+@dataclass
+class PatternJob:
+    """An n-gram analysis run; later requests for the image join ``sids``."""
+
+    id: str
+    image_id: int
+    sids: set[str] = field(default_factory=set)
+    stage: str = "queued"
+
+
+class PatternJobsBusy(RuntimeError):
+    """Raised when the pending job limit is reached."""
+
+
+_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+_jobs_by_image: dict[int, PatternJob] = {}
+
+
+def submit_pattern_job(image_id: int, sid: str | None, app) -> tuple[PatternJob, bool]:
+    """
+    Queue an n-gram analysis of ``image_id`` and return ``(job, coalesced)``.
+    A request for an image that already has a job queued or running joins
+    that job instead of starting another one.
+    """
+    global _executor
+    with _lock:
+        job = _jobs_by_image.get(image_id)
+        if job is not None:
+            if sid:
+                job.sids.add(sid)
+            return job, True
+
+        max_pending = int(
+            app.config.get("PATTERN_JOB_MAX_PENDING", DEFAULT_PATTERN_JOB_MAX_PENDING)
+        )
+        if len(_jobs_by_image) >= max_pending:
+            raise PatternJobsBusy(f"too many pattern jobs pending ({max_pending})")
+
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(
+                    app.config.get("PATTERN_JOB_WORKERS", DEFAULT_PATTERN_JOB_WORKERS)
+                ),
+                thread_name_prefix="pattern-job",
+            )
+        job = PatternJob(id=uuid.uuid4().hex, image_id=image_id)
+        if sid:
+            job.sids.add(sid)
+        _jobs_by_image[image_id] = job
+
+    app.logger.info("[pattern_job] queued job=%s image_id=%s", job.id, image_id)
+    _executor.submit(_run_pattern_job_safely, job, app)
+    return job, False
+
+
+def _run_pattern_job_safely(job: PatternJob, app) -> None:
+    try:
+        with app.app_context():
+            _run_pattern_job(job, app)
+    except Exception as exc:
+        app.logger.exception("[pattern_job] ANALYZE_ERROR image_id=%s", job.image_id)
+        emit_pipeline_status(
+            job.image_id,
+            "ANALYZE_ERROR",
+            app,
+            status="error",
+            extra={"message": str(exc)},
+        )
+        _finish(job, app, {"status": "error", "message": str(exc)})
+
+
+def _run_pattern_job(job: PatternJob, app) -> None:
+    emit_pipeline_status(job.image_id, "ANALYZE_START", app, status="running")
+    app.logger.info("[pattern_job] ANALYZE_START image_id=%s", job.image_id)
+    _progress(job, app, "running")
+
+    counts = run_ngram(job.image_id, progress=lambda stage: _progress(job, app, stage))
+    patterns = len(counts)
+    occurrences = sum(counts.values())
+    app.logger.info(
+        "[pattern_job] ANALYZE_DONE image_id=%s patterns=%s occurrences=%s",
+        job.image_id,
+        patterns,
+        occurrences,
+    )
+
+    status_rows = select(
+        "SELECT id FROM T_IMAGES_STATUS WHERE status_code = %s", ("NGRAMS",)
+    )
+    if status_rows:
+        update(
+            "UPDATE T_IMAGES SET id_status = %s WHERE id = %s",
+            (status_rows[0][0], job.image_id),
+        )
+    else:
+        app.logger.warning("[pattern_job] missing NGRAMS status code")
+
+    emit_pipeline_status(
+        job.image_id,
+        "ANALYZE_DONE",
+        app,
+        status="success",
+        extra={"patterns": patterns, "occurrences": occurrences},
+    )
+    _finish(
+        job,
+        app,
+        {"status": "success", "patterns": patterns, "occurrences": occurrences},
+    )
+
+
+def _progress(job: PatternJob, app, stage: str) -> None:
+    job.stage = stage
+    _emit_to_job(job, app, EVENT_PROGRESS, {"stage": stage})
+
+
+def _finish(job: PatternJob, app, payload: dict) -> None:
+    # Unregister first so a request arriving now starts a fresh job rather
+    # than joining one that has already reported.
+    with _lock:
+        if _jobs_by_image.get(job.image_id) is job:
+            del _jobs_by_image[job.image_id]
+    job.stage = payload["status"]
+    _emit_to_job(job, app, EVENT_DONE, payload)
+
+
+def _emit_to_job(job: PatternJob, app, event: str, payload: dict) -> None:
+    message = {"job_id": job.id, "image_id": job.image_id, **payload}
+    with _lock:
+        sids = list(job.sids)
+    try:
+        sio = app.extensions.get("socketio") if app else None
+        if sio:
+            for sid in sids:
+                sio.emit(event, message, to=sid)
+    except Exception:  # pragma: no cover - guard against socket failures
+        app.logger.exception("pattern job emit failed")
@@ -1,14 +1,15 @@
 from __future__ import annotations
 
 import threading
-from typing import Optional
+from typing import Any, Optional
 
 from flask import current_app
-from src.database.tools import select
+from src.database.tools import select, update
 from src.process_image import process_image
-from src.suffixarray import run_suffixarray
+from src.analysis import run_analysis
+from src.ngram import run_ngram
 from src.app.services.status_service import change_image_status, ensure_status_code
-from src.sort import run_sort
+from src.sort import DEFAULT_TOLERANCE, estimate_tolerance, run_sort
 
 STATUS_UPLOAD_DONE = "UPLOAD"
 STATUS_JSON_START = "JSON_START"
@@ -20,6 +21,24 @@ STATUS_ANALYZE_START = "ANALYZE_START"
 STATUS_ANALYZE_DONE = "ANALYZE_DONE"
 STATUS_DONE = "DONE"
 
+# Background refreshes after a sort correction report on their own event so
+# the stored pipeline status (still DONE) is left alone on the overview page.
+EVENT_ANALYSIS_REFRESH = "s2c:analysis_refresh"
+
+# Defaults for run_analysis; overridden by app.config["ANALYSIS_OPTIONS"] and
+# per image by T_IMAGES.analysis_options.
+DEFAULT_ANALYSIS_OPTIONS: dict[str, Any] = {
+    "backend": "suffixarray",
+    "min_length": 2,
+    "mode": "all",
+    "storage": "rows",
+    "top_k": None,
+    "score": "count",
+    "max_occurrences": None,
+    "wildcard": False,
+    "column_breaks": False,
+}
+
 
 def start_pipeline_async(image_id: int, app=None) -> threading.Thread:
     """Kick off the pipeline in a background thread."""
@@ -75,6 +94,48 @@ def _run_analysis_safely(image_id: int, app) -> None:
         emit_pipeline_status(image_id, "ERROR", app, extra={"message": str(exc)})
 
 
+# Images with a refresh running; True when another save asked for a rerun.
+_refresh_lock = threading.Lock()
+_refresh_rerun: dict[int, bool] = {}
+
+
+def start_refresh_async(image_id: int, app=None) -> bool:
+    """
+    Run refresh_analysis for an image in a background thread. While one runs,
+    further requests for the image are folded into a single rerun after it.
+    Returns True if a new thread was started.
+    """
+    app_obj = app or current_app._get_current_object()  # type: ignore[attr-defined]
+    with _refresh_lock:
+        if image_id in _refresh_rerun:
+            _refresh_rerun[image_id] = True
+            return False
+        _refresh_rerun[image_id] = False
+    app_obj.logger.info("[pipeline] scheduling refresh image_id=%s", image_id)
+    threading.Thread(
+        target=_run_refresh_safely, args=(int(image_id), app_obj), daemon=True
+    ).start()
+    return True
+
+
+def _run_refresh_safely(image_id: int, app) -> None:
+    while True:
+        try:
+            with app.app_context():
+                refresh_analysis(image_id, app)
+            emit_refresh_status(image_id, app, status="success")
+        except Exception as exc:  # pragma: no cover - safety net
+            app.logger.exception("analysis refresh failed", exc_info=exc)
+            emit_refresh_status(
+                image_id, app, status="error", extra={"message": str(exc)}
+            )
+        with _refresh_lock:
+            if not _refresh_rerun.get(image_id):
+                _refresh_rerun.pop(image_id, None)
+                return
+            _refresh_rerun[image_id] = False
+
+
 def _run_pipeline(image_id: int, app) -> None:
     # JSON processing
     app.logger.info("[pipeline] JSON_START image_id=%s", image_id)
@@ -96,6 +157,15 @@ def _run_pipeline(image_id: int, app) -> None:
 
     # Sort
     tolerance, reading_direction = _load_sort_params(image_id)
+    if tolerance is None:
+        tolerance = estimate_tolerance(int(image_id)) or DEFAULT_TOLERANCE
+        update(
+            "UPDATE T_IMAGES SET sort_tolerance = %s WHERE id = %s",
+            (tolerance, image_id),
+        )
+        app.logger.info(
+            "[pipeline] SORT_TOLERANCE image_id=%s estimated=%s", image_id, tolerance
+        )
     change_image_status(image_id, STATUS_SORT_START)
     app.logger.info(
         "[pipeline] SORT_START image_id=%s tolerance=%s dir=%s",
@@ -107,7 +177,7 @@ def _run_pipeline(image_id: int, app) -> None:
 
     sorted_count, _ = run_sort(
         int(image_id),
-        float(tolerance) if tolerance is not None else 100.0,
+        float(tolerance),
         reading_direction or "ltr",
     )
     app.logger.info(
@@ -124,18 +194,47 @@ def _run_pipeline(image_id: int, app) -> None:
 
 
 def _run_analysis(image_id: int, app) -> None:
-    """Second stage: pattern analysis via suffix array."""
+    """Second stage: pattern analysis with the configured backend."""
     app.logger.info("[pipeline] ANALYZE_START image_id=%s", image_id)
     change_image_status(image_id, STATUS_ANALYZE_START)
     emit_pipeline_status(image_id, STATUS_ANALYZE_START, app, status="running")
 
-    run_suffixarray(int(image_id))
+    refresh_analysis(image_id, app)
 
     app.logger.info("[pipeline] DONE image_id=%s", image_id)
     change_image_status(image_id, STATUS_DONE)
     emit_pipeline_status(image_id, STATUS_DONE, app, status="success")
 
 
+def refresh_analysis(image_id: int, app) -> None:
+    """
+    Re-run the pattern analysis and update the stored patterns in place,
+    rewriting only those whose occurrences changed since the last run.
+    Stored n-gram results (c2s:start_patterns) are updated the same way.
+    """
+    options = _load_analysis_params(image_id, app)
+    app.logger.info("[pipeline] analysis options image_id=%s %s", image_id, options)
+    run_analysis(
+        int(image_id),
+        backend=str(options["backend"]),
+        min_length=int(options["min_length"]),
+        mode=str(options["mode"]),
+        storage=str(options["storage"]),
+        incremental=True,
+        top_k=_optional_int(options["top_k"]),
+        score=str(options["score"]),
+        max_occurrences=_optional_int(options["max_occurrences"]),
+        wildcard=bool(options["wildcard"]),
+        column_breaks=bool(options["column_breaks"]),
+    )
+    if select("SELECT 1 FROM T_NGRAM_PATTERN WHERE id_image = %s LIMIT 1", (image_id,)):
+        run_ngram(int(image_id), incremental=True)
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    return None if value is None else int(value)
+
+
 def _load_sort_params(image_id: int) -> tuple[Optional[float], Optional[str]]:
     rows = select(
         "SELECT sort_tolerance, reading_direction FROM T_IMAGES WHERE id = %s",
@@ -148,6 +247,18 @@ def _load_sort_params(image_id: int) -> tuple[Optional[float], Optional[str]]:
     return tolerance, reading_direction
 
 
+def _load_analysis_params(image_id: int, app) -> dict[str, Any]:
+    options = dict(DEFAULT_ANALYSIS_OPTIONS)
+    options.update(app.config.get("ANALYSIS_OPTIONS") or {})
+    rows = select(
+        "SELECT analysis_options FROM T_IMAGES WHERE id = %s",
+        (image_id,),
+    )
+    if rows and isinstance(rows[0][0], dict):
+        options.update(rows[0][0])
+    return options
+
+
 def emit_pipeline_status(
     image_id: int,
     status_code: str,
@@ -160,11 +271,25 @@ def emit_pipeline_status(
         payload["status"] = status
     if extra:
         payload.update(extra)
+    _broadcast("s2c:pipeline_status", payload, app)
+
+
+def emit_refresh_status(
+    image_id: int, app, status: str, extra: dict | None = None
+) -> None:
+    """Report the end of a background refresh without touching the pipeline status."""
+    payload = {"image_id": image_id, "status": status}
+    if extra:
+        payload.update(extra)
+    _broadcast(EVENT_ANALYSIS_REFRESH, payload, app)
+
+
+def _broadcast(event: str, payload: dict, app) -> None:
     try:
         sio = app.extensions.get("socketio") if app else None
         if sio:
             # Flask-SocketIO 5+ no longer accepts broadcast kwarg; emitting without a room targets all clients.
-            sio.emit("s2c:pipeline_status", payload)
+            sio.emit(event, payload)
     except Exception as exc:  # pragma: no cover - guard against socket failures
         try:
             if app:
@@ -37,6 +37,8 @@
   const ZOOM_IN_FACTOR = 0.93;
   const ZOOM_OUT_FACTOR = 1.07;
   const PAN_SENSITIVITY = 0.75;
+  const STATS_DEBOUNCE_MS = 300;
+  const STATS_NGRAM_LENGTHS = [2, 3];
 
   const sortState = {
     root: null,
@@ -71,6 +73,8 @@
     },
     lastAutomaticTolerance: null,
     hasUnsavedChanges: false,
+    statsTimer: null,
+    statsRequestId: 0,
   };
 
   document.addEventListener("DOMContentLoaded", () => {
@@ -198,18 +202,40 @@
     button.disabled = true;
     button.classList.add("opacity-60", "pointer-events-none");
     setLoadingState(state, "snapshot", true);
+    // After the first preview only the columns that changed since the last
+    // preview are requested and patched into a copy of that preview.
+    const lastPreview = state.lastPreview;
+    const body = { tolerance };
+    if (lastPreview) {
+      body.previous_tolerance = lastPreview.tolerance;
+    }
     try {
       const response = await fetch(`/api/sorting/${imageId}/preview`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ tolerance }),
+        body: JSON.stringify(body),
       });
       if (!response.ok) {
         throw new Error(`Request failed (${response.status})`);
       }
-      const snapshot = await response.json();
+      let snapshot = await response.json();
+      if (snapshot.diff && lastPreview) {
+        const columns = lastPreview.columns.slice(0, snapshot.column_count);
+        snapshot.columns.forEach((column) => {
+          columns[column.col] = column;
+        });
+        snapshot = { ...snapshot, columns, glyphs: lastPreview.glyphs };
+      }
+      state.lastPreview = {
+        tolerance,
+        columns: snapshot.columns.map((column) => ({
+          col: column.col,
+          glyph_ids: [...column.glyph_ids],
+        })),
+        glyphs: snapshot.glyphs,
+      };
       state.lastAutomaticTolerance = tolerance;
       applySortingSnapshot(snapshot, state, { markUnsaved: true });
     } catch (error) {
@@ -1013,6 +1039,72 @@
     renderManualColumns(state);
     onColumnFocusChange(state);
     setUnsavedChanges(state, markUnsaved ? true : false);
+    scheduleSortingStats(state);
+  }
+
+  // Repeat statistics of the current (possibly unsaved) columns, computed
+  // server-side by streaming the glyphs into a suffix automaton.
+  function scheduleSortingStats(state) {
+    if (!state?.root?.dataset.imageId) {
+      return;
+    }
+    clearTimeout(state.statsTimer);
+    state.statsTimer = setTimeout(
+      () => refreshSortingStats(state),
+      STATS_DEBOUNCE_MS,
+    );
+  }
+
+  async function refreshSortingStats(state) {
+    const imageId = state.root.dataset.imageId;
+    const requestId = state.statsRequestId + 1;
+    state.statsRequestId = requestId;
+    try {
+      const response = await fetch(`/api/sorting/${imageId}/stats`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({
+          columns: normalizeColumnsForRequest(state.columns),
+          ngram_lengths: STATS_NGRAM_LENGTHS,
+        }),
+      });
+      if (!response.ok) {
+        throw new Error(`Request failed (${response.status})`);
+      }
+      const stats = await response.json();
+      if (requestId === state.statsRequestId) {
+        renderSortingStats(state.root, stats);
+      }
+    } catch (error) {
+      console.error("Failed to load sorting statistics", error);
+    }
+  }
+
+  function renderSortingStats(root, stats) {
+    const lengthEl = root.querySelector("[data-sort-stats-length]");
+    if (lengthEl) {
+      lengthEl.textContent = String(stats?.length ?? "—");
+    }
+    root.querySelectorAll("[data-sort-stats-ngram]").forEach((el) => {
+      const value = stats?.distinct_ngrams?.[el.dataset.sortStatsNgram];
+      el.textContent = value === undefined ? "—" : String(value);
+    });
+    const repeatEl = root.querySelector("[data-sort-stats-repeat]");
+    if (repeatEl) {
+      const repeat = stats?.longest_repeat;
+      if (!repeat?.length) {
+        repeatEl.textContent = "—";
+      } else {
+        // Column in which the streamed order first reached this length.
+        const reached = (stats.columns || []).find(
+          (column) => column.longest_repeat_length >= repeat.length,
+        );
+        const where = reached ? `, from column ${reached.col}` : "";
+        repeatEl.textContent = `${repeat.length} signs × ${repeat.count}${where}`;
+      }
+    }
   }
 
   function updateToleranceLabel(root, value) {
@@ -1774,6 +1866,7 @@
     renderColumnChart(state.root, { columns: state.columns }, state);
     onColumnFocusChange(state);
     setUnsavedChanges(state, true);
+    scheduleSortingStats(state);
   }
 
   function getGlyphSortKey(glyphs, glyphId) {
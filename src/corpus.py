@@ -0,0 +1,284 @@
+"""Generalized suffix array over the reading orders of all images.
+
+Every image's Gardiner sequence is followed by its own negative separator, so
+no common prefix (and therefore no repeat) can span two images. Repeats are
+mined in a single pass over the combined LCP array and reported with
+per-image occurrence counts.
+"""
+
+import argparse
+import struct
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+from src.database.tools import select
+from src.suffixarray import (
+    INDEX_DIR,
+    build_lcp_array,
+    build_suffix_array,
+    iter_lcp_intervals,
+    iter_repeat_intervals,
+    map_int32_file,
+    write_int32_file,
+)
+
+CORPUS_INDEX_PATH = INDEX_DIR / "corpus.sai"
+_CORPUS_MAGIC = b"HPACORP1"
+_CORPUS_HEADER = struct.Struct("<8sqq")  # magic, image count, text length
+
+
+@dataclass(frozen=True)
+class CorpusIndex:
+    """
+    ``image_ids[k]`` was sorted at ``sort_versions[k]`` and occupies
+    ``seq[offsets[k]:offsets[k + 1] - 1]``; the slot before ``offsets[k + 1]``
+    holds its separator ``-(k + 1)``.
+    """
+
+    image_ids: Sequence[int]
+    sort_versions: Sequence[int]
+    offsets: Sequence[int]
+    seq: Sequence[int]
+    glyph_ids: Sequence[int]
+    sa: Sequence[int]
+    lcp: Sequence[int]
+
+    def image_at(self, pos: int) -> int:
+        return self.image_ids[bisect_right(self.offsets, pos) - 1]
+
+    def local_position(self, pos: int) -> tuple[int, int]:
+        """Map a corpus position to (image_id, position in that image)."""
+        k = bisect_right(self.offsets, pos) - 1
+        return self.image_ids[k], pos - self.offsets[k]
+
+
+def fetch_corpus_sequences() -> dict[int, list[tuple[int, int]]]:
+    """Reading orders of all sorted images as (gardiner_id, glyph_id) pairs."""
+    rows = select(
+        """
+        SELECT gr.id_image, gr.id_gardiner, gr.id
+        FROM T_GLYPHES_SORTED AS gs
+        JOIN T_GLYPHES_RAW AS gr ON gr.id = gs.id_glyph
+        WHERE gr.id_gardiner IS NOT NULL
+        ORDER BY gr.id_image, gs.v_column, gs.v_row
+        """
+    )
+    sequences: dict[int, list[tuple[int, int]]] = {}
+    for image_id, gardiner_id, glyph_id in rows:
+        sequences.setdefault(int(image_id), []).append(
+            (int(gardiner_id), int(glyph_id))
+        )
+    return sequences
+
+
+def fetch_sort_versions() -> dict[int, int]:
+    rows = select("SELECT id, sort_version FROM T_IMAGES")
+    return {int(image_id): int(version or 0) for image_id, version in rows}
+
+
+def build_corpus_index(
+    sequences: dict[int, list[tuple[int, int]]],
+    sort_versions: dict[int, int],
+) -> CorpusIndex:
+    image_ids = array("i", sorted(sequences))
+    offsets = array("i")
+    seq = array("i")
+    glyph_ids = array("i")
+    for k, image_id in enumerate(image_ids):
+        offsets.append(len(seq))
+        for gardiner_id, glyph_id in sequences[image_id]:
+            seq.append(gardiner_id)
+            glyph_ids.append(glyph_id)
+        seq.append(-(k + 1))
+        glyph_ids.append(-1)
+    offsets.append(len(seq))
+
+    sa = build_suffix_array(seq)
+    return CorpusIndex(
+        image_ids=image_ids,
+        sort_versions=array("i", (sort_versions.get(i, 0) for i in image_ids)),
+        offsets=offsets,
+        seq=seq,
+        glyph_ids=glyph_ids,
+        sa=sa,
+        lcp=build_lcp_array(seq, sa),
+    )
+
+
+def write_corpus_index(index: CorpusIndex, path: Path = CORPUS_INDEX_PATH) -> Path:
+    header = _CORPUS_HEADER.pack(_CORPUS_MAGIC, len(index.image_ids), len(index.seq))
+    write_int32_file(
+        path,
+        header,
+        (
+            index.image_ids,
+            index.sort_versions,
+            index.offsets,
+            index.seq,
+            index.glyph_ids,
+            index.sa,
+            index.lcp,
+        ),
+    )
+    return path
+
+
+def load_corpus_index(path: Path = CORPUS_INDEX_PATH) -> CorpusIndex | None:
+    if not path.exists():
+        return None
+    header, view = map_int32_file(path, _CORPUS_HEADER.size)
+    if len(header) < _CORPUS_HEADER.size:
+        return None
+    magic, images, n = _CORPUS_HEADER.unpack(header)
+    if magic != _CORPUS_MAGIC or len(view) < 3 * images + 1 + 4 * n:
+        return None
+
+    cursor = 0
+
+    def take(count: int) -> Sequence[int]:
+        nonlocal cursor
+        chunk = view[cursor : cursor + count]
+        cursor += count
+        return chunk
+
+    return CorpusIndex(
+        image_ids=take(images),
+        sort_versions=take(images),
+        offsets=take(images + 1),
+        seq=take(n),
+        glyph_ids=take(n),
+        sa=take(n),
+        lcp=take(n),
+    )
+
+
+def get_corpus_index() -> CorpusIndex | None:
+    """
+    Return the corpus index, rebuilding it when an image was removed, sorted
+    or re-sorted since it was written.
+    """
+    versions = fetch_sort_versions()
+    index = load_corpus_index()
+    if index is not None:
+        indexed = dict(zip(index.image_ids, index.sort_versions))
+        sorted_images = {image_id for image_id, v in versions.items() if v > 0}
+        if sorted_images <= set(indexed) and all(
+            versions.get(image_id) == version for image_id, version in indexed.items()
+        ):
+            return index
+
+    sequences = fetch_corpus_sequences()
+    if not sequences:
+        return None
+    # Sorted images without any Gardiner code are indexed with an empty
+    # sequence, so the check above does not miss them on every call.
+    for image_id, version in versions.items():
+        if version > 0:
+            sequences.setdefault(image_id, [])
+    index = build_corpus_index(sequences, versions)
+    write_corpus_index(index)
+    return index
+
+
+def _interval_image_counts(
+    index: CorpusIndex, *, min_length: int, min_images: int
+) -> dict[tuple[int, int], dict[int, int]]:
+    """
+    Per-image occurrence counts of every lcp-interval ``(lb, rb)`` spanning
+    at least ``min_images`` images. Intervals arrive bottom-up, so each one
+    takes over the counters of its child intervals (merging the smaller into
+    the larger) and only adds the suffixes no child covers: O(n log n) overall
+    instead of rescanning every interval.
+    """
+    owner = array("i", bytes(4 * len(index.seq)))
+    for k, image_id in enumerate(index.image_ids):
+        for pos in range(index.offsets[k], index.offsets[k + 1]):
+            owner[pos] = image_id
+
+    sa = index.sa
+    spread: dict[tuple[int, int], dict[int, int]] = {}
+    # Closed intervals not yet absorbed by their parent: (lb, rb, counts)
+    pending: list[tuple[int, int, Counter]] = []
+    for _, lb, rb, _, _ in iter_lcp_intervals(index.lcp, min_length=min_length):
+        counts: Counter = Counter()
+        idx = rb
+        while pending and pending[-1][0] >= lb:
+            child_lb, child_rb, child = pending.pop()
+            for leaf in range(child_rb + 1, idx + 1):
+                counts[owner[sa[leaf]]] += 1
+            idx = child_lb - 1
+            if len(child) > len(counts):
+                counts, child = child, counts
+            for image_id, count in child.items():
+                counts[image_id] += count
+        for leaf in range(lb, idx + 1):
+            counts[owner[sa[leaf]]] += 1
+
+        if len(counts) >= min_images:
+            spread[(lb, rb)] = dict(sorted(counts.items()))
+        pending.append((lb, rb, counts))
+    return spread
+
+
+def find_cross_image_repeats(
+    index: CorpusIndex,
+    *,
+    min_length: int = 2,
+    min_images: int = 2,
+    mode: str = "maximal",
+) -> list[dict]:
+    """
+    Repeats occurring in at least ``min_images`` images, with their total
+    count and per-image occurrence counts, sorted by image spread, count and
+    length (descending).
+    """
+    results: list[dict] = []
+    seq, sa = index.seq, index.sa
+    spread = _interval_image_counts(index, min_length=min_length, min_images=min_images)
+
+    for lengths, lb, rb in iter_repeat_intervals(
+        seq, sa, index.lcp, min_length=min_length, mode=mode
+    ):
+        per_image = spread.get((lb, rb))
+        if per_image is None:
+            continue
+        start = sa[lb]
+        for length in lengths:
+            results.append(
+                {
+                    "seq": tuple(seq[start : start + length]),
+                    "length": length,
+                    "count": rb - lb + 1,
+                    "images": per_image,
+                }
+            )
+
+    results.sort(key=lambda r: (-len(r["images"]), -r["count"], -r["length"]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="List repeats shared by several images"
+    )
+    parser.add_argument("--min-length", type=int, default=2)
+    parser.add_argument("--min-images", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = get_corpus_index()
+    if corpus is None:
+        print("No sorted images found")
+    else:
+        repeats = find_cross_image_repeats(
+            corpus, min_length=args.min_length, min_images=args.min_images
+        )
+        print(f"{len(repeats)} repeats shared by >= {args.min_images} images")
+        for row in repeats[: args.limit]:
+            print(
+                f"{row['length']:<4} {row['count']:<5} {row['images']} {list(row['seq'])}"
+            )
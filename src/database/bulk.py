@@ -0,0 +1,68 @@
+"""Cursor-level helpers for bulk writes inside a caller-managed transaction."""
+
+import io
+from typing import Any, Iterable, Sequence
+
+
+def reserve_ids(cur, sequence_name: str, count: int) -> list[int]:
+    """
+    Draw ``count`` ids from a Postgres sequence in one round trip so rows can
+    be linked client-side before they are written.
+    """
+    if count <= 0:
+        return []
+    cur.execute(
+        "SELECT nextval(%s) FROM generate_series(1, %s)",
+        (sequence_name, count),
+    )
+    return [int(row[0]) for row in cur.fetchall()]
+
+
+def copy_rows(
+    cur,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+) -> int:
+    """
+    Stream ``rows`` into ``table`` with COPY ... FROM STDIN (text format).
+    Supports None, numbers, strings and lists of those (as Postgres arrays).
+    Returns the number of rows written.
+    """
+    buf = io.StringIO()
+    count = 0
+    for row in rows:
+        buf.write("\t".join(_copy_value(value) for value in row))
+        buf.write("\n")
+        count += 1
+    if not count:
+        return 0
+
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN",
+        buf,
+    )
+    return count
+
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, (list, tuple)):
+        inner = ",".join(
+            "NULL" if item is None else _escape(str(item)) for item in value
+        )
+        return _escape("{" + inner + "}")
+    if isinstance(value, float):
+        return repr(value)
+    return _escape(str(value))
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
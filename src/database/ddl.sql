@@ -12,7 +12,10 @@ create table T_IMAGES(
 	mimetype			text 	not null,
 	reading_direction 	numeric(1,0) default 0 not null,
 	id_status 			integer not null,
-	sort_tolerance		integer not null,
+	sort_tolerance		integer,
+	sort_version		integer default 0 not null,
+	glyph_version		integer default 0 not null,
+	analysis_options	jsonb,
 	constraint			T_IMAGES_PK primary key (id),
 	constraint 			T_IMAGES_FK foreign key(id_status) references T_IMAGES_STATUS(id)
 );
@@ -36,6 +39,14 @@ comment on column t_images.reading_direction
 is 'saves the reading direction (0 = left to right, 1 = right to left)';
 comment on column t_images.id_status
 is 'status - foreign key to t_images_status table';
+comment on column t_images.sort_tolerance
+is 'column tolerance of the reading-order sort in px (null = estimate from the glyph layout)';
+comment on column t_images.sort_version
+is 'incremented whenever the sorted reading order (T_GLYPHES_SORTED) is rewritten';
+comment on column t_images.glyph_version
+is 'incremented whenever the glyphs of the image (T_GLYPHES_RAW) are (re)inserted';
+comment on column t_images.analysis_options
+is 'per-image overrides for the pattern analysis (e.g. {"mode": "maximal"})';
 
 -- SEQUENCE
 create sequence T_IMAGES_SEQ
@@ -178,6 +189,32 @@ is 'column position after sorting';
 comment on column t_glyphes_sorted.v_row
 is 'row position after sorting';
 
+------------------------------------------------------------------
+-- T_READING_ORDERS
+------------------------------------------------------------------
+
+-- TABLE
+create table T_READING_ORDERS(
+    id_image        integer not null,
+    sort_version    integer not null,
+    glyph_ids       integer[] not null,
+    v_columns       integer[] not null,
+    constraint      T_READING_ORDERS_PK primary key (id_image, sort_version),
+    constraint      T_READING_ORDERS_FK foreign key (id_image) references T_IMAGES(id) on delete cascade
+);
+
+-- COMMENTS
+comment on table T_READING_ORDERS
+is 'stores the glyph reading order an analysis ran on, per image and sort version';
+comment on column t_reading_orders.id_image
+is 'Foreign Key to T_IMAGES';
+comment on column t_reading_orders.sort_version
+is 'value of t_images.sort_version the reading order was taken at';
+comment on column t_reading_orders.glyph_ids
+is 'IDs of Glyphes in reading order (column by column)';
+comment on column t_reading_orders.v_columns
+is 'column of each glyph in glyph_ids at that sort version';
+
 ------------------------------------------------------------------
 -- T_IMAGES_STATUS
 ------------------------------------------------------------------
@@ -426,6 +463,10 @@ create table T_SUFFIXARRAY_PATTERNS
 	gardiner_ids    integer[] not null,
 	sequence_length integer not null,
 	sequence_count  integer not null,
+	sort_version    integer,
+	start_offsets   integer[],
+	pattern_type    text not null default 'exact',
+	storage         text not null default 'rows',
 	constraint      T_SUFFIXARRAY_PATTERNS_PK primary key (id),
 	constraint      T_SUFFIXARRAY_PATTERNS_FK foreign key (id_image) references T_IMAGES(id) on delete cascade
 );
@@ -439,7 +480,7 @@ increment by 1;
 create or replace function SET_T_SUFFIXARRAY_PATTERN_ID()
 returns trigger as $$
 begin
-    new.id := nextval('T_SUFFIXARRAY_PATTERN_SEQ');
+    new.id := coalesce(new.id, nextval('T_SUFFIXARRAY_PATTERN_SEQ'));
     return new;
 end;
 $$ language plpgsql;
@@ -458,11 +499,19 @@ is 'Primary Key';
 comment on column T_SUFFIXARRAY_PATTERNS.id_image
 is 'Foreign Key to T_IMAGES';
 comment on column T_SUFFIXARRAY_PATTERNS.gardiner_ids
-is 'IDs of Gardiner Codes in the repeated sequence';
+is 'IDs of Gardiner Codes in the repeated sequence; NULL marks the wildcard slot of a wildcard pattern';
 comment on column T_SUFFIXARRAY_PATTERNS.sequence_length
 is 'length of the repeated sequence';
 comment on column T_SUFFIXARRAY_PATTERNS.sequence_count
 is 'number of occurences of the repeated sequence';
+comment on column T_SUFFIXARRAY_PATTERNS.sort_version
+is 'reading order (T_READING_ORDERS) the start offsets refer to';
+comment on column T_SUFFIXARRAY_PATTERNS.start_offsets
+is 'occurence start positions in the reading order (sort_version)';
+comment on column T_SUFFIXARRAY_PATTERNS.pattern_type
+is 'exact: exact repeat; wildcard: repeat with one sign that varies between occurences';
+comment on column T_SUFFIXARRAY_PATTERNS.storage
+is 'rows: occurences stored in T_SUFFIXARRAY_OCCURENCES; offsets: derived from start_offsets on read';
 
 
 
@@ -487,7 +536,7 @@ INCREMENT BY 1;
 CREATE OR REPLACE FUNCTION SET_T_SUFFIXARRAY_OCCURENCES_ID()
 RETURNS TRIGGER AS $$
 BEGIN
-    NEW.id := nextval('T_SUFFIXARRAY_OCCURENCES_SEQ');
+    NEW.id := coalesce(NEW.id, nextval('T_SUFFIXARRAY_OCCURENCES_SEQ'));
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -531,7 +580,7 @@ INCREMENT BY 1;
 CREATE OR REPLACE FUNCTION SET_T_SUFFIXARRAY_OCCURENCES_BBOXES_ID()
 RETURNS TRIGGER AS $$
 BEGIN
-	NEW.id := nextval('T_SUFFIXARRAY_OCCURENCES_BBOXES_SEQ');
+	NEW.id := coalesce(NEW.id, nextval('T_SUFFIXARRAY_OCCURENCES_BBOXES_SEQ'));
 	RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -0,0 +1,171 @@
+"""In-process cache of per-image glyph geometry.
+
+Previews, the sorting and glyph statistics endpoints and the pattern
+occurrence bboxes all need the boxes, Gardiner ids and columns of an image's
+glyphs. They are loaded once per image into a few flat arrays and shared
+until the image's version changes. The version is kept in T_IMAGES, so
+writes from other processes (CLI, other workers) are seen as well:
+sort_version is bumped by every rewrite of T_GLYPHES_SORTED and
+glyph_version by process_image when glyphs are (re)inserted. Checking it
+costs one primary key lookup instead of fetching all rows.
+"""
+
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from src.database.tools import select, update
+
+GLYPH_CACHE_SIZE = 32
+
+# Stands for "no Gardiner code" / "not sorted" in the int arrays.
+MISSING = -1
+
+
+@dataclass(frozen=True)
+class GlyphGeometry:
+    """
+    Glyphs of one image in id order: ``ids``, their boxes (``x``, ``y``,
+    ``width``, ``height``), ``gardiner_ids`` and sorted ``columns`` (MISSING
+    where absent), and ``codes`` mapping a Gardiner id to (code, unicode).
+    ``glyph_version`` is T_IMAGES.glyph_version when they were loaded.
+    """
+
+    image_id: int
+    glyph_version: int
+    ids: array
+    x: array
+    y: array
+    width: array
+    height: array
+    gardiner_ids: array
+    columns: array
+    codes: dict[int, tuple[str, str]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self) -> list[tuple]:
+        """(id, id_image, id_gardiner, bbox_x, bbox_y, bbox_width, bbox_height)."""
+        return [
+            (
+                glyph_id,
+                self.image_id,
+                None if gardiner_id == MISSING else gardiner_id,
+                x,
+                y,
+                width,
+                height,
+            )
+            for glyph_id, gardiner_id, x, y, width, height in zip(
+                self.ids, self.gardiner_ids, self.x, self.y, self.width, self.height
+            )
+        ]
+
+    def metadata(self, *, gardiner_id: bool = False) -> dict[str, dict]:
+        """Glyph id (as str) -> box, Gardiner code and unicode, as sent to the UI."""
+        glyphs: dict[str, dict] = {}
+        for pos, glyph_id in enumerate(self.ids):
+            gid = self.gardiner_ids[pos]
+            code, unicode_val = self.codes.get(gid, ("", ""))
+            meta: dict = {
+                "x": self.x[pos],
+                "y": self.y[pos],
+                "width": self.width[pos],
+                "height": self.height[pos],
+            }
+            if gardiner_id:
+                meta["gardiner_id"] = None if gid == MISSING else gid
+            meta["gardiner_code"] = code
+            meta["unicode"] = unicode_val
+            glyphs[str(glyph_id)] = meta
+        return glyphs
+
+    def column_map(self) -> dict[int, tuple[float, float, float, float, int]]:
+        """Glyph id -> (x, y, width, height, column); unsorted glyphs in column 0."""
+        return {
+            glyph_id: (x, y, width, height, col if col != MISSING else 0)
+            for glyph_id, x, y, width, height, col in zip(
+                self.ids, self.x, self.y, self.width, self.height, self.columns
+            )
+        }
+
+
+_lock = threading.Lock()
+_cache: "OrderedDict[int, tuple[tuple[int, int], GlyphGeometry]]" = OrderedDict()
+
+
+def bump_glyph_version(image_id: int) -> None:
+    """Mark the raw glyphs of an image as rewritten."""
+    update(
+        "UPDATE T_IMAGES SET glyph_version = glyph_version + 1 WHERE id = %s",
+        (image_id,),
+    )
+
+
+def get_glyph_geometry(image_id: int) -> Optional[GlyphGeometry]:
+    """Cached geometry of an image's glyphs; None if the image does not exist."""
+    rows = select(
+        "SELECT sort_version, glyph_version FROM T_IMAGES WHERE id = %s",
+        (image_id,),
+    )
+    if not rows:
+        return None
+    version = (int(rows[0][0] or 0), int(rows[0][1] or 0))
+    with _lock:
+        cached = _cache.get(image_id)
+        if cached is not None and cached[0] == version:
+            _cache.move_to_end(image_id)
+            return cached[1]
+
+    geometry = _load_glyph_geometry(image_id, version[1])
+    with _lock:
+        _cache[image_id] = (version, geometry)
+        _cache.move_to_end(image_id)
+        while len(_cache) > GLYPH_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return geometry
+
+
+def _load_glyph_geometry(image_id: int, glyph_version: int) -> GlyphGeometry:
+    rows = select(
+        """
+        SELECT gr.id, gr.bbox_x, gr.bbox_y, gr.bbox_width, gr.bbox_height,
+               gr.id_gardiner, gs.v_column, gc.code, gc.unicode
+        FROM T_GLYPHES_RAW AS gr
+        LEFT JOIN T_GLYPHES_SORTED AS gs ON gs.id_glyph = gr.id
+        LEFT JOIN T_GARDINER_CODES AS gc ON gc.id = gr.id_gardiner
+        WHERE gr.id_image = %s
+        ORDER BY gr.id
+        """,
+        (image_id,),
+    )
+    ids, gardiner_ids, columns = array("q"), array("q"), array("q")
+    xs, ys, widths, heights = array("d"), array("d"), array("d"), array("d")
+    codes: dict[int, tuple[str, str]] = {}
+    for glyph_id, x, y, width, height, gardiner_id, col, code, unicode_val in rows:
+        ids.append(int(glyph_id))
+        xs.append(float(x))
+        ys.append(float(y))
+        widths.append(float(width))
+        heights.append(float(height))
+        if gardiner_id is None:
+            gardiner_ids.append(MISSING)
+        else:
+            gardiner_ids.append(int(gardiner_id))
+            codes[int(gardiner_id)] = (code or "", unicode_val or "")
+        columns.append(MISSING if col is None else int(col))
+    return GlyphGeometry(
+        image_id=image_id,
+        glyph_version=glyph_version,
+        ids=ids,
+        x=xs,
+        y=ys,
+        width=widths,
+        height=heights,
+        gardiner_ids=gardiner_ids,
+        columns=columns,
+        codes=codes,
+    )
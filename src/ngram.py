@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import argparse
+import time
 from collections import Counter
-from typing import Sequence
+from typing import Callable, Sequence
 
+import numpy as np
 import psycopg2.extras
 
 from src.database.connect import connect
 from src.database.tools import delete, insert, select
+from src.suffixarray import REPEAT_MODES
 
 
 def fetch_sorted_gardiner_ids(image_id: int) -> list[tuple[int, int]]:
@@ -30,12 +34,35 @@ def fetch_sorted_gardiner_ids(image_id: int) -> list[tuple[int, int]]:
     return sequence
 
 
+NGRAM_ENGINES = ("python", "numpy")
+
+
 def find_ngram_occurrences(
     gardiner_ids: Sequence[int],
     *,
     min_length: int,
     max_length: int,
+    min_count: int = 1,
+    engine: str = "python",
 ) -> dict[tuple[int, ...], list[int]]:
+    """
+    Map every n-gram of ``min_length`` to ``max_length`` symbols occurring at
+    least ``min_count`` times to its start positions.
+
+    With ``min_count`` > 1 the n-grams are mined level-wise (Apriori): an
+    n-gram is only extended by one symbol if it is frequent itself, so the
+    long unique n-grams that dominate a text are never built.
+    """
+    if engine not in NGRAM_ENGINES:
+        raise ValueError(f"engine must be one of {NGRAM_ENGINES}, got {engine!r}")
+    if engine == "numpy":
+        return _find_ngram_occurrences_numpy(
+            gardiner_ids,
+            min_length=min_length,
+            max_length=max_length,
+            min_count=min_count,
+        )
+
     occurrences: dict[tuple[int, ...], list[int]] = {}
     total = len(gardiner_ids)
     if total < min_length:
@@ -43,6 +70,39 @@ def find_ngram_occurrences(
 
     max_n = min(max_length, total)
 
+    if min_count > 1:
+        level: dict[tuple[int, ...], list[int]] = {}
+        for start in range(total - min_length + 1):
+            level.setdefault(
+                tuple(gardiner_ids[start : start + min_length]), []
+            ).append(start)
+
+        n = min_length
+        while level:
+            level = {
+                ngram: starts
+                for ngram, starts in level.items()
+                if len(starts) >= min_count
+            }
+            occurrences.update(level)
+            if n >= max_n:
+                break
+
+            # Positions carry forward: an extension can only start where its
+            # prefix does.
+            extended: dict[tuple[int, ...], list[int]] = {}
+            for ngram, starts in level.items():
+                for start in starts:
+                    end = start + n
+                    if end < total:
+                        extended.setdefault(ngram + (gardiner_ids[end],), []).append(
+                            start
+                        )
+            level = extended
+            n += 1
+
+        return occurrences
+
     for n in range(min_length, max_n + 1):
         limit = total - n + 1
         for start in range(limit):
@@ -52,57 +112,153 @@ def find_ngram_occurrences(
     return occurrences
 
 
+def _find_ngram_occurrences_numpy(
+    gardiner_ids: Sequence[int],
+    *,
+    min_length: int,
+    max_length: int,
+    min_count: int = 1,
+) -> dict[tuple[int, ...], list[int]]:
+    # Every window gets a dense group id per length: the (n+1)-gram key of a
+    # window is group_n * alphabet + next symbol, regrouped with np.unique.
+    # Keys stay below total**2, so int64 never overflows. Only windows in
+    # groups of at least min_count are extended, as in the Python path.
+    occurrences: dict[tuple[int, ...], list[int]] = {}
+    total = len(gardiner_ids)
+    if total < max(min_length, 1):
+        return occurrences
+
+    max_n = min(max_length, total)
+    alphabet, symbols = np.unique(
+        np.asarray(gardiner_ids, dtype=np.int64), return_inverse=True
+    )
+    symbols = symbols.astype(np.int64)
+    radix = np.int64(len(alphabet))
+
+    starts = np.arange(total, dtype=np.int64)
+    groups = symbols
+    n = 1
+    while starts.size:
+        if n >= min_length:
+            _, groups, counts = np.unique(
+                groups, return_inverse=True, return_counts=True
+            )
+            keep = counts[groups] >= min_count
+            starts, groups = starts[keep], groups[keep].astype(np.int64)
+            _collect_ngram_groups(occurrences, gardiner_ids, starts, groups, n)
+        elif n > 1:
+            groups = np.unique(groups, return_inverse=True)[1].astype(np.int64)
+        if n >= max_n:
+            break
+
+        following = starts + n
+        extend = following < total
+        starts, groups = starts[extend], groups[extend]
+        groups = groups * radix + symbols[following[extend]]
+        n += 1
+
+    return occurrences
+
+
+def _collect_ngram_groups(
+    occurrences: dict[tuple[int, ...], list[int]],
+    gardiner_ids: Sequence[int],
+    starts: np.ndarray,
+    groups: np.ndarray,
+    n: int,
+) -> None:
+    if not starts.size:
+        return
+    # A stable sort keeps the positions of each group ascending.
+    order = np.argsort(groups, kind="stable")
+    positions = starts[order].tolist()
+    bounds = (np.flatnonzero(np.diff(groups[order])) + 1).tolist()
+    for lo, hi in zip([0, *bounds], [*bounds, len(positions)]):
+        start = positions[lo]
+        occurrences[tuple(gardiner_ids[start : start + n])] = positions[lo:hi]
+
+
 def filter_closed_patterns(
     occurrences: dict[tuple[int, ...], list[int]],
 ) -> dict[tuple[int, ...], list[int]]:
-    filtered: dict[tuple[int, ...], list[int]] = {}
+    """
+    Keep the repeated n-grams that are not contained in a longer n-gram with
+    the same number of occurrences.
 
-    patterns_by_count: dict[
-        int, dict[int, list[tuple[tuple[int, ...], list[int]]]]
-    ] = {}
+    ``occurrences`` must hold every repeated n-gram up to its maximum length,
+    as returned by ``find_ngram_occurrences``. Then an n-gram is absorbed by a
+    longer one exactly if one of its two one-symbol extensions has the same
+    count, so each pattern is only compared with its own extensions.
+    """
+    extension_counts: dict[tuple[int, ...], int] = {}
     for ngram, starts in occurrences.items():
-        if len(starts) <= 1:
+        count = len(starts)
+        if count <= 1 or len(ngram) < 2:
             continue
-        patterns_by_count.setdefault(len(starts), {}).setdefault(len(ngram), []).append(
-            (ngram, starts)
-        )
+        for part in (ngram[:-1], ngram[1:]):
+            if extension_counts.get(part, 0) < count:
+                extension_counts[part] = count
+
+    return {
+        ngram: starts
+        for ngram, starts in occurrences.items()
+        if len(starts) > 1 and extension_counts.get(ngram, 0) != len(starts)
+    }
 
-    def intervals_fully_covered(
-        short_starts: list[int],
-        short_len: int,
-        long_starts: list[int],
-        long_len: int,
-    ) -> bool:
-        # Check if every short interval is contained in some longer interval
-        idx = 0
-        for start in short_starts:
-            short_end = start + short_len
-            while idx < len(long_starts) and long_starts[idx] + long_len < short_end:
-                idx += 1
-            if idx == len(long_starts) or long_starts[idx] > start:
-                return False
-        return True
-
-    for count, patterns_by_length in patterns_by_count.items():
-        lengths_desc = sorted(patterns_by_length, reverse=True)
-        longer_patterns: list[tuple[int, list[int]]] = []
-
-        for length in lengths_desc:
-            for ngram, starts in patterns_by_length[length]:
-                overlapped = any(
-                    intervals_fully_covered(starts, length, long_starts, long_len)
-                    for long_len, long_starts in longer_patterns
-                )
-
-                if not overlapped:
-                    filtered[ngram] = starts
-
-            # Make current length patterns available as supersets for shorter n-grams
-            longer_patterns.extend(
-                (length, starts) for _, starts in patterns_by_length[length]
-            )
 
-    return filtered
+def find_ngram_repeats(
+    gardiner_ids: Sequence[int],
+    *,
+    min_length: int,
+    mode: str = "all",
+    engine: str = "numpy",
+) -> dict[tuple[int, ...], list[int]]:
+    """
+    Repeated n-grams of at least ``min_length`` symbols, selected by ``mode``
+    exactly as find_suffixarray_occurrences does, so the ngram backend stores
+    the same patterns as the suffix array and suffix tree ones.
+
+    Every repeat is mined (there is no length cap), so a repeat's one-symbol
+    extensions that still repeat are all present and the modes reduce to
+    comparing counts: "closed" keeps the repeats without a right extension of
+    the same count, "maximal" those without a left one either, and
+    "supermaximal" those with no repeated extension on either side.
+    """
+    if mode not in REPEAT_MODES:
+        raise ValueError(f"unknown mode '{mode}', expected one of {REPEAT_MODES}")
+
+    occurrences = find_ngram_occurrences(
+        gardiner_ids,
+        min_length=min_length,
+        max_length=max(min_length, len(gardiner_ids)),
+        min_count=2,
+        engine=engine,
+    )
+    if mode == "all":
+        return occurrences
+
+    # Largest count among the right (resp. left) extensions of each n-gram.
+    right: dict[tuple[int, ...], int] = {}
+    left: dict[tuple[int, ...], int] = {}
+    for ngram, starts in occurrences.items():
+        count = len(starts)
+        if len(ngram) > min_length:
+            prefix, suffix = ngram[:-1], ngram[1:]
+            right[prefix] = max(right.get(prefix, 0), count)
+            left[suffix] = max(left.get(suffix, 0), count)
+
+    if mode == "supermaximal":
+        return {
+            ngram: starts
+            for ngram, starts in occurrences.items()
+            if ngram not in right and ngram not in left
+        }
+    return {
+        ngram: starts
+        for ngram, starts in occurrences.items()
+        if right.get(ngram, 0) != len(starts)
+        and (mode == "closed" or left.get(ngram, 0) != len(starts))
+    }
 
 
 def persist_patterns(
@@ -119,12 +275,34 @@ def persist_patterns(
     conn = connect()
     cur = conn.cursor()
     try:
-        pattern_rows = [
-            (image_id, list(ngram), len(ngram), len(starts))
-            for ngram, starts in patterns
-        ]
+        _insert_patterns(cur, image_id, patterns, glyph_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        conn.close()
+
+    return None
+
 
-        psycopg2.extras.execute_values(
+def _insert_patterns(
+    cur,
+    image_id: int,
+    patterns: list[tuple[tuple[int, ...], list[int]]],
+    glyph_ids: Sequence[int],
+) -> list[tuple[int, list[int]]]:
+    """Insert patterns and their occurrences; returns (occurrence id, glyph ids)."""
+    pattern_rows = [
+        (image_id, list(ngram), len(ngram), len(starts)) for ngram, starts in patterns
+    ]
+    pattern_ids = [
+        row[0]
+        for row in psycopg2.extras.execute_values(
             cur,
             """
             INSERT INTO T_NGRAM_PATTERN (id_image, gardiner_ids, length, count)
@@ -133,40 +311,79 @@ def persist_patterns(
             """,
             pattern_rows,
             page_size=100,
+            fetch=True,
         )
-        pattern_ids = [row[0] for row in cur.fetchall()]
-
-        occurrence_rows: list[tuple[int, list[int]]] = []
-        for (ngram, starts), pattern_id in zip(patterns, pattern_ids):
-            pat_len = len(ngram)
-            for start in starts:
-                occurrence_rows.append(
-                    (pattern_id, list(glyph_ids[start : start + pat_len]))
-                )
+    ]
 
-        if occurrence_rows:
-            psycopg2.extras.execute_values(
-                cur,
-                """
-                INSERT INTO T_NGRAM_OCCURENCES (id_pattern, glyph_ids)
-                VALUES %s
-                """,
-                occurrence_rows,
-                page_size=500,
+    occurrence_rows: list[tuple[int, list[int]]] = []
+    for (ngram, starts), pattern_id in zip(patterns, pattern_ids):
+        pat_len = len(ngram)
+        for start in starts:
+            occurrence_rows.append(
+                (pattern_id, list(glyph_ids[start : start + pat_len]))
             )
+    if not occurrence_rows:
+        return []
 
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        try:
-            cur.close()
-        except Exception:
-            pass
-        conn.close()
+    occurrence_ids = [
+        row[0]
+        for row in psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO T_NGRAM_OCCURENCES (id_pattern, glyph_ids)
+            VALUES %s
+            RETURNING id
+            """,
+            occurrence_rows,
+            page_size=500,
+            fetch=True,
+        )
+    ]
+    return [
+        (occ_id, glyphs) for occ_id, (_, glyphs) in zip(occurrence_ids, occurrence_rows)
+    ]
 
-    return None
+
+def _fetch_glyph_map(
+    image_id: int,
+) -> dict[int, tuple[float, float, float, float, int]]:
+    glyph_rows = select(
+        """
+        SELECT gr.id, gr.bbox_x, gr.bbox_y, gr.bbox_width, gr.bbox_height, gs.v_column
+        FROM T_GLYPHES_RAW AS gr
+        JOIN T_GLYPHES_SORTED AS gs ON gs.id_glyph = gr.id
+        WHERE gr.id_image = %s
+        """,
+        (image_id,),
+    )
+    return {
+        int(gid): (float(x), float(y), float(width), float(height), int(col))
+        for gid, x, y, width, height, col in glyph_rows
+    }
+
+
+def _occurrence_bboxes(
+    glyph_ids: Sequence[int],
+    glyph_map: dict[int, tuple[float, float, float, float, int]],
+) -> list[tuple[float, float, float, float]]:
+    """One (x, y, height, width) box per column the occurrence touches."""
+    glyphs_by_column: dict[int, list[tuple[float, float, float, float]]] = {}
+    for glyph_id in glyph_ids:
+        glyph_data = glyph_map.get(int(glyph_id))
+        if glyph_data is None:
+            continue
+        x, y, width, height, col = glyph_data
+        glyphs_by_column.setdefault(col, []).append((x, y, width, height))
+
+    boxes: list[tuple[float, float, float, float]] = []
+    for col in sorted(glyphs_by_column):
+        col_glyphs = glyphs_by_column[col]
+        min_x = min(g[0] for g in col_glyphs)
+        min_y = min(g[1] for g in col_glyphs)
+        max_x = max(g[0] + g[2] for g in col_glyphs)
+        max_y = max(g[1] + g[3] for g in col_glyphs)
+        boxes.append((min_x, min_y, max_y - min_y, max_x - min_x))
+    return boxes
 
 
 def store_occurrence_bboxes(image_id: int) -> None:
@@ -186,44 +403,16 @@ def store_occurrence_bboxes(image_id: int) -> None:
     if not occ_rows:
         return
 
-    glyph_rows = select(
-        """
-        SELECT gr.id, gr.bbox_x, gr.bbox_y, gr.bbox_width, gr.bbox_height, gs.v_column
-        FROM T_GLYPHES_RAW AS gr
-        JOIN T_GLYPHES_SORTED AS gs ON gs.id_glyph = gr.id
-        WHERE gr.id_image = %s
-        """,
-        (image_id,),
-    )
-    if not glyph_rows:
+    glyph_map = _fetch_glyph_map(image_id)
+    if not glyph_map:
         return
 
-    glyph_map: dict[int, tuple[float, float, float, float, int]] = {
-        int(gid): (float(x), float(y), float(width), float(height), int(col))
-        for gid, x, y, width, height, col in glyph_rows
-    }
-
-    bbox_rows: list[tuple[int, float, float, float, float]] = []
-
-    for occ_id, glyph_ids in occ_rows:
-        if not glyph_ids:
-            continue
-
-        glyphs_by_column: dict[int, list[tuple[float, float, float, float]]] = {}
-        for glyph_id in glyph_ids:
-            glyph_data = glyph_map.get(int(glyph_id))
-            if glyph_data is None:
-                continue
-            x, y, width, height, col = glyph_data
-            glyphs_by_column.setdefault(col, []).append((x, y, width, height))
-
-        for col in sorted(glyphs_by_column):
-            col_glyphs = glyphs_by_column[col]
-            min_x = min(g[0] for g in col_glyphs)
-            min_y = min(g[1] for g in col_glyphs)
-            max_x = max(g[0] + g[2] for g in col_glyphs)
-            max_y = max(g[1] + g[3] for g in col_glyphs)
-            bbox_rows.append((occ_id, min_x, min_y, max_y - min_y, max_x - min_x))
+    bbox_rows = [
+        (occ_id, *box)
+        for occ_id, glyph_ids in occ_rows
+        if glyph_ids
+        for box in _occurrence_bboxes(glyph_ids, glyph_map)
+    ]
 
     if bbox_rows:
         insert(
@@ -236,6 +425,116 @@ def store_occurrence_bboxes(image_id: int) -> None:
         )
 
 
+def update_ngram_patterns(
+    image_id: int,
+    occurrences: dict[tuple[int, ...], list[int]],
+    glyph_ids: Sequence[int],
+) -> None:
+    """
+    Make the stored n-grams of an image equal to ``occurrences`` by writing
+    only the difference. A stored pattern is kept when it still occurs on
+    exactly the same glyph runs; otherwise it is deleted and written again.
+    Boxes of kept occurrences are rewritten only where a glyph moved to
+    another column. Everything runs in one transaction.
+    """
+    fresh = {
+        ngram: {tuple(glyph_ids[s : s + len(ngram)]) for s in starts}
+        for ngram, starts in occurrences.items()
+        if len(starts) > 1
+    }
+
+    stored: dict[int, tuple[tuple[int, ...], dict[tuple[int, ...], int]]] = {}
+    for pattern_id, gardiner_ids, occ_id, occ_glyphs in select(
+        """
+        SELECT pat.id, pat.gardiner_ids, occ.id, occ.glyph_ids
+        FROM T_NGRAM_PATTERN AS pat
+        LEFT JOIN T_NGRAM_OCCURENCES AS occ ON occ.id_pattern = pat.id
+        WHERE pat.id_image = %s
+        """,
+        (image_id,),
+    ):
+        key = tuple(int(gid) for gid in gardiner_ids or [])
+        _, occs = stored.setdefault(int(pattern_id), (key, {}))
+        if occ_id is not None:
+            occs[tuple(int(gid) for gid in occ_glyphs or [])] = int(occ_id)
+
+    stale: list[int] = []
+    kept: dict[int, tuple[int, ...]] = {}
+    remaining = dict(occurrences)
+    for pattern_id, (key, occs) in stored.items():
+        if key in remaining and fresh.get(key) == set(occs):
+            del remaining[key]
+            kept.update((occ_id, glyphs) for glyphs, occ_id in occs.items())
+        else:
+            stale.append(pattern_id)
+
+    glyph_map = _fetch_glyph_map(image_id)
+    stored_boxes: dict[int, list[tuple[float, float, float, float]]] = {}
+    if kept:
+        for occ_id, x, y, height, width in select(
+            """
+            SELECT bb.id_occ, bb.bbox_x, bb.bbox_y, bb.bbox_height, bb.bbox_width
+            FROM T_NGRAM_OCCURENCES_BBOXES AS bb
+            JOIN T_NGRAM_OCCURENCES AS occ ON occ.id = bb.id_occ
+            JOIN T_NGRAM_PATTERN AS pat ON pat.id = occ.id_pattern
+            WHERE pat.id_image = %s
+            ORDER BY bb.id
+            """,
+            (image_id,),
+        ):
+            stored_boxes.setdefault(int(occ_id), []).append(
+                (float(x), float(y), float(height), float(width))
+            )
+    reboxed = [
+        occ_id
+        for occ_id, glyphs in kept.items()
+        if stored_boxes.get(occ_id, []) != _occurrence_bboxes(glyphs, glyph_map)
+    ]
+
+    patterns = [
+        (ngram, starts) for ngram, starts in remaining.items() if len(starts) > 1
+    ]
+    if not stale and not reboxed and not patterns:
+        return
+
+    conn = connect()
+    cur = conn.cursor()
+    try:
+        if stale:
+            # Occurrences and their boxes follow (on delete cascade).
+            cur.execute("DELETE FROM T_NGRAM_PATTERN WHERE id = ANY(%s)", (stale,))
+        if reboxed:
+            cur.execute(
+                "DELETE FROM T_NGRAM_OCCURENCES_BBOXES WHERE id_occ = ANY(%s)",
+                (reboxed,),
+            )
+        written = [(occ_id, kept[occ_id]) for occ_id in reboxed]
+        if patterns:
+            written += _insert_patterns(cur, image_id, patterns, glyph_ids)
+        bbox_rows = [
+            (occ_id, *box)
+            for occ_id, glyphs in written
+            for box in _occurrence_bboxes(glyphs, glyph_map)
+        ]
+        if bbox_rows:
+            psycopg2.extras.execute_values(
+                cur,
+                """
+                INSERT INTO T_NGRAM_OCCURENCES_BBOXES (id_occ, bbox_x, bbox_y, bbox_height, bbox_width)
+                VALUES %s
+                """,
+                bbox_rows,
+                page_size=500,
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
 def ngram_counts_from_occurrences(
     occurrences: dict[tuple[int, ...], list[int]],
 ) -> Counter[tuple[int, ...]]:
@@ -248,7 +547,18 @@ def ngram_counts_from_occurrences(
 
 def run_ngram(
     image_id: int,
+    progress: Callable[[str], None] | None = None,
+    *,
+    incremental: bool = False,
 ) -> Counter[tuple[int, ...]]:
+    """
+    Mine and store the closed repeated n-grams of an image. ``progress`` is
+    called with the stage name ("mining", "storing") as the run advances.
+    With ``incremental`` only the patterns that changed since the last run
+    are rewritten (see update_ngram_patterns).
+    """
+    report = progress or (lambda stage: None)
+    report("mining")
     sequence_pairs = fetch_sorted_gardiner_ids(image_id)
     if not sequence_pairs:
         return Counter()
@@ -260,14 +570,20 @@ def run_ngram(
         gardiner_ids,
         min_length=2,
         max_length=max(2, len(gardiner_ids) // 2),
+        min_count=2,
     )
 
     occurrences = filter_closed_patterns(occurrences)
 
-    if occurrences:
-        # Delete existing patterns for this image to avoid duplicates
-        delete("DELETE FROM T_NGRAM_PATTERN WHERE id_image = %s", (image_id,))
+    report("storing")
+    if incremental:
+        update_ngram_patterns(image_id, occurrences, glyph_ids)
+        return ngram_counts_from_occurrences(occurrences)
 
+    # Patterns of the previous run go even if none are found this time;
+    # occurrences and bboxes follow (on delete cascade).
+    delete("DELETE FROM T_NGRAM_PATTERN WHERE id_image = %s", (image_id,))
+    if occurrences:
         persist_patterns(image_id, occurrences, glyph_ids)
         store_occurrence_bboxes(image_id)
 
@@ -297,10 +613,67 @@ def debug_example_sequence(sequence: list[str] | list[int]) -> Counter[tuple[int
         normalized,
         min_length=2,
         max_length=max(2, len(normalized) // 2),
+        min_count=2,
     )
     occurrences = filter_closed_patterns(occurrences)
     return ngram_counts_from_occurrences(occurrences)
 
 
+def benchmark_ngram_engines(
+    gardiner_ids: Sequence[int],
+    *,
+    min_length: int = 2,
+    max_length: int | None = None,
+    min_count: int = 2,
+    repeat: int = 3,
+) -> dict[str, float]:
+    """Best-of-``repeat`` seconds per engine; both must return the same dict."""
+    if max_length is None:
+        max_length = max(min_length, len(gardiner_ids) // 2)
+    timings: dict[str, float] = {}
+    results = []
+    for engine in NGRAM_ENGINES:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = find_ngram_occurrences(
+                gardiner_ids,
+                min_length=min_length,
+                max_length=max_length,
+                min_count=min_count,
+                engine=engine,
+            )
+            best = min(best, time.perf_counter() - started)
+        timings[engine] = best
+        results.append(result)
+    if any(result != results[0] for result in results[1:]):
+        raise AssertionError("n-gram engines disagree")
+    return timings
+
+
 if __name__ == "__main__":
-    run_ngram(1)
+    parser = argparse.ArgumentParser(description="Run n-gram analysis on an image")
+    parser.add_argument("image_id", type=int, help="Image ID to analyze")
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Time the python and numpy engines instead of storing patterns",
+    )
+    parser.add_argument("--min-length", type=int, default=2)
+    parser.add_argument("--max-length", type=int)
+    parser.add_argument("--min-count", type=int, default=2)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        ids = [gid for gid, _ in fetch_sorted_gardiner_ids(args.image_id)]
+        timings = benchmark_ngram_engines(
+            ids,
+            min_length=args.min_length,
+            max_length=args.max_length,
+            min_count=args.min_count,
+        )
+        print(f"Glyphs: {len(ids)}")
+        for engine, seconds in timings.items():
+            print(f"{engine}: {seconds * 1000:.1f} ms")
+    else:
+        run_ngram(args.image_id)
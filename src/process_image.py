@@ -3,6 +3,7 @@
 import sys
 
 from src.database.tools import insert, select
+from src.glyph_cache import bump_glyph_version
 
 
 def process_image(image_id):
@@ -40,6 +41,7 @@ def process_image(image_id):
         ],
         many=True,
     )
+    bump_glyph_version(image_id)
 
     return len(annotations)
 
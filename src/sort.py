@@ -1,9 +1,40 @@
-from typing import Any, Dict, List, Tuple
+import json
+import math
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import pairwise
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from src.database.tools import insert, select
+import numpy as np
 
-X_IDX = 3
-Y_IDX = 4
+from src.database.bulk import copy_rows
+from src.database.connect import connect
+from src.database.tools import insert, select, update
+from src.glyph_cache import get_glyph_geometry
+
+SORT_ENGINES = ("python", "numpy")
+# sort() switches to the numpy engine from this many glyphs on; below it the
+# array setup costs more than it saves.
+NUMPY_SORT_THRESHOLD = 2000
+
+# Break schedules of the most recently previewed images, see
+# fetch_break_schedule.
+BREAK_SCHEDULE_CACHE_SIZE = 16
+_break_schedules: "OrderedDict[int, Tuple[int, BreakSchedule]]" = OrderedDict()
+_break_schedules_lock = threading.Lock()
+
+# Used when no tolerance is configured and none can be estimated.
+DEFAULT_TOLERANCE = 100
+# Resolution of the tolerance sweep in estimate_tolerances.
+AUTO_TOLERANCE_STEPS = 96
+# The sweep stops at this many median glyph widths: wider tolerances merge
+# neighbouring columns, and their few-column plateaus are always the widest.
+AUTO_TOLERANCE_MAX_WIDTHS = 3
+# Candidates must average at least this many glyphs per column.
+AUTO_TOLERANCE_MIN_COLUMN_GLYPHS = 2
 
 
 def run_sort(
@@ -35,55 +66,459 @@ def run_sort(
             sorted_rows,
             many=True,
         )
+        bump_sort_version(image_id)
 
     return len(sorted_rows), column_stats
 
 
+@dataclass(frozen=True)
+class SortDelta:
+    """Rows written by save_sorted_order."""
+
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserted or self.updated or self.deleted)
+
+
+def save_sorted_order(
+    image_id: int, entries: Sequence[Tuple[int, int, int]]
+) -> SortDelta:
+    """
+    Make T_GLYPHES_SORTED for ``image_id`` equal to ``entries``
+    (``(glyph_id, column, row)``, one per glyph) by writing only the
+    difference to the stored order.
+
+    Changed and new rows are copied into a temporary table and applied with
+    one UPDATE and one INSERT; rows of glyphs no longer listed are deleted.
+    Everything runs in one transaction, which also bumps the sort version.
+    Nothing is written, and the version is kept, when the order is the same.
+    """
+    stored = {
+        int(gid): (int(col), int(row))
+        for gid, col, row in select(
+            """
+            SELECT gs.id_glyph, gs.v_column, gs.v_row
+            FROM T_GLYPHES_SORTED AS gs
+            JOIN T_GLYPHES_RAW AS gr ON gr.id = gs.id_glyph
+            WHERE gr.id_image = %s
+            """,
+            (image_id,),
+        )
+    }
+    wanted = {gid: (col, row) for gid, col, row in entries}
+    upserts = [
+        (gid, col, row)
+        for gid, (col, row) in wanted.items()
+        if stored.get(gid) != (col, row)
+    ]
+    removed = [gid for gid in stored if gid not in wanted]
+    if not upserts and not removed:
+        return SortDelta()
+
+    conn = connect()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TEMP TABLE tmp_glyphes_sorted (
+                id_glyph integer primary key,
+                v_column integer not null,
+                v_row integer not null
+            ) ON COMMIT DROP
+            """
+        )
+        copy_rows(cur, "tmp_glyphes_sorted", ("id_glyph", "v_column", "v_row"), upserts)
+        cur.execute(
+            """
+            UPDATE T_GLYPHES_SORTED AS gs
+            SET v_column = t.v_column, v_row = t.v_row
+            FROM tmp_glyphes_sorted AS t
+            WHERE gs.id_glyph = t.id_glyph
+            """
+        )
+        updated = cur.rowcount
+        cur.execute(
+            """
+            INSERT INTO T_GLYPHES_SORTED (id_glyph, v_column, v_row)
+            SELECT t.id_glyph, t.v_column, t.v_row
+            FROM tmp_glyphes_sorted AS t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM T_GLYPHES_SORTED AS gs WHERE gs.id_glyph = t.id_glyph
+            )
+            """
+        )
+        inserted = cur.rowcount
+        deleted = 0
+        if removed:
+            cur.execute(
+                "DELETE FROM T_GLYPHES_SORTED WHERE id_glyph = ANY(%s)", (removed,)
+            )
+            deleted = cur.rowcount
+        cur.execute(
+            "UPDATE T_IMAGES SET sort_version = sort_version + 1 WHERE id = %s",
+            (image_id,),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        conn.close()
+
+    return SortDelta(inserted=inserted, updated=updated, deleted=deleted)
+
+
+def fetch_sort_version(image_id: int) -> int:
+    """Return the reading-order version of an image (0 if never sorted)."""
+    rows = select("SELECT sort_version FROM T_IMAGES WHERE id = %s", (image_id,))
+    if not rows or rows[0][0] is None:
+        return 0
+    return int(rows[0][0])
+
+
+def bump_sort_version(image_id: int) -> None:
+    """Mark the stored reading order of an image as changed."""
+    update(
+        "UPDATE T_IMAGES SET sort_version = sort_version + 1 WHERE id = %s",
+        (image_id,),
+    )
+
+
 def sort(
     rows: List[Tuple[Any, ...]],
     tolerance: float,
     reading_direction: str,
+    engine: Optional[str] = None,
 ) -> Tuple[List[Tuple[int, int, int]], Dict[int, int]]:
-    items = [
-        (r[0], r[1], r[2], r[3] + r[5] / 2, r[4] + r[6] / 2, r[5], r[6]) for r in rows
-    ]
-    x_idx, y_idx = X_IDX, Y_IDX
+    """
+    ``(glyph_id, column, row)`` per glyph and the glyph count per column.
+    ``engine`` is one of SORT_ENGINES; by default numpy is used from
+    NUMPY_SORT_THRESHOLD glyphs on. Both engines return the same result.
+    """
+    if engine is None:
+        engine = "numpy" if len(rows) >= NUMPY_SORT_THRESHOLD else "python"
+    if engine == "numpy":
+        return _sort_numpy(rows, tolerance, reading_direction)
+    if engine != "python":
+        raise ValueError(f"engine must be one of {SORT_ENGINES}")
+    return build_break_schedule(rows).sort(tolerance, reading_direction)
 
-    items = sorted(items, key=lambda r: (r[x_idx], r[y_idx]))
 
-    columns: List[List[Tuple[Any, ...]]] = []
-    i = 0
-    n = len(items)
+def _sort_numpy(
+    rows: List[Tuple[Any, ...]],
+    tolerance: float,
+    reading_direction: str,
+) -> Tuple[List[Tuple[int, int, int]], Dict[int, int]]:
+    if not rows:
+        return [], {}
+    glyph_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    boxes = np.array([r[3:7] for r in rows], dtype=np.float64)
+    centers_x = boxes[:, 0] + boxes[:, 2] / 2
+    centers_y = boxes[:, 1] + boxes[:, 3] / 2
 
-    while i < n:
-        x0 = items[i][x_idx]
-        current_col: List[Tuple[Any, ...]] = []
-        while i < n and items[i][x_idx] <= x0 + tolerance:
-            current_col.append(items[i])
-            i += 1
+    # Same order and column starts as BreakSchedule: by (x, y), and each
+    # column ends after the last glyph within tolerance of its first one.
+    by_x = np.lexsort((centers_y, centers_x))
+    xs = centers_x[by_x]
+    column_end = np.searchsorted(xs, xs + tolerance, side="right").tolist()
+    starts = np.zeros(len(rows), dtype=np.int64)
+    i = column_end[0]
+    while i < len(rows):
+        starts[i] = 1
+        i = column_end[i]
+    columns = np.cumsum(starts)
 
-        current_col.sort(key=lambda r: r[y_idx])
-        columns.append(current_col)
+    # Top to bottom inside each column, ties in x order.
+    order = np.lexsort((centers_y[by_x], columns))
+    columns = columns[order]
+    counts = np.bincount(columns)
+    first = np.cumsum(counts) - counts
+    column_rows = np.arange(len(rows)) - first[columns]
 
-    data: List[Tuple[int, int, int]] = []
-    column_stats: Dict[int, int] = {}
-    for c_idx, col in enumerate(columns):
-        column_stats[c_idx] = len(col)
-        for r_idx, r in enumerate(col):
-            data.append((r[0], c_idx, r_idx))
+    column_count = len(counts)
+    if reading_direction.lower() == "rtl":
+        columns = column_count - 1 - columns
+    data = list(
+        zip(
+            glyph_ids[by_x][order].tolist(),
+            columns.tolist(),
+            column_rows.tolist(),
+        )
+    )
+    column_stats = dict(zip(columns[first].tolist(), counts.tolist()))
+    return data, column_stats
 
-    if reading_direction.lower() == "rtl" and data:
-        max_col = len(columns) - 1
-        data = [(gid, max_col - col_idx, row_idx) for gid, col_idx, row_idx in data]
-        column_stats = {max_col - idx: count for idx, count in column_stats.items()}
 
-    return data, column_stats
+def load_annotation_rows(path: str, size: Optional[int] = None) -> List[Tuple]:
+    """
+    Rows in the shape run_sort selects, read from a COCO annotation file.
+    With ``size``, copies of the page are placed side by side until there
+    are that many boxes, as a stand-in for large annotation sets.
+    """
+    with open(path, encoding="utf-8") as fh:
+        annotations = json.load(fh)["annotations"]
+    boxes = [a["bbox"] for a in annotations]
+    if not boxes:
+        return []
+    page_width = max(x + w for x, _, w, _ in boxes) - min(x for x, *_ in boxes)
+    rows = []
+    for k in range(size or len(boxes)):
+        x, y, w, h = boxes[k % len(boxes)]
+        offset = page_width * (k // len(boxes))
+        rows.append((k + 1, 0, None, x + offset, y, w, h))
+    return rows
+
+
+def benchmark_sort_engines(
+    rows: List[Tuple[Any, ...]],
+    tolerance: float,
+    reading_direction: str = "ltr",
+    *,
+    repeat: int = 3,
+) -> Dict[str, float]:
+    """Best-of-``repeat`` seconds per engine; both must return the same result."""
+    timings: Dict[str, float] = {}
+    results = []
+    for engine in SORT_ENGINES:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = sort(rows, tolerance, reading_direction, engine=engine)
+            best = min(best, time.perf_counter() - started)
+        timings[engine] = best
+        results.append(result)
+    if any(result != results[0] for result in results[1:]):
+        raise AssertionError("sort engines disagree")
+    return timings
+
+
+@dataclass(frozen=True)
+class BreakSchedule:
+    """
+    Tolerance-independent part of the column sort of one image.
+
+    ``glyph_ids`` and ``centers_x`` are in (x, y) center order; ``y_order``
+    lists the same positions by (y center, position). A column starts at
+    some glyph and takes every glyph whose center lies within ``tolerance``
+    to the right of it, so the layout for a tolerance is found by bisecting
+    ``centers_x`` once per column, and the glyphs are bucketed into columns
+    in y order in O(n) without sorting again.
+    """
+
+    glyph_ids: Tuple[int, ...]
+    centers_x: Tuple[float, ...]
+    y_order: Tuple[int, ...]
+    widths: Tuple[float, ...] = ()
+
+    def breaks(self, tolerance: float) -> List[int]:
+        """Position (in x order) of the first glyph of every column."""
+        xs = self.centers_x
+        starts: List[int] = []
+        i = 0
+        while i < len(xs):
+            starts.append(i)
+            i = bisect_right(xs, xs[i] + tolerance, i)
+        return starts
+
+    def columns(self, tolerance: float, reading_direction: str) -> List[List[int]]:
+        """Glyph ids per column index, top to bottom."""
+        starts = self.breaks(tolerance)
+        column_of = [0] * len(self.glyph_ids)
+        for c_idx, (start, end) in enumerate(
+            zip(starts, starts[1:] + [len(column_of)])
+        ):
+            column_of[start:end] = [c_idx] * (end - start)
+
+        columns: List[List[int]] = [[] for _ in starts]
+        for pos in self.y_order:
+            columns[column_of[pos]].append(self.glyph_ids[pos])
+        if reading_direction.lower() == "rtl":
+            columns.reverse()
+        return columns
+
+    def sort(
+        self, tolerance: float, reading_direction: str
+    ) -> Tuple[List[Tuple[int, int, int]], Dict[int, int]]:
+        """Same result as sort() on the rows the schedule was built from."""
+        columns = self.columns(tolerance, reading_direction)
+        if reading_direction.lower() == "rtl":
+            # sort() lists the glyphs by their ltr column
+            indexed = list(enumerate(columns))[::-1]
+        else:
+            indexed = list(enumerate(columns))
+        data = [
+            (glyph_id, c_idx, r_idx)
+            for c_idx, col in indexed
+            for r_idx, glyph_id in enumerate(col)
+        ]
+        column_stats = {c_idx: len(col) for c_idx, col in indexed}
+        return data, column_stats
+
+    def changed_columns(
+        self, tolerance: float, previous: float, reading_direction: str
+    ) -> Tuple[List[int], int]:
+        """
+        Column indices whose glyphs differ between ``previous`` and
+        ``tolerance``, and the new column count. Columns are compared by
+        index, as a client holding the previous layout would patch them.
+        """
+        n = len(self.glyph_ids)
+        new = self.breaks(tolerance)
+        old = self.breaks(previous)
+        new_ranges = list(zip(new, new[1:] + [n]))
+        old_ranges = list(zip(old, old[1:] + [n]))
+        if reading_direction.lower() == "rtl":
+            new_ranges.reverse()
+            old_ranges.reverse()
+        changed = [
+            c_idx
+            for c_idx, span in enumerate(new_ranges)
+            if c_idx >= len(old_ranges) or old_ranges[c_idx] != span
+        ]
+        return changed, len(new_ranges)
+
+
+def build_break_schedule(rows: Sequence[Tuple[Any, ...]]) -> BreakSchedule:
+    """``rows`` as selected by run_sort (id, id_image, id_gardiner, bbox...)."""
+    items = sorted(
+        ((r[0], r[3] + r[5] / 2, r[4] + r[6] / 2, r[5]) for r in rows),
+        key=lambda r: (r[1], r[2]),
+    )
+    ys = [item[2] for item in items]
+    return BreakSchedule(
+        glyph_ids=tuple(item[0] for item in items),
+        centers_x=tuple(item[1] for item in items),
+        y_order=tuple(sorted(range(len(items)), key=ys.__getitem__)),
+        widths=tuple(item[3] for item in items),
+    )
+
+
+@dataclass(frozen=True)
+class ToleranceCandidate:
+    """
+    A tolerance and the range ``[low, high]`` around it that yields the same
+    number of columns; ``score`` is the width of that range in log scale.
+    """
+
+    tolerance: int
+    column_count: int
+    low: float
+    high: float
+    score: float
+
+
+def estimate_tolerances(
+    schedule: BreakSchedule, *, top: int = 3
+) -> List[ToleranceCandidate]:
+    """
+    Candidate tolerances for ``schedule``, best first.
+
+    Gaps between neighbouring x centers fall into two groups: small ones
+    inside a column and roughly one column pitch between columns. Any
+    tolerance between the two gives the same columns, so the column count
+    stays flat over a wide range of tolerances there. The count is swept
+    over a geometric grid from half the median glyph width (narrower
+    columns than glyphs are implausible) to AUTO_TOLERANCE_MAX_WIDTHS median
+    glyph widths (or the width of the text, if narrower), and the flattest
+    ranges are returned with their geometric middle, the smaller tolerance
+    first on ties. Layouts with a single column or fewer than
+    AUTO_TOLERANCE_MIN_COLUMN_GLYPHS glyphs per column are skipped. Returns
+    an empty list when the glyphs do not allow an estimate.
+    """
+    xs = schedule.centers_x
+    n = len(xs)
+    gaps = sorted(b - a for a, b in pairwise(xs) if b > a)
+    if n < 2 or not gaps:
+        return []
+
+    widths = sorted(w for w in schedule.widths if w and w > 0)
+    lo = gaps[0]
+    hi = xs[-1] - xs[0]
+    if widths:
+        median_width = widths[len(widths) // 2]
+        lo = max(lo, median_width / 2)
+        hi = min(hi, median_width * AUTO_TOLERANCE_MAX_WIDTHS)
+    if lo >= hi:
+        return []
+
+    ratio = (hi / lo) ** (1 / AUTO_TOLERANCE_STEPS)
+    grid = [lo * ratio**k for k in range(AUTO_TOLERANCE_STEPS + 1)]
+    counts = [len(schedule.breaks(t)) for t in grid]
+
+    plateaus: List[Tuple[float, float, int]] = []
+    start = 0
+    for k in range(1, len(grid) + 1):
+        if k == len(grid) or counts[k] != counts[start]:
+            count = counts[start]
+            if 1 < count and count * AUTO_TOLERANCE_MIN_COLUMN_GLYPHS <= n:
+                plateaus.append((grid[start], grid[k - 1], count))
+            start = k
+    plateaus.sort(key=lambda p: (p[0] / p[1], p[0]))
+
+    candidates: List[ToleranceCandidate] = []
+    for low, high, _ in plateaus[:top]:
+        tolerance = max(1, round(math.sqrt(low * high)))
+        candidates.append(
+            ToleranceCandidate(
+                tolerance=tolerance,
+                column_count=len(schedule.breaks(tolerance)),
+                low=low,
+                high=high,
+                score=math.log(high / low),
+            )
+        )
+    return candidates
+
+
+def estimate_tolerance(image_id: int) -> Optional[int]:
+    """Best tolerance from estimate_tolerances, or None if there is none."""
+    schedule = fetch_break_schedule(image_id)
+    if schedule is None:
+        return None
+    candidates = estimate_tolerances(schedule, top=1)
+    return candidates[0].tolerance if candidates else None
+
+
+def fetch_break_schedule(image_id: int) -> Optional[BreakSchedule]:
+    """
+    Break schedule of an image's glyphs, cached per image until its raw
+    glyphs change (T_IMAGES.glyph_version, see src.glyph_cache). It only
+    depends on the glyph boxes, so saving or re-sorting the reading order
+    keeps it. Returns None for an image without glyphs.
+    """
+    geometry = get_glyph_geometry(image_id)
+    if not geometry:
+        return None
+
+    with _break_schedules_lock:
+        cached = _break_schedules.get(image_id)
+        if cached is not None and cached[0] == geometry.glyph_version:
+            _break_schedules.move_to_end(image_id)
+            return cached[1]
+
+    schedule = build_break_schedule(geometry.rows())
+    with _break_schedules_lock:
+        _break_schedules[image_id] = (geometry.glyph_version, schedule)
+        _break_schedules.move_to_end(image_id)
+        while len(_break_schedules) > BREAK_SCHEDULE_CACHE_SIZE:
+            _break_schedules.popitem(last=False)
+    return schedule
 
 
 if __name__ == "__main__":
     import sys
 
     preview = False
+    benchmark = False
+    estimate = False
     args: List[str] = []
 
     i = 1
@@ -92,20 +527,72 @@ if __name__ == "__main__":
         if arg == "--preview":
             preview = True
             i += 1
+        elif arg == "--benchmark":
+            benchmark = True
+            i += 1
+        elif arg == "--estimate":
+            estimate = True
+            i += 1
         else:
             args.append(arg)
             i += 1
 
+    if benchmark:
+        if not args:
+            print(
+                "Usage: python -m src.sort --benchmark <annotations.json> "
+                "[size] [tolerance]"
+            )
+            sys.exit(1)
+        size = int(args[1]) if len(args) > 1 else None
+        tolerance = float(args[2]) if len(args) > 2 else float(DEFAULT_TOLERANCE)
+        bench_rows = load_annotation_rows(args[0], size)
+        timings = benchmark_sort_engines(bench_rows, tolerance)
+        print(f"Sorted {len(bench_rows)} boxes (tolerance={tolerance})")
+        for engine, seconds in timings.items():
+            print(f"  {engine}: {seconds * 1000:.1f} ms")
+        sys.exit(0)
+
+    if estimate:
+        if not args:
+            print("Usage: python -m src.sort --estimate <annotations.json>")
+            sys.exit(1)
+        schedule = build_break_schedule(load_annotation_rows(args[0]))
+        default_columns = len(schedule.breaks(DEFAULT_TOLERANCE))
+        print(
+            f"{len(schedule.glyph_ids)} boxes, {default_columns} columns "
+            f"at the default tolerance {DEFAULT_TOLERANCE}"
+        )
+        for candidate in estimate_tolerances(schedule, top=5):
+            print(
+                f"Candidate tolerance {candidate.tolerance}: "
+                f"{candidate.column_count} columns "
+                f"(stable from {candidate.low:.1f} to {candidate.high:.1f})"
+            )
+        sys.exit(0)
+
     if len(args) < 1:
-        print("Usage: python -m src.sort <image_id> [tolerance] [--preview]")
+        print("Usage: python -m src.sort <image_id> [tolerance|auto] [--preview]")
         print("Examples:")
         print("  python -m src.sort 2")
         print("  python -m src.sort 2 --preview")
         print("  python -m src.sort 2 150")
+        print("  python -m src.sort 2 auto --preview")
         sys.exit(1)
 
     image_id = int(args[0])
-    tolerance = float(args[1]) if len(args) > 1 else 100.0
+    if len(args) > 1 and args[1] == "auto":
+        schedule = fetch_break_schedule(image_id)
+        candidates = estimate_tolerances(schedule) if schedule else []
+        for candidate in candidates:
+            print(
+                f"Candidate tolerance {candidate.tolerance}: "
+                f"{candidate.column_count} columns "
+                f"(stable from {candidate.low:.1f} to {candidate.high:.1f})"
+            )
+        tolerance = float(candidates[0].tolerance if candidates else DEFAULT_TOLERANCE)
+    else:
+        tolerance = float(args[1]) if len(args) > 1 else float(DEFAULT_TOLERANCE)
 
     rows = select("SELECT reading_direction FROM T_IMAGES WHERE id = %s", (image_id,))
     reading_dir = "rtl" if (rows and rows[0][0] == 1) else "ltr"
@@ -1,17 +1,34 @@
 import argparse
+import heapq
+import mmap
+import os
+import struct
 import sys
+import tempfile
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from itertools import pairwise
+from math import log
 from pathlib import Path
-from typing import Sequence
+from typing import Iterator, Sequence
 
 import psycopg2.extras
 
+from src.database.bulk import copy_rows, reserve_ids
 from src.database.connect import connect
 from src.database.tools import insert, select
+from src.glyph_cache import get_glyph_geometry
+from src.sort import fetch_sort_version
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-# Runs in O(nlogn)
+INDEX_DIR = Path(os.getenv("SUFFIXARRAY_INDEX_DIR", str(BASE_DIR / "data" / "index")))
+_INDEX_MAGIC = b"HPASAIX1"
+_INDEX_HEADER = struct.Struct("<8sqqq")  # magic, image_id, sort_version, length
+
+# Suffix array construction runs in O(n log^2 n) worst case, LCP in O(n)
 
 
 def fetch_sorted_gardiner_ids(image_id: int) -> list[tuple[int, int]]:
@@ -35,89 +52,413 @@ def fetch_sorted_gardiner_ids(image_id: int) -> list[tuple[int, int]]:
     return sequence
 
 
+def fetch_glyph_columns(image_id: int) -> dict[int, int]:
+    """Map glyph id -> reading order column for an image's sorted glyphs."""
+    rows = select(
+        """
+        SELECT gs.id_glyph, gs.v_column
+        FROM T_GLYPHES_SORTED AS gs
+        JOIN T_GLYPHES_RAW AS gr ON gr.id = gs.id_glyph
+        WHERE gr.id_image = %s
+        """,
+        (image_id,),
+    )
+    return {int(glyph_id): int(column) for glyph_id, column in rows}
+
+
+def separate_columns(
+    sequence_pairs: Sequence[tuple[int, int]], columns: dict[int, int]
+) -> tuple[list[tuple[int, int]], list[int]]:
+    """
+    Insert a separator wherever the reading order moves to the next column,
+    so no repeat can cross a column break. As in the corpus index, the k-th
+    separator is the unique id ``-(k + 1)`` with glyph id -1.
+
+    Returns the separated pairs and, per position, the index of the same
+    glyph in ``sequence_pairs`` (-1 for separators); see restore_positions.
+    """
+    pairs: list[tuple[int, int]] = []
+    origin: list[int] = []
+    previous = None
+    for idx, (gardiner_id, glyph_id) in enumerate(sequence_pairs):
+        column = columns.get(glyph_id)
+        if idx and column != previous:
+            separators = len(pairs) - idx
+            pairs.append((-(separators + 1), -1))
+            origin.append(-1)
+        previous = column
+        pairs.append((gardiner_id, glyph_id))
+        origin.append(idx)
+    return pairs, origin
+
+
+def restore_positions(
+    occurrences: dict[tuple[int, ...], list[int]], origin: Sequence[int]
+) -> dict[tuple[int, ...], list[int]]:
+    """
+    Map start positions mined on a separated sequence back to the original
+    reading order. Occurrences containing a separator are dropped, and so are
+    patterns left with fewer than two occurrences.
+    """
+    restored: dict[tuple[int, ...], list[int]] = {}
+    for pattern, starts in occurrences.items():
+        last = len(pattern) - 1
+        mapped = [
+            origin[start]
+            for start in starts
+            if origin[start] >= 0 and origin[start + last] - origin[start] == last
+        ]
+        if len(mapped) > 1:
+            restored[pattern] = mapped
+    return restored
+
+
+def build_suffix_array(seq: Sequence[int]) -> array:
+    """
+    Build the suffix array of ``seq`` by prefix doubling over integer ranks.
+
+    Suffixes are never materialised: each round sorts start positions by the
+    (rank[i], rank[i + k]) pair packed into a single int, so memory stays O(n)
+    and the total work is O(n log^2 n) in the worst case (far less for texts
+    whose longest repeat is short, since doubling stops once all ranks differ).
+    Ordering matches a lexicographic sort of ``seq[i:]`` lists, i.e. a suffix
+    that is a prefix of another one sorts first.
+    """
+    n = len(seq)
+    if n == 0:
+        return array("i")
+
+    dense = {value: idx for idx, value in enumerate(sorted(set(seq)))}
+    rank = [dense[value] for value in seq]
+    classes = len(dense)
+    sa = sorted(range(n), key=rank.__getitem__)
+
+    k = 1
+    while classes < n:
+        # Shift ranks by one so 0 can stand for "past the end of the text".
+        second = [r + 1 for r in rank[k:]] + [0] * min(k, n)
+        stride = classes + 1
+        keys = [first * stride + nxt for first, nxt in zip(rank, second)]
+        sa.sort(key=keys.__getitem__)
+
+        new_rank = [0] * n
+        classes = 1
+        prev_key = keys[sa[0]]
+        for pos in sa[1:]:
+            key = keys[pos]
+            if key != prev_key:
+                classes += 1
+                prev_key = key
+            new_rank[pos] = classes - 1
+        rank = new_rank
+        k *= 2
+
+    return array("i", sa)
+
+
+def build_lcp_array(seq: Sequence[int], sa: Sequence[int]) -> array:
+    """
+    Kasai's algorithm: ``lcp[i]`` is the longest common prefix of the suffixes
+    starting at ``sa[i - 1]`` and ``sa[i]`` (``lcp[0]`` is 0). Runs in O(n).
+    """
+    n = len(sa)
+    lcp = array("i", bytes(4 * n))
+    if n == 0:
+        return lcp
+
+    rank = [0] * n
+    for idx, pos in enumerate(sa):
+        rank[pos] = idx
+
+    h = 0
+    for pos in range(n):
+        r = rank[pos]
+        if r == 0:
+            h = 0
+            continue
+        prev = sa[r - 1]
+        while pos + h < n and prev + h < n and seq[pos + h] == seq[prev + h]:
+            h += 1
+        lcp[r] = h
+        if h:
+            h -= 1
+
+    return lcp
+
+
+REPEAT_MODES = ("all", "closed", "maximal", "supermaximal")
+
+
+def iter_lcp_intervals(
+    lcp: Sequence[int], *, min_length: int = 1
+) -> Iterator[tuple[int, int, int, int, bool]]:
+    """
+    Enumerate the lcp-intervals of a suffix array bottom-up with a stack.
+
+    Yields ``(lcp_value, lb, rb, parent_lcp, has_child_intervals)`` for every
+    interval whose ``lcp_value >= min_length``: the suffixes ``sa[lb..rb]``
+    (inclusive) share exactly ``lcp_value`` leading symbols, ``parent_lcp`` is
+    the lcp value of the enclosing interval and ``has_child_intervals`` tells
+    whether a nested interval exists (otherwise all children are leaves).
+    Every distinct repeat of length L with ``parent_lcp < L <= lcp_value``
+    occurs exactly at ``sa[lb..rb]``, so each repeat is reported once. Runs in
+    O(n) over the LCP array.
+    """
+    n = len(lcp)
+    # [lcp value, left bound, has child intervals]
+    stack: list[list] = [[0, 0, False]]
+
+    for i in range(1, n + 1):
+        current = lcp[i] if i < n else 0
+        lb = i - 1
+        child_closed = False
+        while current < stack[-1][0]:
+            top_lcp, lb, has_children = stack.pop()
+            parent_lcp = max(current, stack[-1][0])
+            if top_lcp >= min_length:
+                yield top_lcp, lb, i - 1, parent_lcp, has_children
+            if current <= stack[-1][0]:
+                stack[-1][2] = True
+                child_closed = False
+            else:
+                child_closed = True
+        if current > stack[-1][0]:
+            # The interval just closed (if any) is a child of the new one
+            stack.append([current, lb, child_closed])
+
+
+def _left_diversity(seq: Sequence[int], sa: Sequence[int]) -> tuple[list[int], int]:
+    """
+    Prefix counts of BWT changes plus the SA rank of the first suffix.
+
+    The interval ``[lb, rb]`` is left-diverse (its occurrences are not all
+    preceded by the same symbol) iff ``changes[rb] - changes[lb] > 0`` or it
+    contains the suffix starting at position 0, which has no left context.
+    """
+    changes = [0] * len(sa)
+    first_rank = -1
+    prev_left: int | None = None
+    for idx, pos in enumerate(sa):
+        left = seq[pos - 1] if pos > 0 else None
+        if pos == 0:
+            first_rank = idx
+        if idx > 0:
+            changes[idx] = changes[idx - 1] + (left != prev_left)
+        prev_left = left
+    return changes, first_rank
+
+
+def iter_repeat_intervals(
+    seq: Sequence[int],
+    sa: Sequence[int],
+    lcp: Sequence[int],
+    *,
+    min_length: int,
+    mode: str = "all",
+) -> Iterator[tuple[range, int, int]]:
+    """
+    Yield ``(lengths, lb, rb)`` for every lcp-interval selected by ``mode``:
+    each length in ``lengths`` is a reported repeat ``seq[sa[lb]:][:length]``
+    occurring exactly at ``sa[lb..rb]``. See find_suffixarray_occurrences for
+    the meaning of the modes.
+    """
+    if mode not in REPEAT_MODES:
+        raise ValueError(f"unknown mode '{mode}', expected one of {REPEAT_MODES}")
+
+    if mode in ("maximal", "supermaximal"):
+        changes, first_rank = _left_diversity(seq, sa)
+
+    for lcp_value, lb, rb, parent_lcp, has_children in iter_lcp_intervals(
+        lcp, min_length=max(1, min_length)
+    ):
+        if mode == "all":
+            # Each lcp-interval contributes every prefix length it owns, all
+            # sharing the interval's start positions.
+            lengths = range(max(parent_lcp + 1, min_length), lcp_value + 1)
+        else:
+            lengths = range(lcp_value, lcp_value + 1)
+
+        if mode == "maximal" and not (
+            changes[rb] - changes[lb] > 0 or lb <= first_rank <= rb
+        ):
+            continue
+        if mode == "supermaximal":
+            if has_children:
+                continue
+            contexts = {
+                seq[sa[idx] - 1] if sa[idx] > 0 else None for idx in range(lb, rb + 1)
+            }
+            if len(contexts) != rb - lb + 1:
+                continue
+
+        yield lengths, lb, rb
+
+
 def find_suffixarray_occurrences(
     gardiner_ids: list[int],
     *,
     min_length: int,
+    mode: str = "all",
+    sa: Sequence[int] | None = None,
+    lcp: Sequence[int] | None = None,
 ) -> dict[tuple[int, ...], list[int]]:
     """
-    Find all repeated substrings and their start positions using suffix array.
+    Find repeated substrings and their start positions using suffix array.
     Similar to find_ngram_occurrences but uses suffix array approach.
 
+    ``mode`` selects which repeats are reported:
+
+    - ``all``: every repeated substring of at least ``min_length`` symbols.
+    - ``closed``: only repeats that cannot be extended to the right without
+      losing an occurrence, i.e. one pattern per lcp-interval; nested prefixes
+      sharing the same occurrences collapse into their longest form.
+    - ``maximal``: closed repeats that also cannot be extended to the left
+      (their occurrences have differing left contexts in the BWT).
+    - ``supermaximal``: maximal repeats that are not contained in any other
+      repeat (no nested lcp-interval and pairwise distinct left contexts).
+
+    ``sa`` and ``lcp`` may be passed in when already built for ``gardiner_ids``.
+
     Returns dict mapping pattern -> list of start positions.
     """
+    if mode not in REPEAT_MODES:
+        raise ValueError(f"unknown mode '{mode}', expected one of {REPEAT_MODES}")
+
     occurrences: dict[tuple[int, ...], list[int]] = {}
 
     if len(gardiner_ids) < min_length:
         return occurrences
 
-    suffixes = build_suffixes(gardiner_ids)
+    if sa is None:
+        sa = build_suffix_array(gardiner_ids)
+    if lcp is None:
+        lcp = build_lcp_array(gardiner_ids, sa)
 
-    # For each pair of consecutive suffixes, find LCP and track positions
-    for i in range(len(suffixes) - 1):
-        s1, pos1 = suffixes[i]
-        s2, pos2 = suffixes[i + 1]
-        lcp_len = lcp_length(s1, s2)
+    for lengths, lb, rb in iter_repeat_intervals(
+        gardiner_ids, sa, lcp, min_length=min_length, mode=mode
+    ):
+        positions = sorted(sa[lb : rb + 1])
+        start = positions[0]
+        for length in lengths:
+            occurrences[tuple(gardiner_ids[start : start + length])] = list(positions)
 
-        # Extract all prefixes of the LCP that meet min_length
-        for prefix_len in range(min_length, lcp_len + 1):
-            pattern = tuple(s1[:prefix_len])
+    return occurrences
 
-            # Add both positions
-            if pattern not in occurrences:
-                occurrences[pattern] = []
-            if pos1 not in occurrences[pattern]:
-                occurrences[pattern].append(pos1)
-            if pos2 not in occurrences[pattern]:
-                occurrences[pattern].append(pos2)
 
-    # Sort positions for each pattern
-    for pattern in occurrences:
-        occurrences[pattern].sort()
+PATTERN_SCORES = ("count", "length_count", "stability")
 
-    return occurrences
 
+def _entropy(dist: Counter) -> float:
+    total = sum(dist.values())
+    h = 0.0
+    for c in dist.values():
+        p = c / total
+        h -= p * log(p)
+    return h
 
-def build_suffixes(seq: list[int]) -> list[tuple[list[int], int]]:
-    suffixes = [
-        (seq[i:], i) for i in range(len(seq))
-    ]  # Create suffixes with their starting indices
-    suffixes.sort()  # Sort suffixes lexicographically
-    return suffixes
 
+def _pattern_score(
+    seq: Sequence[int], sa: Sequence[int], lb: int, rb: int, length: int, score: str
+) -> float:
+    count = rb - lb + 1
+    if score == "count":
+        return float(count)
+    if score == "length_count":
+        return float(length * count)
 
-def lcp_length(
-    a: list[int], b: list[int]
-) -> int:  # Compute length of longest common prefix
-    i = 0
-    while i < min(len(a), len(b)) and a[i] == b[i]:
-        i += 1
-    return i
+    # Same stability score as routes/api/structure.py: frequency weighted by
+    # the variety (productivity) and entropy of the neighbouring signs.
+    n = len(seq)
+    left: Counter = Counter()
+    right: Counter = Counter()
+    for idx in range(lb, rb + 1):
+        start = sa[idx]
+        left[seq[start - 1] if start > 0 else -1] += 1
+        right[seq[start + length] if start + length < n else -2] += 1
+    productivity = len(left) + len(right)
+    boundary_strength = (_entropy(left) + _entropy(right)) / 2.0
+    return log(1 + count) * (1 + productivity) * (1 + boundary_strength)
 
 
-def find_lcps(seq: list[int], min_length: int) -> list[tuple[int, tuple[int, ...]]]:
-    suffixes = build_suffixes(seq)
-    lcps: list[tuple[int, tuple[int, ...]]] = []
+def find_top_suffixarray_occurrences(
+    gardiner_ids: list[int],
+    *,
+    min_length: int,
+    mode: str = "all",
+    top_k: int | None = None,
+    score: str = "count",
+    max_occurrences: int | None = None,
+    sa: Sequence[int] | None = None,
+    lcp: Sequence[int] | None = None,
+) -> dict[tuple[int, ...], list[int]]:
+    """
+    Bounded variant of find_suffixarray_occurrences keeping only the best
+    ``top_k`` repeats by ``score`` (one of PATTERN_SCORES).
 
-    for i in range(len(suffixes) - 1):
-        s1, _ = suffixes[i]
-        s2, _ = suffixes[i + 1]
-        length = lcp_length(s1, s2)  # Get LCP length between suffixes
+    Candidates are ranked in a min-heap of (score, length, interval) during
+    the LCP traversal, so memory is O(top_k) instead of one tuple per repeat.
+    ``max_occurrences`` caps the total number of start positions returned;
+    the lowest ranked repeats are dropped until the kept ones fit.
+    """
+    if mode not in REPEAT_MODES:
+        raise ValueError(f"unknown mode '{mode}', expected one of {REPEAT_MODES}")
+    if score not in PATTERN_SCORES:
+        raise ValueError(f"unknown score '{score}', expected one of {PATTERN_SCORES}")
 
-        if (
-            length >= min_length and length > 0
-        ):  # Only consider LCPs above min_length. min_length >= 1
-            prefix = tuple(s1[:length])
-            lcps.append((length, prefix))
-
-    unique: dict[
-        tuple[int, ...], int
-    ] = {}  # Keep only the longest LCP for each unique prefix
-    for length, prefix in lcps:
-        if (
-            prefix not in unique or length > unique[prefix]
-        ):  # Update if longer LCP found
-            unique[prefix] = length
+    if len(gardiner_ids) < min_length or top_k == 0:
+        return {}
+
+    if sa is None:
+        sa = build_suffix_array(gardiner_ids)
+    if lcp is None:
+        lcp = build_lcp_array(gardiner_ids, sa)
+
+    heap: list[tuple[float, int, int, int]] = []
+    positions_held = 0
+    for lengths, lb, rb in iter_repeat_intervals(
+        gardiner_ids, sa, lcp, min_length=min_length, mode=mode
+    ):
+        count = rb - lb + 1
+        if max_occurrences is not None and count > max_occurrences:
+            continue
+        for length in lengths:
+            entry = (
+                _pattern_score(gardiner_ids, sa, lb, rb, length, score),
+                length,
+                -lb,
+                rb,
+            )
+            if top_k is not None and len(heap) >= top_k:
+                if entry <= heap[0]:
+                    continue
+                dropped = heapq.heapreplace(heap, entry)
+                positions_held -= dropped[3] + dropped[2] + 1
+            else:
+                heapq.heappush(heap, entry)
+            positions_held += count
+            while max_occurrences is not None and positions_held > max_occurrences:
+                dropped = heapq.heappop(heap)
+                positions_held -= dropped[3] + dropped[2] + 1
+
+    occurrences: dict[tuple[int, ...], list[int]] = {}
+    for _score, length, neg_lb, rb in sorted(heap, reverse=True):
+        positions = sorted(sa[-neg_lb : rb + 1])
+        start = positions[0]
+        occurrences[tuple(gardiner_ids[start : start + length])] = positions
+    return occurrences
+
+
+def find_lcps(seq: list[int], min_length: int) -> list[tuple[int, tuple[int, ...]]]:
+    sa = build_suffix_array(seq)
+    lcp = build_lcp_array(seq, sa)
+
+    # Every lcp-interval yields its longest common prefix exactly once
+    unique: dict[tuple[int, ...], int] = {}
+    for length, lb, _rb, _parent, _nested in iter_lcp_intervals(
+        lcp, min_length=max(1, min_length)
+    ):
+        start = sa[lb]
+        unique[tuple(seq[start : start + length])] = length
 
     sorted_lcps = sorted(
         unique.items(), key=lambda item: (-item[1], item[0])
@@ -125,60 +466,142 @@ def find_lcps(seq: list[int], min_length: int) -> list[tuple[int, tuple[int, ...
     return [(length, prefix) for prefix, length in sorted_lcps]
 
 
-def search_pattern(suffixes: list[tuple[list[int], int]], pattern: list[int]) -> int:
+def _compare_suffix(seq: Sequence[int], start: int, pattern: Sequence[int]) -> int:
     """
-    Search for a pattern in the sorted suffix array using binary search.
-    Returns the count of occurrences.
+    Compare the suffix starting at ``start`` against ``pattern`` in place.
+    Returns -1 if the suffix sorts before the pattern, 1 if after and 0 if the
+    pattern is a prefix of the suffix.
     """
-    if not pattern:
-        return 0
-
-    def matches_prefix(suffix: list[int], pat: list[int]) -> bool:
-        if len(suffix) < len(pat):
-            return False
-        return suffix[: len(pat)] == pat
-
-    def compare(suffix: list[int], pat: list[int]) -> int:
-        # Returns: -1 if suffix < pattern, 0 if matches, 1 if suffix > pattern
-        min_len = min(len(suffix), len(pat))
-        for i in range(min_len):
-            if suffix[i] < pat[i]:
-                return -1
-            elif suffix[i] > pat[i]:
-                return 1
-        # All compared elements match
-        if len(suffix) < len(pat):
+    n = len(seq)
+    for offset, value in enumerate(pattern):
+        pos = start + offset
+        if pos >= n:
             return -1  # suffix is shorter, so it comes before
-        return 0  # matches or suffix is longer (which means match for prefix)
+        if seq[pos] < value:
+            return -1
+        if seq[pos] > value:
+            return 1
+    return 0
+
+
+def find_pattern_range(
+    seq: Sequence[int], sa: Sequence[int], pattern: Sequence[int]
+) -> tuple[int, int]:
+    """
+    Return the half-open suffix array range ``[lo, hi)`` of suffixes starting
+    with ``pattern``. Runs in O(m log n) without copying any suffix.
+    """
+    if not pattern:
+        return 0, 0
 
-    # Binary search for first occurrence
-    left, right = 0, len(suffixes)
-    first = -1
+    # Binary search for first suffix >= pattern
+    left, right = 0, len(sa)
     while left < right:
         mid = (left + right) // 2
-        cmp = compare(suffixes[mid][0], pattern)
-        if cmp < 0:
+        if _compare_suffix(seq, sa[mid], pattern) < 0:
             left = mid + 1
         else:
-            if matches_prefix(suffixes[mid][0], pattern):
-                first = mid
             right = mid
+    lo = left
+
+    # Binary search for first suffix > pattern (i.e. no longer a match)
+    right = len(sa)
+    while left < right:
+        mid = (left + right) // 2
+        if _compare_suffix(seq, sa[mid], pattern) <= 0:
+            left = mid + 1
+        else:
+            right = mid
+
+    return lo, left
 
-    if first == -1:
-        return 0
 
-    # Binary search for last occurrence
-    left, right = first, len(suffixes)
-    last = first
+def search_pattern(
+    seq: Sequence[int], sa: Sequence[int], pattern: Sequence[int]
+) -> int:
+    """
+    Search for a pattern in the suffix array using binary search.
+    Returns the count of occurrences.
+    """
+    lo, hi = find_pattern_range(seq, sa, pattern)
+    return hi - lo
+
+
+def _narrow_range(
+    seq: Sequence[int],
+    sa: Sequence[int],
+    lo: int,
+    hi: int,
+    offset: int,
+    symbol: int,
+) -> tuple[int, int]:
+    """
+    Restrict ``sa[lo:hi]``, whose suffixes share their first ``offset``
+    symbols, to those continuing with ``symbol``. Only one symbol per suffix
+    is compared, in place.
+    """
+    n = len(seq)
+    left, right = lo, hi
     while left < right:
         mid = (left + right) // 2
-        if matches_prefix(suffixes[mid][0], pattern):
-            last = mid
+        pos = sa[mid] + offset
+        if pos >= n or seq[pos] < symbol:
             left = mid + 1
         else:
             right = mid
+    start = left
+
+    right = hi
+    while left < right:
+        mid = (left + right) // 2
+        pos = sa[mid] + offset
+        if pos >= n or seq[pos] <= symbol:
+            left = mid + 1
+        else:
+            right = mid
+
+    return start, left
+
+
+def search_patterns(
+    seq: Sequence[int],
+    sa: Sequence[int],
+    patterns: Sequence[Sequence[int]],
+) -> list[tuple[int, list[int]]]:
+    """
+    Batched search: returns ``(count, sorted start positions)`` for every
+    pattern, in input order.
+
+    Patterns are processed in lexicographic order so the SA range narrowed for
+    a shared prefix is reused by the next pattern instead of being searched
+    again; each additional symbol costs one O(log n) narrowing step.
+    """
+    results: list[tuple[int, list[int]]] = [(0, [])] * len(patterns)
+    keyed = sorted(
+        (tuple(pattern), idx) for idx, pattern in enumerate(patterns) if pattern
+    )
 
-    return last - first + 1
+    # ranges[k] is the SA range of the first k symbols of the current pattern
+    ranges: list[tuple[int, int]] = [(0, len(sa))]
+    previous: tuple[int, ...] = ()
+    for pattern, idx in keyed:
+        common = 0
+        limit = min(len(previous), len(pattern))
+        while common < limit and previous[common] == pattern[common]:
+            common += 1
+        del ranges[common + 1 :]
+
+        for offset in range(common, len(pattern)):
+            lo, hi = ranges[-1]
+            if lo < hi:
+                lo, hi = _narrow_range(seq, sa, lo, hi, offset, pattern[offset])
+            ranges.append((lo, hi))
+
+        lo, hi = ranges[len(pattern)]
+        results[idx] = (hi - lo, sorted(sa[lo:hi]))
+        previous = pattern
+
+    return results
 
 
 def find_all_repeated_substrings(
@@ -188,20 +611,18 @@ def find_all_repeated_substrings(
     Find ALL repeated substrings (not just LCPs).
     Returns list of (length, substring, occurrence_count) tuples sorted by occurrence desc, length desc.
     """
-    suffixes = build_suffixes(seq)
+    sa = build_suffix_array(seq)
+    lcp = build_lcp_array(seq, sa)
 
-    # Collect all repeated prefixes between consecutive suffixes
+    # Every prefix owned by an lcp-interval occurs once per suffix in it
     all_repeated: dict[tuple[int, ...], int] = {}
 
-    for i in range(len(suffixes) - 1):
-        s1, _ = suffixes[i]
-        s2, _ = suffixes[i + 1]
-        length = lcp_length(s1, s2)
-
-        # For this LCP, collect ALL possible prefixes (length min_length, ..., lcp_length)
-        for prefix_len in range(min_length, length + 1):
-            prefix = tuple(s1[:prefix_len])
-            all_repeated[prefix] = all_repeated.get(prefix, 1) + 1
+    for lcp_value, lb, rb, parent_lcp, _nested in iter_lcp_intervals(
+        lcp, min_length=max(1, min_length)
+    ):
+        start = sa[lb]
+        for length in range(max(parent_lcp + 1, min_length), lcp_value + 1):
+            all_repeated[tuple(seq[start : start + length])] = rb - lb + 1
 
     # Convert to list and sort by occurrence count (desc), then by length (desc)
     result = [(len(prefix), prefix, count) for prefix, count in all_repeated.items()]
@@ -210,77 +631,601 @@ def find_all_repeated_substrings(
     return result
 
 
+@dataclass(frozen=True)
+class SuffixArrayIndex:
+    """
+    Suffix array index of one image's reading order.
+
+    ``seq`` holds the Gardiner ids, ``glyph_ids`` the glyph at each position,
+    ``sa`` the suffix array and ``lcp`` the Kasai LCP array. When loaded from
+    disk the arrays are int32 views over a memory-mapped file.
+    """
+
+    image_id: int
+    sort_version: int
+    seq: Sequence[int]
+    glyph_ids: Sequence[int]
+    sa: Sequence[int]
+    lcp: Sequence[int]
+
+    def count(self, pattern: Sequence[int]) -> int:
+        return search_pattern(self.seq, self.sa, pattern)
+
+    def positions(self, pattern: Sequence[int]) -> list[int]:
+        lo, hi = find_pattern_range(self.seq, self.sa, pattern)
+        return sorted(self.sa[lo:hi])
+
+    def search_many(
+        self, patterns: Sequence[Sequence[int]]
+    ) -> list[tuple[int, list[int]]]:
+        return search_patterns(self.seq, self.sa, patterns)
+
+
+def build_suffixarray_index(
+    image_id: int,
+    sort_version: int,
+    sequence_pairs: Sequence[tuple[int, int]],
+) -> SuffixArrayIndex:
+    seq = array("i", (gid for gid, _ in sequence_pairs))
+    sa = build_suffix_array(seq)
+    return SuffixArrayIndex(
+        image_id=image_id,
+        sort_version=sort_version,
+        seq=seq,
+        glyph_ids=array("i", (glyph_id for _, glyph_id in sequence_pairs)),
+        sa=sa,
+        lcp=build_lcp_array(seq, sa),
+    )
+
+
+def _index_path(image_id: int, sort_version: int) -> Path:
+    return INDEX_DIR / f"image_{image_id}_v{sort_version}.sai"
+
+
+def write_int32_file(
+    path: Path, header: bytes, arrays: Sequence[Sequence[int]]
+) -> None:
+    """
+    Atomically write ``header`` followed by little-endian int32 arrays. Each
+    writer uses its own temporary file, so concurrent writers of the same
+    path cannot interleave; the last one to finish wins.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+    ) as fh:
+        tmp_path = Path(fh.name)
+        try:
+            fh.write(header)
+            for values in arrays:
+                buf = array("i", values)
+                if sys.byteorder != "little":
+                    buf.byteswap()
+                buf.tofile(fh)
+        except BaseException:
+            fh.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+    os.replace(tmp_path, path)
+
+
+def map_int32_file(path: Path, header_size: int) -> tuple[bytes, Sequence[int]]:
+    """
+    Return the raw header and an int32 view of everything after it. A
+    trailing partial int32 is ignored; callers check the view is long
+    enough for the sizes in their header.
+    """
+    with open(path, "rb") as fh:
+        header = fh.read(header_size)
+        size = fh.seek(0, os.SEEK_END)
+        end = header_size + max(0, size - header_size) // 4 * 4
+        if end <= header_size:
+            return header, array("i")
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if sys.byteorder == "little":
+        return header, memoryview(mapped)[header_size:end].cast("i")
+    values = array("i", mapped[header_size:end])
+    values.byteswap()
+    return header, values
+
+
+def write_suffixarray_index(index: SuffixArrayIndex) -> Path:
+    """
+    Persist an index as a header followed by four little-endian int32 arrays
+    (seq, glyph_ids, sa, lcp). Older versions for the same image are removed.
+    """
+    path = _index_path(index.image_id, index.sort_version)
+    header = _INDEX_HEADER.pack(
+        _INDEX_MAGIC, index.image_id, index.sort_version, len(index.seq)
+    )
+    write_int32_file(path, header, (index.seq, index.glyph_ids, index.sa, index.lcp))
+
+    for stale in INDEX_DIR.glob(f"image_{index.image_id}_v*.sai"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def load_suffixarray_index(
+    image_id: int, sort_version: int | None = None
+) -> SuffixArrayIndex | None:
+    """
+    Memory-map the on-disk index of an image without touching the database.
+    With ``sort_version`` None the newest index file is used. Returns None if
+    no matching index exists.
+    """
+    if sort_version is None:
+        candidates = sorted(
+            INDEX_DIR.glob(f"image_{image_id}_v*.sai"),
+            key=lambda p: int(p.stem.rsplit("_v", 1)[1]),
+        )
+        if not candidates:
+            return None
+        path = candidates[-1]
+    else:
+        path = _index_path(image_id, sort_version)
+        if not path.exists():
+            return None
+
+    header, view = map_int32_file(path, _INDEX_HEADER.size)
+    if len(header) < _INDEX_HEADER.size:
+        return None
+    magic, stored_image, stored_version, n = _INDEX_HEADER.unpack(header)
+    if magic != _INDEX_MAGIC or stored_image != image_id or len(view) < 4 * n:
+        return None
+
+    return SuffixArrayIndex(
+        image_id=image_id,
+        sort_version=stored_version,
+        seq=view[0:n],
+        glyph_ids=view[n : 2 * n],
+        sa=view[2 * n : 3 * n],
+        lcp=view[3 * n : 4 * n],
+    )
+
+
+def get_suffixarray_index(image_id: int) -> SuffixArrayIndex | None:
+    """
+    Return the index for the current reading order, building and persisting it
+    from the database when the on-disk copy is missing or stale.
+    """
+    sort_version = fetch_sort_version(image_id)
+    index = load_suffixarray_index(image_id, sort_version)
+    if index is not None:
+        return index
+
+    sequence_pairs = fetch_sorted_gardiner_ids(image_id)
+    if not sequence_pairs:
+        return None
+    index = build_suffixarray_index(image_id, sort_version, sequence_pairs)
+    write_suffixarray_index(index)
+    return index
+
+
+def fetch_glyph_geometry(
+    image_id: int,
+) -> dict[int, tuple[float, float, float, float, int]]:
+    """Map glyph id -> (x, y, width, height, column) for an image."""
+    # Glyphs missing from the sorted table are kept (in column 0).
+    geometry = get_glyph_geometry(image_id)
+    return geometry.column_map() if geometry else {}
+
+
+def column_bboxes(
+    glyph_ids: Sequence[int],
+    glyph_map: dict[int, tuple[float, float, float, float, int]],
+) -> list[tuple[float, float, float, float]]:
+    """
+    Bounding boxes (x, y, height, width) of an occurrence, one per column it
+    spans, in column order.
+    """
+    glyphs_by_column: dict[int, list[tuple[float, float, float, float]]] = {}
+    for glyph_id in glyph_ids:
+        glyph_data = glyph_map.get(int(glyph_id))
+        if glyph_data is None:
+            # Skip missing glyphs entirely; without geometry we cannot build a bbox.
+            continue
+        x, y, width, height, col = glyph_data
+        glyphs_by_column.setdefault(col, []).append((x, y, width, height))
+
+    bboxes: list[tuple[float, float, float, float]] = []
+    for col in sorted(glyphs_by_column):
+        col_glyphs = glyphs_by_column[col]
+        min_x = min(g[0] for g in col_glyphs)
+        min_y = min(g[1] for g in col_glyphs)
+        max_x = max(g[0] + g[2] for g in col_glyphs)
+        max_y = max(g[1] + g[3] for g in col_glyphs)
+        bboxes.append((min_x, min_y, max_y - min_y, max_x - min_x))
+    return bboxes
+
+
+OCCURRENCE_STORAGE = ("rows", "offsets")
+
+# "wildcard" patterns (src.wildcard) hold None/NULL in their wildcard slot.
+PATTERN_TYPES = ("exact", "wildcard")
+
+
+def _save_reading_order(
+    cur,
+    image_id: int,
+    sort_version: int,
+    glyph_ids: Sequence[int],
+    glyph_map: dict[int, tuple[float, float, float, float, int]],
+) -> None:
+    """
+    Upsert the reading order (glyph ids and their columns) for
+    ``sort_version`` and drop older versions no pattern refers to any more.
+    """
+    columns = [
+        glyph_map[gid][4] if gid in glyph_map else 0 for gid in map(int, glyph_ids)
+    ]
+    cur.execute(
+        """
+        DELETE FROM T_READING_ORDERS
+        WHERE id_image = %s
+          AND sort_version <> %s
+          AND sort_version NOT IN (
+              SELECT sort_version FROM T_SUFFIXARRAY_PATTERNS
+              WHERE id_image = %s AND sort_version IS NOT NULL
+          )
+        """,
+        (image_id, sort_version, image_id),
+    )
+    cur.execute(
+        """
+        INSERT INTO T_READING_ORDERS (id_image, sort_version, glyph_ids, v_columns)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (id_image, sort_version)
+        DO UPDATE SET glyph_ids = EXCLUDED.glyph_ids, v_columns = EXCLUDED.v_columns
+        """,
+        (image_id, sort_version, list(glyph_ids), columns),
+    )
+
+
+def _write_patterns(
+    cur,
+    image_id: int,
+    patterns: list[tuple[tuple[int, ...], list[int]]],
+    glyph_ids: Sequence[int],
+    glyph_map: dict[int, tuple[float, float, float, float, int]],
+    storage: str,
+    sort_version: int,
+    pattern_type: str = "exact",
+) -> None:
+    if not patterns:
+        return
+
+    pattern_ids = reserve_ids(cur, "T_SUFFIXARRAY_PATTERN_SEQ", len(patterns))
+    pattern_columns = (
+        "id",
+        "id_image",
+        "gardiner_ids",
+        "sequence_length",
+        "sequence_count",
+        "sort_version",
+        "start_offsets",
+        "pattern_type",
+        "storage",
+    )
+
+    if storage == "offsets":
+        copy_rows(
+            cur,
+            "T_SUFFIXARRAY_PATTERNS",
+            pattern_columns,
+            (
+                (
+                    pattern_id,
+                    image_id,
+                    list(pattern),
+                    len(pattern),
+                    len(starts),
+                    sort_version,
+                    sorted(starts),
+                    pattern_type,
+                    storage,
+                )
+                for pattern_id, (pattern, starts) in zip(pattern_ids, patterns)
+            ),
+        )
+        return
+
+    occ_ids = iter(
+        reserve_ids(
+            cur,
+            "T_SUFFIXARRAY_OCCURENCES_SEQ",
+            sum(len(starts) for _, starts in patterns),
+        )
+    )
+
+    pattern_rows: list[
+        tuple[int, int, list[int], int, int, int, list[int], str, str]
+    ] = []
+    occurrence_rows: list[tuple[int, int, list[int]]] = []
+    bbox_rows: list[tuple[int, float, float, float, float]] = []
+    for pattern_id, (pattern, starts) in zip(pattern_ids, patterns):
+        pat_len = len(pattern)
+        pattern_rows.append(
+            (
+                pattern_id,
+                image_id,
+                list(pattern),
+                pat_len,
+                len(starts),
+                sort_version,
+                sorted(starts),
+                pattern_type,
+                storage,
+            )
+        )
+        for start in starts:
+            occ_id = next(occ_ids)
+            occ_glyphs = list(glyph_ids[start : start + pat_len])
+            occurrence_rows.append((occ_id, pattern_id, occ_glyphs))
+            bbox_rows.extend(
+                (occ_id, *bbox) for bbox in column_bboxes(occ_glyphs, glyph_map)
+            )
+
+    bbox_ids = reserve_ids(cur, "T_SUFFIXARRAY_OCCURENCES_BBOXES_SEQ", len(bbox_rows))
+
+    copy_rows(cur, "T_SUFFIXARRAY_PATTERNS", pattern_columns, pattern_rows)
+    copy_rows(
+        cur,
+        "T_SUFFIXARRAY_OCCURENCES",
+        ("id", "id_pattern", "glyph_ids"),
+        occurrence_rows,
+    )
+    copy_rows(
+        cur,
+        "T_SUFFIXARRAY_OCCURENCES_BBOXES",
+        ("id", "id_occ", "bbox_x", "bbox_y", "bbox_height", "bbox_width"),
+        ((bbox_id, *row) for bbox_id, row in zip(bbox_ids, bbox_rows)),
+    )
+
+
 def persist_suffixarray_patterns(
     image_id: int,
     occurrences: dict[tuple[int, ...], list[int]],
     glyph_ids: Sequence[int],
+    glyph_map: dict[int, tuple[float, float, float, float, int]] | None = None,
+    *,
+    storage: str = "rows",
+    sort_version: int | None = None,
+    pattern_type: str = "exact",
 ) -> None:
+    """
+    Write patterns and their occurrences in a single transaction, together
+    with the reading order ``glyph_ids`` they were found in.
+
+    ``storage="rows"`` writes one T_SUFFIXARRAY_OCCURENCES row per occurrence
+    plus its per-column bboxes. ``storage="offsets"`` only stores the start
+    offsets on the pattern row; glyph ids and bboxes are derived on read by
+    load_offset_occurrences. Ids are drawn from the table sequences up front
+    so rows are linked client-side and streamed with COPY. ``pattern_type``
+    is one of PATTERN_TYPES.
+    """
+    if storage not in OCCURRENCE_STORAGE:
+        raise ValueError(f"storage must be one of {OCCURRENCE_STORAGE}")
+    if pattern_type not in PATTERN_TYPES:
+        raise ValueError(f"pattern_type must be one of {PATTERN_TYPES}")
+
     patterns = list(occurrences.items())
 
     if not patterns:
         return
 
+    if sort_version is None:
+        sort_version = fetch_sort_version(image_id)
+    if glyph_map is None:
+        glyph_map = fetch_glyph_geometry(image_id)
+
     conn = connect()
     cur = conn.cursor()
     try:
-        pattern_rows = [
-            (image_id, list(pattern), len(pattern), len(starts))
-            for pattern, starts in patterns
-        ]
-
-        # Insert patterns
-        psycopg2.extras.execute_values(
+        _save_reading_order(cur, image_id, sort_version, glyph_ids, glyph_map)
+        _write_patterns(
             cur,
-            """
-            INSERT INTO T_SUFFIXARRAY_PATTERNS (id_image, gardiner_ids, sequence_length, sequence_count)
-            VALUES %s
-            """,
-            pattern_rows,
-            page_size=100,
+            image_id,
+            patterns,
+            glyph_ids,
+            glyph_map,
+            storage,
+            sort_version,
+            pattern_type,
         )
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        conn.close()
+
+    return None
+
 
-        # Fetch all pattern IDs for this image in the same order
-        cur.execute(
+def _column_breaks(
+    glyphs: Sequence[int], columns: dict[int, int]
+) -> tuple[bool, ...] | None:
+    """Where an occurrence moves to the next column, i.e. how its bboxes split."""
+    try:
+        cols = [columns[gid] for gid in glyphs]
+    except KeyError:
+        return None
+    return tuple(a != b for a, b in pairwise(cols))
+
+
+def diff_suffixarray_patterns(
+    image_id: int,
+    occurrences: dict[tuple[int, ...], list[int]],
+    glyph_ids: Sequence[int],
+    glyph_map: dict[int, tuple[float, float, float, float, int]],
+    *,
+    storage: str = "rows",
+    pattern_type: str = "exact",
+) -> tuple[
+    list[int], dict[int, list[int]], list[int], dict[tuple[int, ...], list[int]]
+]:
+    """
+    Compare freshly mined ``occurrences`` with the patterns stored for the
+    image. Returns (kept pattern ids, kept pattern id -> new start offsets
+    where they moved, stale pattern ids, patterns to write).
+
+    A stored pattern is kept when it uses the same storage and its start
+    offsets, read in the reading order it was stored with (T_READING_ORDERS
+    at its sort_version), cover exactly the same glyph runs. Row-stored
+    patterns must also split across columns the same way, since their bboxes
+    are stored. Occurrence rows are never loaded. Only stored patterns of
+    ``pattern_type`` are compared.
+    """
+    stored = select(
+        """
+        SELECT id, gardiner_ids, sort_version, start_offsets, storage
+        FROM T_SUFFIXARRAY_PATTERNS
+        WHERE id_image = %s AND pattern_type = %s
+        """,
+        (image_id, pattern_type),
+    )
+    if not stored:
+        return [], {}, [], dict(occurrences)
+
+    versions = sorted({int(row[2]) for row in stored if row[2] is not None})
+    orders = {
+        int(version): (list(order or []), list(columns or []))
+        for version, order, columns in select(
             """
-            SELECT id, gardiner_ids FROM T_SUFFIXARRAY_PATTERNS 
-            WHERE id_image = %s 
-            ORDER BY id DESC 
-            LIMIT %s
+            SELECT sort_version, glyph_ids, v_columns
+            FROM T_READING_ORDERS
+            WHERE id_image = %s AND sort_version = ANY(%s)
             """,
-            (image_id, len(patterns)),
+            (image_id, versions),
         )
-        pattern_data = cur.fetchall()
+    }
+    old_columns = {
+        version: dict(zip(order, columns))
+        for version, (order, columns) in orders.items()
+    }
+    new_columns = {gid: geometry[4] for gid, geometry in glyph_map.items()}
+
+    kept: list[int] = []
+    moved: dict[int, list[int]] = {}
+    stale: list[int] = []
+    remaining = dict(occurrences)
+    for pattern_id, gardiner_ids, version, offsets, stored_storage in stored:
+        key = tuple(None if gid is None else int(gid) for gid in gardiner_ids or [])
+        starts = remaining.get(key)
+        if (
+            starts is None
+            or offsets is None
+            or stored_storage != storage
+            or version is None
+            or int(version) not in orders
+        ):
+            stale.append(int(pattern_id))
+            continue
 
-        # Build a map from gardiner_ids to pattern_id
-        gardiner_to_id = {tuple(row[1]): row[0] for row in pattern_data}
+        length = len(key)
+        old_order = orders[int(version)][0]
+        new_occs = sorted(tuple(glyph_ids[s : s + length]) for s in starts)
+        same = sorted(tuple(old_order[s : s + length]) for s in offsets) == new_occs
+        if same and storage == "rows":
+            same = all(
+                _column_breaks(occ, old_columns[int(version)])
+                == _column_breaks(occ, new_columns)
+                for occ in new_occs
+            )
 
-        occurrence_rows: list[tuple[int, list[int]]] = []
-        for ((pattern, starts),) in zip(patterns):
-            pattern_tuple = tuple(pattern)
-            pattern_id = gardiner_to_id.get(pattern_tuple)
+        if same:
+            kept.append(int(pattern_id))
+            if sorted(offsets) != sorted(starts):
+                moved[int(pattern_id)] = sorted(starts)
+            del remaining[key]
+        else:
+            stale.append(int(pattern_id))
 
-            if pattern_id is None:
-                print(f"Warning: Could not find pattern {pattern}")
-                continue
+    return kept, moved, stale, remaining
 
-            pat_len = len(pattern)
-            for start in starts:
-                occurrence_rows.append(
-                    (pattern_id, list(glyph_ids[start : start + pat_len]))
-                )
 
-        if occurrence_rows:
+def update_suffixarray_patterns(
+    image_id: int,
+    occurrences: dict[tuple[int, ...], list[int]],
+    glyph_ids: Sequence[int],
+    glyph_map: dict[int, tuple[float, float, float, float, int]] | None = None,
+    *,
+    storage: str = "rows",
+    sort_version: int | None = None,
+    pattern_type: str = "exact",
+) -> dict[str, int]:
+    """
+    Bring the stored patterns of an image in line with ``occurrences``,
+    writing only the difference (see diff_suffixarray_patterns) in a single
+    transaction. Returns how many patterns were kept, removed and added.
+    Patterns of other types are left alone.
+    """
+    if storage not in OCCURRENCE_STORAGE:
+        raise ValueError(f"storage must be one of {OCCURRENCE_STORAGE}")
+    if pattern_type not in PATTERN_TYPES:
+        raise ValueError(f"pattern_type must be one of {PATTERN_TYPES}")
+
+    if sort_version is None:
+        sort_version = fetch_sort_version(image_id)
+    if glyph_map is None:
+        glyph_map = fetch_glyph_geometry(image_id)
+
+    kept, moved, stale, added = diff_suffixarray_patterns(
+        image_id,
+        occurrences,
+        glyph_ids,
+        glyph_map,
+        storage=storage,
+        pattern_type=pattern_type,
+    )
+
+    conn = connect()
+    cur = conn.cursor()
+    try:
+        if stale:
+            # Occurrences and their bboxes go with the pattern (on delete cascade).
+            cur.execute(
+                "DELETE FROM T_SUFFIXARRAY_PATTERNS WHERE id = ANY(%s)", (stale,)
+            )
+        if kept:
+            cur.execute(
+                """
+                UPDATE T_SUFFIXARRAY_PATTERNS SET sort_version = %s
+                WHERE id = ANY(%s)
+                """,
+                (sort_version, kept),
+            )
+        if moved:
+            # Same glyph runs at new positions, e.g. after an earlier column
+            # was re-sorted.
             psycopg2.extras.execute_values(
                 cur,
                 """
-                INSERT INTO T_SUFFIXARRAY_OCCURENCES (id_pattern, glyph_ids)
-                VALUES %s
+                UPDATE T_SUFFIXARRAY_PATTERNS AS pat
+                SET start_offsets = v.start_offsets
+                FROM (VALUES %s) AS v (id, start_offsets)
+                WHERE pat.id = v.id
                 """,
-                occurrence_rows,
-                page_size=500,
+                list(moved.items()),
+                template="(%s, %s::integer[])",
             )
-
+        _save_reading_order(cur, image_id, sort_version, glyph_ids, glyph_map)
+        _write_patterns(
+            cur,
+            image_id,
+            list(added.items()),
+            glyph_ids,
+            glyph_map,
+            storage,
+            sort_version,
+            pattern_type,
+        )
         conn.commit()
     except Exception:
         conn.rollback()
@@ -292,13 +1237,67 @@ def persist_suffixarray_patterns(
             pass
         conn.close()
 
-    return None
+    return {"kept": len(kept), "removed": len(stale), "added": len(added)}
+
+
+def load_offset_occurrences(
+    pattern_ids: Sequence[int],
+) -> dict[int, list[tuple[int, list[int], list[tuple[float, float, float, float]]]]]:
+    """
+    Expand patterns stored with ``storage="offsets"`` into
+    (start, glyph_ids, bboxes) per occurrence, using the reading order the
+    pattern was mined from. Patterns stored as rows are not returned.
+    """
+    if not pattern_ids:
+        return {}
+
+    pattern_rows = select(
+        """
+        SELECT id, id_image, sort_version, sequence_length, start_offsets
+        FROM T_SUFFIXARRAY_PATTERNS
+        WHERE id = ANY(%s) AND storage = 'offsets'
+        """,
+        (list(pattern_ids),),
+    )
+    if not pattern_rows:
+        return {}
+
+    orders: dict[tuple[int, int], list[int]] = {}
+    geometry: dict[int, dict[int, tuple[float, float, float, float, int]]] = {}
+    for image_id, sort_version in {(int(r[1]), int(r[2])) for r in pattern_rows}:
+        rows = select(
+            """
+            SELECT glyph_ids FROM T_READING_ORDERS
+            WHERE id_image = %s AND sort_version = %s
+            """,
+            (image_id, sort_version),
+        )
+        orders[(image_id, sort_version)] = list(rows[0][0] or []) if rows else []
+        if image_id not in geometry:
+            geometry[image_id] = fetch_glyph_geometry(image_id)
+
+    out: dict[
+        int, list[tuple[int, list[int], list[tuple[float, float, float, float]]]]
+    ] = {}
+    for pattern_id, image_id, sort_version, length, starts in pattern_rows:
+        order = orders[(int(image_id), int(sort_version))]
+        glyph_map = geometry[int(image_id)]
+        occs = out.setdefault(int(pattern_id), [])
+        for start in starts or []:
+            occ_glyphs = order[start : start + int(length)]
+            if len(occ_glyphs) != length:
+                continue
+            occs.append((int(start), occ_glyphs, column_bboxes(occ_glyphs, glyph_map)))
+    return out
 
 
 def store_occurrence_bboxes(image_id: int) -> None:
     """
     Compute and persist bounding boxes for each suffix array occurrence, grouped by column.
     Multiple boxes can be stored for a single occurrence when it spans several columns.
+    persist_suffixarray_patterns already writes them; use this to rebuild them.
+    Patterns stored as offsets have no occurrence rows; their bboxes are
+    derived on read by load_offset_occurrences.
     """
     occ_rows = select(
         """
@@ -312,54 +1311,18 @@ def store_occurrence_bboxes(image_id: int) -> None:
     if not occ_rows:
         return
 
-    # Use a left join so we still get geometry even if a glyph is missing from the sorted table.
-    glyph_rows = select(
-        """
-        SELECT gr.id, gr.bbox_x, gr.bbox_y, gr.bbox_width, gr.bbox_height, gs.v_column
-        FROM T_GLYPHES_RAW AS gr
-        LEFT JOIN T_GLYPHES_SORTED AS gs ON gs.id_glyph = gr.id
-        WHERE gr.id_image = %s
-        """,
-        (image_id,),
-    )
-    if not glyph_rows:
+    glyph_map = fetch_glyph_geometry(image_id)
+    if not glyph_map:
         return
 
-    glyph_map: dict[int, tuple[float, float, float, float, int]] = {}
-    for gid, x, y, width, height, col in glyph_rows:
-        if any(val is None for val in (gid, x, y, width, height)):
-            continue
-        col_idx = int(col) if col is not None else 0
-        glyph_map[int(gid)] = (
-            float(x),
-            float(y),
-            float(width),
-            float(height),
-            col_idx,
-        )
-
     bbox_rows: list[tuple[int, float, float, float, float]] = []
 
     for occ_id, glyph_ids in occ_rows:
         if not glyph_ids:
             continue
-
-        glyphs_by_column: dict[int, list[tuple[float, float, float, float]]] = {}
-        for glyph_id in glyph_ids:
-            glyph_data = glyph_map.get(int(glyph_id))
-            if glyph_data is None:
-                # Skip missing glyphs entirely; without geometry we cannot build a bbox.
-                continue
-            x, y, width, height, col = glyph_data
-            glyphs_by_column.setdefault(col, []).append((x, y, width, height))
-
-        for col in sorted(glyphs_by_column):
-            col_glyphs = glyphs_by_column[col]
-            min_x = min(g[0] for g in col_glyphs)
-            min_y = min(g[1] for g in col_glyphs)
-            max_x = max(g[0] + g[2] for g in col_glyphs)
-            max_y = max(g[1] + g[3] for g in col_glyphs)
-            bbox_rows.append((occ_id, min_x, min_y, max_y - min_y, max_x - min_x))
+        bbox_rows.extend(
+            (occ_id, *bbox) for bbox in column_bboxes(glyph_ids, glyph_map)
+        )
 
     if bbox_rows:
         insert(
@@ -372,31 +1335,127 @@ def store_occurrence_bboxes(image_id: int) -> None:
         )
 
 
+def mine_suffixarray(
+    image_id: int,
+    sort_version: int,
+    sequence_pairs: list[tuple[int, int]],
+    *,
+    min_length: int = 2,
+    mode: str = "all",
+    top_k: int | None = None,
+    score: str = "count",
+    max_occurrences: int | None = None,
+    write_index: bool = True,
+) -> dict[tuple[int, ...], list[int]]:
+    """
+    Build and save the image's suffix array index, then mine it. Setting
+    ``top_k`` or ``max_occurrences`` keeps only the best repeats by ``score``
+    (see find_top_suffixarray_occurrences). Pass ``write_index=False`` when
+    ``sequence_pairs`` is not the plain reading order (e.g. separate_columns),
+    since the on-disk index serves searches over the reading order.
+    """
+    index = build_suffixarray_index(image_id, sort_version, sequence_pairs)
+    if write_index:
+        write_suffixarray_index(index)
+
+    if top_k is not None or max_occurrences is not None:
+        return find_top_suffixarray_occurrences(
+            index.seq,
+            min_length=min_length,
+            mode=mode,
+            top_k=top_k,
+            score=score,
+            max_occurrences=max_occurrences,
+            sa=index.sa,
+            lcp=index.lcp,
+        )
+    return find_suffixarray_occurrences(
+        index.seq,
+        min_length=min_length,
+        mode=mode,
+        sa=index.sa,
+        lcp=index.lcp,
+    )
+
+
+def save_suffixarray_results(
+    image_id: int,
+    occurrences: dict[tuple[int, ...], list[int]],
+    glyph_ids: Sequence[int],
+    *,
+    storage: str = "rows",
+    sort_version: int | None = None,
+    incremental: bool = False,
+    pattern_type: str = "exact",
+) -> None:
+    """
+    Store mined patterns, either appended (persist_suffixarray_patterns) or,
+    with ``incremental``, updating the stored analysis in place
+    (update_suffixarray_patterns).
+    """
+    if incremental:
+        update_suffixarray_patterns(
+            image_id,
+            occurrences,
+            glyph_ids,
+            storage=storage,
+            sort_version=sort_version,
+            pattern_type=pattern_type,
+        )
+    elif occurrences:
+        persist_suffixarray_patterns(
+            image_id,
+            occurrences,
+            glyph_ids,
+            storage=storage,
+            sort_version=sort_version,
+            pattern_type=pattern_type,
+        )
+
+
 def run_suffixarray(
     image_id: int,
     *,
     min_length: int = 2,
+    mode: str = "all",
+    storage: str = "rows",
+    incremental: bool = False,
+    top_k: int | None = None,
+    score: str = "count",
+    max_occurrences: int | None = None,
 ) -> dict[tuple[int, ...], list[int]]:
     """
     Run suffix array analysis on an image, similar to run_ngram workflow.
+    ``mode`` is one of REPEAT_MODES (see find_suffixarray_occurrences),
+    ``storage`` one of OCCURRENCE_STORAGE (see persist_suffixarray_patterns).
+    ``top_k``, ``score`` and ``max_occurrences`` bound the mining (see
+    mine_suffixarray). With ``incremental`` only changed patterns are
+    rewritten (see save_suffixarray_results).
     Returns occurrences dict for further processing.
     """
     sequence_pairs = fetch_sorted_gardiner_ids(image_id)
-    if not sequence_pairs:
-        return {}
-
-    gardiner_ids = [gid for gid, _ in sequence_pairs]
-    glyph_ids = [glyph_id for _, glyph_id in sequence_pairs]
+    sort_version = fetch_sort_version(image_id)
+    occurrences: dict[tuple[int, ...], list[int]] = {}
+    if sequence_pairs:
+        occurrences = mine_suffixarray(
+            image_id,
+            sort_version,
+            sequence_pairs,
+            min_length=min_length,
+            mode=mode,
+            top_k=top_k,
+            score=score,
+            max_occurrences=max_occurrences,
+        )
 
-    occurrences = find_suffixarray_occurrences(
-        gardiner_ids,
-        min_length=min_length,
+    save_suffixarray_results(
+        image_id,
+        occurrences,
+        [glyph_id for _, glyph_id in sequence_pairs],
+        storage=storage,
+        sort_version=sort_version,
+        incremental=incremental,
     )
-
-    if occurrences:
-        persist_suffixarray_patterns(image_id, occurrences, glyph_ids)
-        store_occurrence_bboxes(image_id)
-
     return occurrences
 
 
@@ -408,6 +1467,32 @@ if __name__ == "__main__":
     parser.add_argument(
         "--min-length", type=int, default=2, help="Minimum pattern length"
     )
+    parser.add_argument(
+        "--mode",
+        choices=REPEAT_MODES,
+        default="all",
+        help="Which repeats to keep: all prefixes, closed, maximal or supermaximal",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=OCCURRENCE_STORAGE,
+        default="rows",
+        help="Store one row per occurrence or start offsets per pattern",
+    )
+    parser.add_argument(
+        "--top-k", type=int, help="Keep only the best K repeats by --score"
+    )
+    parser.add_argument("--score", choices=PATTERN_SCORES, default="count")
+    parser.add_argument(
+        "--max-occurrences",
+        type=int,
+        help="Upper bound on the total number of occurrences kept",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Update the stored analysis, rewriting only changed patterns",
+    )
     parser.add_argument(
         "--search",
         type=str,
@@ -420,21 +1505,30 @@ if __name__ == "__main__":
         # Search mode
         print(f"Searching for pattern '{args.search}' in image {args.image_id}...")
 
-        sequence_pairs = fetch_sorted_gardiner_ids(args.image_id)
-        if not sequence_pairs:
+        # Uses the on-disk index when it matches the current reading order
+        index = get_suffixarray_index(args.image_id)
+        if index is None:
             print("No sequence found for this image")
         else:
-            gardiner_ids = [gid for gid, _ in sequence_pairs]
-            suffixes = build_suffixes(gardiner_ids)
-
             pattern = [int(x.strip()) for x in args.search.split(",")]
-            count = search_pattern(suffixes, pattern)
+            count = search_pattern(index.seq, index.sa, pattern)
 
             print(f"Pattern {pattern} found {count} times")
+            if count:
+                print(f"Start positions: {index.positions(pattern)}")
     else:
         # Analysis mode
         print(f"Running suffix array analysis on image {args.image_id}...")
-        occurrences = run_suffixarray(args.image_id, min_length=args.min_length)
+        occurrences = run_suffixarray(
+            args.image_id,
+            min_length=args.min_length,
+            mode=args.mode,
+            storage=args.storage,
+            incremental=args.incremental,
+            top_k=args.top_k,
+            score=args.score,
+            max_occurrences=args.max_occurrences,
+        )
 
         print(f"Found {len(occurrences)} unique patterns")
         print(
@@ -447,3 +1541,5 @@ if __name__ == "__main__":
 
 # Für Analyse:
 # .archeo/bin/python src/suffixarray.py 1 --min-length 2
+# .archeo/bin/python src/suffixarray.py 1 --min-length 2 --mode maximal
+# .archeo/bin/python src/suffixarray.py 1 --top-k 500 --score stability
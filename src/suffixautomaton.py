@@ -0,0 +1,184 @@
+"""Online suffix automaton over Gardiner ids.
+
+Glyphs can be appended one at a time (amortised O(1) each) while the
+automaton keeps the statistics that matter during manual sorting up to date:
+the longest repeated sequence so far, the number of distinct substrings and
+the number of distinct n-grams for a few tracked lengths. Occurrence counts
+are derived on demand.
+"""
+
+import argparse
+from array import array
+from typing import Iterable, Sequence
+
+from src.suffixarray import fetch_sorted_gardiner_ids
+
+
+class SuffixAutomaton:
+    """
+    State 0 is the initial state. ``length[v]`` is the longest string reaching
+    state ``v``, ``link[v]`` its suffix link and ``transitions[v]`` maps a
+    Gardiner id to the next state.
+    """
+
+    __slots__ = (
+        "_counts",
+        "distinct_ngrams",
+        "distinct_substrings",
+        "is_clone",
+        "last",
+        "length",
+        "link",
+        "longest_repeat_end",
+        "longest_repeat_length",
+        "ngram_lengths",
+        "text",
+        "transitions",
+    )
+
+    def __init__(self, ngram_lengths: Iterable[int] = (2, 3)):
+        self.text = array("i")
+        self.length = array("i", [0])
+        self.link = array("i", [-1])
+        self.transitions: list[dict[int, int]] = [{}]
+        self.is_clone = array("b", [0])
+        self.last = 0
+        self.distinct_substrings = 0
+        self.longest_repeat_length = 0
+        self.longest_repeat_end = -1
+        self.ngram_lengths = tuple(sorted({int(n) for n in ngram_lengths if n > 0}))
+        self.distinct_ngrams = {n: 0 for n in self.ngram_lengths}
+        self._counts: array | None = None
+
+    def _new_state(
+        self, length: int, link: int, trans: dict[int, int], clone: bool
+    ) -> int:
+        self.length.append(length)
+        self.link.append(link)
+        self.transitions.append(trans)
+        self.is_clone.append(1 if clone else 0)
+        return len(self.length) - 1
+
+    def extend(self, symbol: int) -> None:
+        length, link, transitions = self.length, self.link, self.transitions
+        self.text.append(symbol)
+        self._counts = None
+
+        cur = self._new_state(length[self.last] + 1, 0, {}, False)
+        p = self.last
+        while p != -1 and symbol not in transitions[p]:
+            transitions[p][symbol] = cur
+            p = link[p]
+
+        if p != -1:
+            q = transitions[p][symbol]
+            if length[p] + 1 == length[q]:
+                link[cur] = q
+            else:
+                clone = self._new_state(
+                    length[p] + 1, link[q], dict(transitions[q]), True
+                )
+                while p != -1 and transitions[p].get(symbol) == q:
+                    transitions[p][symbol] = clone
+                    p = link[p]
+                link[q] = clone
+                link[cur] = clone
+        self.last = cur
+
+        # Cloning keeps the sum of length[v] - length[link[v]] unchanged, so
+        # only the new state adds substrings: those ending here and nowhere
+        # before, i.e. the suffixes longer than the longest repeated suffix.
+        repeated = length[link[cur]]
+        self.distinct_substrings += length[cur] - repeated
+        if repeated > self.longest_repeat_length:
+            self.longest_repeat_length = repeated
+            self.longest_repeat_end = len(self.text) - 1
+        for n in self.ngram_lengths:
+            if n <= len(self.text) and repeated < n:
+                self.distinct_ngrams[n] += 1
+
+    def extend_many(self, symbols: Iterable[int]) -> None:
+        for symbol in symbols:
+            self.extend(symbol)
+
+    def longest_repeat(self) -> tuple[int, ...]:
+        """Longest sequence occurring at least twice so far (may overlap)."""
+        end = self.longest_repeat_end + 1
+        return tuple(self.text[end - self.longest_repeat_length : end])
+
+    def count_distinct_ngrams(self, n: int) -> int:
+        """Distinct substrings of length ``n``; O(1) for tracked lengths."""
+        if n in self.distinct_ngrams:
+            return self.distinct_ngrams[n]
+        return sum(
+            1
+            for v in range(1, len(self.length))
+            if self.length[self.link[v]] < n <= self.length[v]
+        )
+
+    def _occurrence_counts(self) -> array:
+        # Each non-clone state marks one end position; propagate up the
+        # suffix-link tree from the longest states (counting sort by length).
+        if self._counts is not None:
+            return self._counts
+        size = len(self.length)
+        counts = array("i", (0 if c else 1 for c in self.is_clone))
+        counts[0] = 0
+        buckets = array("i", [0]) * (len(self.text) + 2)
+        for v in range(size):
+            buckets[self.length[v]] += 1
+        for i in range(1, len(buckets)):
+            buckets[i] += buckets[i - 1]
+        order = array("i", [0]) * size
+        for v in range(size - 1, -1, -1):
+            buckets[self.length[v]] -= 1
+            order[buckets[self.length[v]]] = v
+        for v in reversed(order):
+            if self.link[v] > 0:
+                counts[self.link[v]] += counts[v]
+        self._counts = counts
+        return counts
+
+    def _walk(self, pattern: Sequence[int]) -> int | None:
+        state = 0
+        for symbol in pattern:
+            state = self.transitions[state].get(symbol)
+            if state is None:
+                return None
+        return state
+
+    def count(self, pattern: Sequence[int]) -> int:
+        """Occurrences of ``pattern``: O(len(pattern)) after one O(n) pass."""
+        if not pattern:
+            return 0
+        state = self._walk(pattern)
+        return 0 if state is None else self._occurrence_counts()[state]
+
+    def __contains__(self, pattern: Sequence[int]) -> bool:
+        return self._walk(pattern) is not None
+
+
+def build_suffix_automaton(
+    gardiner_ids: Iterable[int], ngram_lengths: Iterable[int] = (2, 3)
+) -> SuffixAutomaton:
+    automaton = SuffixAutomaton(ngram_lengths)
+    automaton.extend_many(gardiner_ids)
+    return automaton
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Streaming repeat statistics for an image's reading order"
+    )
+    parser.add_argument("image_id", type=int, help="Image ID to analyze")
+    args = parser.parse_args()
+
+    sam = build_suffix_automaton(
+        gid for gid, _ in fetch_sorted_gardiner_ids(args.image_id)
+    )
+    repeat = sam.longest_repeat()
+    print(f"Glyphs: {len(sam.text)}")
+    print(f"Distinct substrings: {sam.distinct_substrings}")
+    for n, count in sam.distinct_ngrams.items():
+        print(f"Distinct {n}-grams: {count}")
+    print(f"Longest repeat ({len(repeat)}, x{sam.count(repeat)}): {list(repeat)}")
@@ -1,226 +1,327 @@
 import argparse
-from dataclasses import dataclass, field
-from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
-import pandas as pd
-
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_PATH = BASE_DIR / "data" / "sorted_glyphes.csv"
+from src.suffixarray import REPEAT_MODES, fetch_sorted_gardiner_ids
 
 # Runs in O(n)
 
 
-def load_sequence() -> List[int]:
-    df = pd.read_csv(DATA_PATH)
-    return df["gardiner_code"].astype(int).tolist()
-
-
 # ---- Ukkonen suffix tree implementation for integer sequences ----
 
 
-@dataclass
-class End:
-    val: int
-
-
-@dataclass
-class Edge:
-    start: int
-    end: End
-    dest: "Node"
-
-    def length(self, current_pos: int) -> int:
-        # Edge length considering open end
-        return min(self.end.val, current_pos) - self.start + 1
-
-
-@dataclass
-class Node:
-    children: Dict[int, Edge] = field(default_factory=dict)
-    suffix_link: Optional["Node"] = None
-
-    def add_edge(self, ch: int, edge: Edge) -> None:
-        self.children[ch] = edge
-
-    def get_edge(self, ch: int) -> Optional[Edge]:
-        return self.children.get(ch)
-
-
 class SuffixTree:
+    """
+    Ukkonen suffix tree stored as a struct of arrays instead of node objects.
+
+    Node 0 is the root. For every other node ``v`` the edge leading into it is
+    labelled ``data[start[v]:end[v] + 1]``; ``end[v] == -1`` marks a leaf whose
+    edge runs to the end of the text. Children are looked up by (node, symbol)
+    in a single dict keyed by one int and can be walked through
+    ``first_child``/``next_sibling``.
+
+    After construction every node carries its string ``depth``, its
+    ``leaf_count`` and ``leaf_lo``, the first index of its leaves in
+    ``positions`` (suffix start positions in leaf order), so a node's
+    occurrences are ``positions[leaf_lo[v]:leaf_lo[v] + leaf_count[v]]``.
+    """
+
+    __slots__ = (
+        "_lo",
+        "_span",
+        "children",
+        "data",
+        "depth",
+        "end",
+        "first_child",
+        "leaf_count",
+        "leaf_lo",
+        "link",
+        "n",
+        "next_sibling",
+        "positions",
+        "root",
+        "start",
+    )
+
     def __init__(self, data: List[int]):
         # Append a unique terminator smaller than any gardiner code
-        self.data = data + [-1]
+        terminator = min(min(data, default=0), 0) - 1
+        self.data = list(data) + [terminator]
         self.n = len(self.data)
-        self.root = Node()
+        self.root = 0
+        self._lo = terminator
+        self._span = max(self.data) - terminator + 1
+        self.start = array("i", [-1])
+        self.end = array("i", [-1])
+        self.link = array("i", [0])
+        self.children: Dict[int, int] = {}
         self.build()
 
+    def child(self, node: int, ch: int) -> Optional[int]:
+        if not self._lo <= ch < self._lo + self._span:
+            return None
+        return self.children.get(node * self._span + ch - self._lo)
+
+    def edge_length(self, node: int) -> int:
+        end = self.end[node]
+        return (self.n - 1 if end == -1 else end) - self.start[node] + 1
+
     def build(self) -> None:
         text = self.data
-        root = self.root
-        root.suffix_link = root
+        start, end, link = self.start, self.end, self.link
+        children = self.children
+        span, lo = self._span, self._lo
 
-        active_node = root
+        active_node = 0
         active_edge = -1
         active_length = 0
         remaining = 0
-        leaf_end = End(-1)
-        last_new_node: Optional[Node] = None
 
         for pos, ch in enumerate(text):
-            leaf_end.val = pos
             remaining += 1
-            last_new_node = None
+            last_new_node = 0
 
             while remaining > 0:
                 if active_length == 0:
                     active_edge = pos
 
-                edge = active_node.get_edge(text[active_edge])
+                key = active_node * span + text[active_edge] - lo
+                nxt = children.get(key)
 
-                if edge is None:
+                if nxt is None:
                     # No edge starting with this char; create leaf
-                    leaf = Node()
-                    active_node.add_edge(text[active_edge], Edge(pos, leaf_end, leaf))
+                    children[key] = len(start)
+                    start.append(pos)
+                    end.append(-1)
+                    link.append(0)
 
-                    if last_new_node and last_new_node is not root:
-                        last_new_node.suffix_link = active_node
-                    last_new_node = None
+                    if last_new_node:
+                        link[last_new_node] = active_node
+                    last_new_node = 0
 
                 else:
-                    edge_span = edge.length(pos)
+                    nxt_end = end[nxt]
+                    edge_span = (pos if nxt_end == -1 else nxt_end) - start[nxt] + 1
                     if active_length >= edge_span:
                         active_edge += edge_span
                         active_length -= edge_span
-                        active_node = edge.dest
+                        active_node = nxt
                         continue
 
-                    if text[edge.start + active_length] == ch:
+                    if text[start[nxt] + active_length] == ch:
                         active_length += 1
-                        if last_new_node and last_new_node is not root:
-                            last_new_node.suffix_link = active_node
+                        if last_new_node:
+                            link[last_new_node] = active_node
                         break
 
                     # Split edge
-                    split_end = End(edge.start + active_length - 1)
-                    split = Node()
-                    active_node.add_edge(
-                        text[active_edge], Edge(edge.start, split_end, split)
-                    )
+                    split = len(start)
+                    start.append(start[nxt])
+                    end.append(start[nxt] + active_length - 1)
+                    link.append(0)
+                    children[key] = split
 
-                    edge.start = split_end.val + 1
-                    split.add_edge(text[edge.start], edge)
+                    start[nxt] += active_length
+                    children[split * span + text[start[nxt]] - lo] = nxt
 
-                    leaf = Node()
-                    split.add_edge(ch, Edge(pos, leaf_end, leaf))
+                    children[split * span + ch - lo] = len(start)
+                    start.append(pos)
+                    end.append(-1)
+                    link.append(0)
 
                     if last_new_node:
-                        last_new_node.suffix_link = split
+                        link[last_new_node] = split
                     last_new_node = split
 
                 remaining -= 1
 
-                if active_node is root and active_length > 0:
+                if active_node == 0 and active_length > 0:
                     active_length -= 1
                     active_edge = pos - remaining + 1
-                elif active_node is not root:
-                    active_node = active_node.suffix_link or root
-
-    def _collect(
-        self,
-        node: Node,
-        path: List[Tuple[int, int]],
-        min_length: int,
-        results: List[Tuple[int, Tuple[int, ...], int]],
-        sentinel_index: int,
-    ) -> int:
-        # Returns number of leaves under this node
-        if not node.children:
-            return 1
-
-        leaf_count = 0
-        for edge in node.children.values():
-            seg_end = min(edge.end.val, sentinel_index - 1)
-            seg_len = seg_end - edge.start + 1
-            if seg_len <= 0:
+                elif active_node != 0:
+                    active_node = link[active_node]
+
+        count = len(start)
+        self.first_child = array("i", [-1]) * count
+        self.next_sibling = array("i", [-1]) * count
+        for key, node in children.items():
+            parent = key // span
+            self.next_sibling[node] = self.first_child[parent]
+            self.first_child[parent] = node
+
+        self._annotate()
+
+    def iter_children(self, node: int) -> Iterator[int]:
+        child = self.first_child[node]
+        while child != -1:
+            yield child
+            child = self.next_sibling[child]
+
+    def _annotate(self) -> None:
+        """Fill depth, leaf_count, leaf_lo and positions in two linear passes."""
+        count = len(self.start)
+        first_child, next_sibling = self.first_child, self.next_sibling
+        depth = array("i", [0]) * count
+        leaf_lo = array("i", [0]) * count
+        leaf_count = array("i", [0]) * count
+        positions = array("i")
+
+        # Pre-order: children are pushed after their parent got its depth, and
+        # leaves are numbered in the order they are reached.
+        order = array("i")
+        stack = [0]
+        while stack:
+            v = stack.pop()
+            order.append(v)
+            leaf_lo[v] = len(positions)
+            child = first_child[v]
+            if child == -1 and v != 0:
+                positions.append(self.n - depth[v])
+            while child != -1:
+                depth[child] = depth[v] + self.edge_length(child)
+                stack.append(child)
+                child = next_sibling[child]
+
+        # Reversed pre-order sees every subtree complete before its root.
+        for v in reversed(order):
+            child = first_child[v]
+            if child == -1:
+                leaf_count[v] = 1
                 continue
+            total = 0
+            while child != -1:
+                total += leaf_count[child]
+                child = next_sibling[child]
+            leaf_count[v] = total
 
-            path.append((edge.start, seg_end))
-            child_leaves = self._collect(
-                edge.dest, path, min_length, results, sentinel_index
-            )
-            leaf_count += child_leaves
-
-            path.pop()
-
-        # Evaluate current path (excluding root)
-        if path:
-            path_len = sum(end - start + 1 for start, end in path)
-            if path_len >= min_length and leaf_count >= 2:
-                seq = []
-                for start, end in path:
-                    seq.extend(self.data[start : end + 1])
-                results.append((path_len, tuple(seq), leaf_count))
-
-        return leaf_count
+        self.depth = depth
+        self.leaf_count = leaf_count
+        self.leaf_lo = leaf_lo
+        self.positions = positions
 
     def repeated_substrings(
         self, min_length: int = 1
     ) -> List[Tuple[int, Tuple[int, ...], int]]:
+        # Every internal node spells a distinct repeat; its label ends where
+        # its incoming edge ends.
         results: List[Tuple[int, Tuple[int, ...], int]] = []
-        sentinel_index = len(self.data)
-        self._collect(self.root, [], min_length, results, sentinel_index)
-
-        # Deduplicate by sequence keeping max length and count
-        best: Dict[Tuple[int, ...], Tuple[int, int]] = {}
-        for length, seq, count in results:
-            if (
-                seq not in best
-                or length > best[seq][0]
-                or (length == best[seq][0] and count > best[seq][1])
-            ):
-                best[seq] = (length, count)
-
-        deduped = [(length, seq, count) for seq, (length, count) in best.items()]
-        deduped.sort(key=lambda x: (-x[0], -x[2], x[1]))
-        return deduped
-
-    def _count_leaves(self, node: Node) -> int:
-        if not node.children:
-            return 1
-        return sum(self._count_leaves(edge.dest) for edge in node.children.values())
-
-    def search(self, pattern: List[int]) -> int:
+        for v in range(1, len(self.start)):
+            if self.first_child[v] == -1:
+                continue
+            length = self.depth[v]
+            count = self.leaf_count[v]
+            if length >= min_length and count >= 2:
+                label_end = self.end[v] + 1
+                results.append(
+                    (length, tuple(self.data[label_end - length : label_end]), count)
+                )
+
+        results.sort(key=lambda x: (-x[0], -x[2], x[1]))
+        return results
+
+    def locate(self, pattern: Sequence[int]) -> Optional[int]:
         """
-        Return the number of occurrences of a pattern (as count of suffix leaves under the match).
+        Return the highest node whose path label starts with ``pattern``, in
+        O(len(pattern)), or None if the pattern does not occur.
         """
-        if not pattern:
-            return 0
+        if not pattern or self.data[-1] in pattern:
+            return None
 
         node = self.root
         idx = 0
         while idx < len(pattern):
-            edge = node.get_edge(pattern[idx])
-            if edge is None:
-                return 0
+            nxt = self.child(node, pattern[idx])
+            if nxt is None:
+                return None
 
-            edge_len = edge.end.val - edge.start + 1
-            to_match = min(edge_len, len(pattern) - idx)
+            edge_start = self.start[nxt]
+            to_match = min(self.edge_length(nxt), len(pattern) - idx)
             for j in range(to_match):
-                if self.data[edge.start + j] != pattern[idx + j]:
-                    return 0
+                if self.data[edge_start + j] != pattern[idx + j]:
+                    return None
 
             idx += to_match
+            # pattern ended inside this edge or exactly at its end, or we
+            # consumed the full edge and move deeper
+            node = nxt
+
+        return node
 
-            if idx == len(pattern):
-                # pattern ended inside this edge or exactly at its end; occurrences = leaves under dest
-                return self._count_leaves(edge.dest)
+    def search(self, pattern: List[int]) -> int:
+        """
+        Return the number of occurrences of a pattern (as count of suffix leaves under the match).
+        """
+        node = self.locate(pattern)
+        return 0 if node is None else self.leaf_count[node]
+
+    def find_positions(self, pattern: Sequence[int]) -> List[int]:
+        """Sorted start positions of ``pattern``, in O(len(pattern) + occ log occ)."""
+        node = self.locate(pattern)
+        if node is None:
+            return []
+        lo = self.leaf_lo[node]
+        return sorted(self.positions[lo : lo + self.leaf_count[node]])
+
+    def search_many(
+        self, patterns: Sequence[Sequence[int]]
+    ) -> List[Tuple[int, List[int]]]:
+        """(count, sorted start positions) per pattern, see SuffixArrayIndex."""
+        results: List[Tuple[int, List[int]]] = []
+        for pattern in patterns:
+            positions = self.find_positions(pattern)
+            results.append((len(positions), positions))
+        return results
+
+
+def find_suffixtree_occurrences(
+    gardiner_ids: Sequence[int],
+    *,
+    min_length: int,
+    mode: str = "all",
+) -> Dict[Tuple[int, ...], List[int]]:
+    """
+    Suffix tree counterpart of find_suffixarray_occurrences with the same
+    ``mode`` semantics and results: internal nodes are the lcp-intervals,
+    their leaf ranges the occurrences.
+    """
+    if mode not in REPEAT_MODES:
+        raise ValueError(f"unknown mode '{mode}', expected one of {REPEAT_MODES}")
+
+    occurrences: Dict[Tuple[int, ...], List[int]] = {}
+    if len(gardiner_ids) < min_length:
+        return occurrences
+
+    tree = SuffixTree(list(gardiner_ids))
+    data = tree.data
+    for v in range(1, len(tree.start)):
+        if tree.first_child[v] == -1:
+            continue
+        depth = tree.depth[v]
+        if depth < min_length:
+            continue
+
+        lo = tree.leaf_lo[v]
+        positions = sorted(tree.positions[lo : lo + tree.leaf_count[v]])
+        if mode in ("maximal", "supermaximal"):
+            contexts = {data[p - 1] if p > 0 else None for p in positions}
+            if mode == "maximal" and None not in contexts and len(contexts) < 2:
+                continue
+            if mode == "supermaximal" and (
+                len(contexts) != len(positions)
+                or any(tree.first_child[c] != -1 for c in tree.iter_children(v))
+            ):
+                continue
 
-            # otherwise we consumed full edge, move deeper
-            node = edge.dest
+        if mode == "all":
+            lengths = range(max(depth - tree.edge_length(v) + 1, min_length), depth + 1)
+        else:
+            lengths = range(depth, depth + 1)
+        start = positions[0]
+        for length in lengths:
+            occurrences[tuple(data[start : start + length])] = list(positions)
 
-        return 0
+    return occurrences
 
 
 def display_top(results: List[Tuple[int, Tuple[int, ...], int]], limit: int) -> None:
@@ -239,6 +340,7 @@ def main() -> None:
     parser = argparse.ArgumentParser(
         description="Suffix tree LCP finder for Gardiner codes"
     )
+    parser.add_argument("image_id", type=int, help="Image ID to analyze")
     parser.add_argument(
         "--min-length", type=int, default=1, help="Minimum pattern length to report"
     )
@@ -252,7 +354,7 @@ def main() -> None:
     )
     args = parser.parse_args()
 
-    seq = load_sequence()
+    seq = [gid for gid, _ in fetch_sorted_gardiner_ids(args.image_id)]
     tree = SuffixTree(seq)
     results = tree.repeated_substrings(min_length=args.min_length)
     display_top(results, limit=args.limit)
@@ -268,6 +370,8 @@ def main() -> None:
 
         occ = tree.search(pattern)
         print(f"\nQuery {pattern} occurrences: {occ}")
+        if occ:
+            print(f"Start positions: {tree.find_positions(pattern)}")
 
 
 if __name__ == "__main__":
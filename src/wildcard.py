@@ -0,0 +1,207 @@
+"""Repeats with one wildcard slot, mined from the suffix array.
+
+Scribal variants often differ by a single substituted sign: ``A ? B`` occurs
+several times with different signs in the ``?`` slot. Such patterns are found
+without enumerating variants. Suffixes sharing the prefix ``A`` (of length
+``k``) form a run of the suffix array; re-sorting that run by the rank of the
+suffix after the slot and taking range minima over the LCP array gives the
+common ``B`` parts, whose lcp-intervals are the candidate patterns. Runs for
+``k + 1`` are sub-runs of those for ``k``, so only positions whose prefix is
+still repeated are revisited.
+"""
+
+import argparse
+from itertools import pairwise
+from typing import Optional, Sequence
+
+from src.sort import fetch_sort_version
+from src.suffixarray import (
+    OCCURRENCE_STORAGE,
+    build_lcp_array,
+    build_suffix_array,
+    fetch_sorted_gardiner_ids,
+    iter_lcp_intervals,
+    load_suffixarray_index,
+    save_suffixarray_results,
+)
+
+# Stored as NULL in T_SUFFIXARRAY_PATTERNS.gardiner_ids.
+WILDCARD = None
+
+WildcardOccurrences = dict[tuple[Optional[int], ...], list[int]]
+
+
+def _sparse_table(values: Sequence[int]) -> list[list[int]]:
+    table = [list(values)]
+    span = 1
+    while 2 * span <= len(values):
+        prev = table[-1]
+        table.append([min(a, b) for a, b in zip(prev, prev[span:])])
+        span *= 2
+    return table
+
+
+def _range_min(table: list[list[int]], lo: int, hi: int) -> int:
+    """Minimum of ``values[lo..hi]`` (inclusive, ``lo <= hi``) in O(1)."""
+    level = (hi - lo + 1).bit_length() - 1
+    row = table[level]
+    return min(row[lo], row[hi - (1 << level) + 1])
+
+
+def _split_runs(
+    runs: list[tuple[int, int]], lcp: Sequence[int], k: int
+) -> list[tuple[int, int]]:
+    """Split suffix array runs where neighbours share fewer than ``k`` symbols."""
+    out: list[tuple[int, int]] = []
+    for lo, hi in runs:
+        start = lo
+        for r in range(lo + 1, hi + 1):
+            if lcp[r] < k:
+                if r - 1 > start:
+                    out.append((start, r - 1))
+                start = r
+        if hi > start:
+            out.append((start, hi))
+    return out
+
+
+def find_wildcard_occurrences(
+    seq: Sequence[int],
+    *,
+    min_length: int = 3,
+    sa: Sequence[int] | None = None,
+    lcp: Sequence[int] | None = None,
+) -> WildcardOccurrences:
+    """
+    Map patterns ``A + (WILDCARD,) + B`` (``A`` and ``B`` non-empty, at least
+    ``min_length`` symbols in total) to their start positions.
+
+    A pattern is reported when it occurs at least twice with at least two
+    different signs in the slot (otherwise it is an exact repeat), ``B``
+    cannot be extended on the right and ``A`` cannot be extended on the left
+    without losing an occurrence. Negative ids are separators (see
+    separate_columns) and never fill the slot. ``sa``/``lcp`` may be passed
+    in when the index already exists.
+    """
+    n = len(seq)
+    if n < 3:
+        return {}
+    if sa is None:
+        sa = build_suffix_array(seq)
+    if lcp is None:
+        lcp = build_lcp_array(seq, sa)
+
+    rank = [0] * n
+    for r, pos in enumerate(sa):
+        rank[pos] = r
+    table = _sparse_table(lcp)
+
+    occurrences: WildcardOccurrences = {}
+    k = 1
+    runs = _split_runs([(0, n - 1)], lcp, k)
+    while runs:
+        min_tail = max(1, min_length - k - 1)
+        for lo, hi in runs:
+            # Suffixes sharing A = seq[i:i + k] that still have a B after the slot
+            members = [
+                sa[r]
+                for r in range(lo, hi + 1)
+                if sa[r] + k + 1 < n and seq[sa[r] + k] >= 0
+            ]
+            if len(members) < 2:
+                continue
+            members.sort(key=lambda i: rank[i + k + 1])
+            tails = [rank[i + k + 1] for i in members]
+            heights = [0] + [_range_min(table, a + 1, b) for a, b in pairwise(tails)]
+
+            for tail, left, right, _, _ in iter_lcp_intervals(
+                heights, min_length=min_tail
+            ):
+                starts = members[left : right + 1]
+                if len({seq[i + k] for i in starts}) < 2:
+                    continue
+                if 0 not in starts and len({seq[i - 1] for i in starts}) == 1:
+                    # Reported with the longer prefix at k + 1.
+                    continue
+                first = starts[0]
+                pattern = (
+                    tuple(seq[first : first + k])
+                    + (WILDCARD,)
+                    + tuple(seq[first + k + 1 : first + k + 1 + tail])
+                )
+                occurrences[pattern] = sorted(starts)
+        k += 1
+        runs = _split_runs(runs, lcp, k)
+
+    return occurrences
+
+
+def mine_wildcard(
+    image_id: int,
+    sort_version: int,
+    sequence_pairs: list[tuple[int, int]],
+    *,
+    min_length: int = 3,
+) -> WildcardOccurrences:
+    """
+    find_wildcard_occurrences over an image's reading order, reusing the
+    on-disk suffix array index when it matches ``sort_version``.
+    """
+    if not sequence_pairs:
+        return {}
+    index = load_suffixarray_index(image_id, sort_version)
+    if index is not None and len(index.seq) == len(sequence_pairs):
+        return find_wildcard_occurrences(
+            index.seq, min_length=min_length, sa=index.sa, lcp=index.lcp
+        )
+    return find_wildcard_occurrences(
+        [gid for gid, _ in sequence_pairs], min_length=min_length
+    )
+
+
+def run_wildcard(
+    image_id: int,
+    *,
+    min_length: int = 3,
+    storage: str = "rows",
+    incremental: bool = False,
+) -> WildcardOccurrences:
+    """
+    Mine an image's wildcard repeats and store them as ``pattern_type``
+    "wildcard" next to its exact patterns.
+    """
+    sequence_pairs = fetch_sorted_gardiner_ids(image_id)
+    sort_version = fetch_sort_version(image_id)
+    occurrences = mine_wildcard(
+        image_id, sort_version, sequence_pairs, min_length=min_length
+    )
+
+    save_suffixarray_results(
+        image_id,
+        occurrences,
+        [glyph_id for _, glyph_id in sequence_pairs],
+        storage=storage,
+        sort_version=sort_version,
+        incremental=incremental,
+        pattern_type="wildcard",
+    )
+    return occurrences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find repeats with one wildcard sign in an image"
+    )
+    parser.add_argument("image_id", type=int, help="Image ID to analyze")
+    parser.add_argument("--min-length", type=int, default=3)
+    parser.add_argument("--storage", choices=OCCURRENCE_STORAGE, default="rows")
+    parser.add_argument("--incremental", action="store_true")
+    args = parser.parse_args()
+
+    found = run_wildcard(
+        args.image_id,
+        min_length=args.min_length,
+        storage=args.storage,
+        incremental=args.incremental,
+    )
+    print(f"Found {len(found)} wildcard patterns")